@@ -0,0 +1,405 @@
+import batch
+import numpy as np
+from boundedCache import DEFAULTCAPACITY, LRU
+from geometry import TICTACTOE
+from output import TABLES, Output, output
+from qTable import QTable
+from stateIndex import StateIndex, getStateIndex
+from typing import Dict, Iterator, List, NoReturn, Optional, Sequence, Tuple
+from utils import weightedAvg
+
+"""
+    A QTable whose q-values are one float32 array, qValues[canonicalId, typeId, move],
+    instead of a dict of dicts per board. Canonical ids come from stateIndex, so it covers
+    the reachable boards of the standard 3 x 3 game: 765 boards x 9 moves x 4 bytes is 27.5 KB per player type.
+
+    Player types get ids as they are first seen. The array grows when a new type appears.
+    Boards and moves are canonicalized exactly as in QTable. To have LearningPlayers use it:
+
+        setQTable(ArrayQTable())
+"""
+
+# Room for this many player types before the array has to grow.
+INITIALTYPES: int = 2
+
+# updateQValues treats larger alphas as this, so that log(1 - alpha) is finite.
+MAXALPHA: float = 1 - 1e-9
+
+# (legalMasks, legalQMoves) by (canonical boards, collapseSymmetricMoves). See ArrayQTable.legalMoveTables.
+_legalMoveTables: Dict[Tuple[Tuple[str, ...], bool], Tuple[np.ndarray, List[List[int]]]] = {}
+
+
+class ArrayQTable(QTable):
+
+    def __init__(self, cacheCapacity: Optional[int]=DEFAULTCAPACITY, cachePolicy: str=LRU,
+                 typeNames: Sequence[str]=(), index: Optional[StateIndex]=None,
+                 collapseSymmetricMoves: bool=True,
+                 arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]=None) -> NoReturn:
+        """
+        :param cacheCapacity: as in QTable.
+        :param cachePolicy: as in QTable.
+        :param collapseSymmetricMoves: as in QTable.
+        :param typeNames: player types to give ids now, in order. Others get ids when first seen.
+        :param index: the StateIndex to use. By default, getStateIndex().
+        :param arrays: (qValues, visitCounts, visited) to use rather than new zeroed ones. See fromArrays.
+        """
+        super().__init__(TICTACTOE, cacheCapacity, cachePolicy, collapseSymmetricMoves)
+        # Not used: the q-values are in self.qValues.
+        self.qTable = None
+        self.index: StateIndex = getStateIndex() if index is None else index
+        states = len(self.index)
+        cells = self.geometry.cells
+        self.typeNames: List[str] = []
+        self.typeIds: Dict[str, int] = {}
+        if arrays is None:
+            qValues = np.zeros((states, max(INITIALTYPES, len(typeNames)), cells), dtype=np.float32)
+            arrays = (qValues, np.zeros(qValues.shape, dtype=np.uint32), np.zeros(qValues.shape[:2], dtype=bool))
+        (qValues, visitCounts, visited) = arrays
+        self.qValues: np.ndarray = qValues
+        # visitCounts[canonicalId, typeId, move] is the number of times that q-value was updated.
+        self.visitCounts: np.ndarray = visitCounts
+        # visited[canonicalId, typeId] is True once that entry has been updated. Reads don't change it.
+        self.visited: np.ndarray = visited
+        # legalMasks[canonicalId] is True for the moves on the canonical board that have q-values.
+        # See QTable.choosableQMoves. legalQMoves[canonicalId] lists the same moves, for the one-board methods:
+        # on 9 cells, Python lists are faster than numpy.
+        (legalMasks, legalQMoves) = self.legalMoveTables()
+        self.legalMasks: np.ndarray = legalMasks
+        self.legalQMoves: List[List[int]] = legalQMoves
+        # True while a snapshot shares self.qValues and self.visitCounts. The next update copies them first.
+        self.isShared = False
+        # True when the arrays are views of a file mapped for writing (see qTableFile.READWRITE), which must be
+        # changed in place: they cannot grow for a new type, and snapshots copy them.
+        self.writesThrough = False
+        # For updateQValues, made when first needed. See stateTables.
+        self.stateCanonicalIds: Optional[np.ndarray] = None
+        self.stateQMoves: Optional[np.ndarray] = None
+        for typeName in typeNames:
+            self.typeId(typeName)
+
+    @classmethod
+    def fromArrays(cls, qValues: np.ndarray, visited: np.ndarray, typeNames: Sequence[str],
+                   index: Optional[StateIndex]=None, visitCounts: Optional[np.ndarray]=None,
+                   **kwargs) -> 'ArrayQTable':
+        """
+        An ArrayQTable that uses the given arrays (which may be memory-mapped) rather than new ones.
+        :param qValues: (states, types, cells) float32 array. Its types axis may be longer than typeNames.
+        :param visited: (states, types) bool array.
+        :param typeNames: the player types, in id order.
+        :param index:
+        :param visitCounts: (states, types, cells) uint32 array. By default, all 0.
+        :param kwargs: the other ArrayQTable arguments.
+        """
+        if visitCounts is None:
+            visitCounts = np.zeros(qValues.shape, dtype=np.uint32)
+        return cls(typeNames=typeNames, index=index, arrays=(qValues, visitCounts, visited), **kwargs)
+
+    @classmethod
+    def fromQTable(cls, qTable: QTable, **kwargs) -> 'ArrayQTable':
+        """
+        Copy a dict-based QTable of the standard board into a new ArrayQTable.
+        """
+        if isinstance(qTable, ArrayQTable):
+            return qTable
+        table = cls(**kwargs)
+        for (qBoard, qValuesDicts) in qTable.qTable.items():
+            canonicalId = table.index.boardToCanonicalId[qBoard]
+            for (typeName, qValueDict) in qValuesDicts.items():
+                typeId = table.typeId(typeName)
+                table.visited[canonicalId, typeId] = True
+                for (move, qValue) in qValueDict.items():
+                    table.qValues[canonicalId, typeId, move] = qValue
+                table.visitCounts[canonicalId, typeId] = qTable.getVisitCounts(qBoard, typeName)
+        return table
+
+    def legalMoveTables(self) -> Tuple[np.ndarray, List[List[int]]]:
+        """
+        :return: (legalMasks, legalQMoves) for self.index and self.collapseSymmetricMoves. They are computed
+                 the first time and then shared by every table with the same canonical boards, so don't change them.
+        """
+        key = (tuple(self.index.canonicalBoards), self.collapseSymmetricMoves)
+        if key not in _legalMoveTables:
+            legalMasks = batch.validMoves(batch.fromBoards(self.index.canonicalBoards))
+            if self.collapseSymmetricMoves:
+                orbits = np.array([self.findMoveOrbits(qBoard) for qBoard in self.index.canonicalBoards])
+                legalMasks &= orbits == np.arange(self.geometry.cells)
+            legalMasks.flags.writeable = False
+            _legalMoveTables[key] = (legalMasks, [np.flatnonzero(legalMask).tolist() for legalMask in legalMasks])
+        return _legalMoveTables[key]
+
+    def typeId(self, typeName: str) -> int:
+        """
+        The id of typeName, making one (and growing the arrays if necessary) if it is new.
+        """
+        typeId = self.typeIds.get(typeName)
+        if typeId is None:
+            typeId = len(self.typeNames)
+            if typeId == self.qValues.shape[1]:
+                if self.writesThrough:
+                    raise ValueError(f'{typeName} is a new type, and the file this table writes through to '
+                                     f'cannot hold it. Its types: {self.typeNames}.')
+                self.qValues = np.concatenate([self.qValues, np.zeros_like(self.qValues)], axis=1)
+                self.visitCounts = np.concatenate([self.visitCounts, np.zeros_like(self.visitCounts)], axis=1)
+                self.visited = np.concatenate([self.visited, np.zeros_like(self.visited)], axis=1)
+                self.isShared = False
+            self.typeNames.append(typeName)
+            self.typeIds[typeName] = typeId
+        return typeId
+
+    # ============================================================================
+    # The QTable interface. board may be raw or canonical: the StateIndex maps both.
+    # These read one board's 9 q-values at a time. They convert them to Python floats (tolist, item) and work on
+    # those, because numpy's per-call overhead (max, boolean masks, scalar indexing) costs more than the work itself.
+    # Reads don't give a new type an id: like QTable, they see the initial q-values, all 0.
+    def getBestQMovesFromQBoard(self, qBoard: str, typeName: str) -> List[int]:
+        canonicalId = self.index.boardToCanonicalId[qBoard]
+        legalQMoves = self.legalQMoves[canonicalId]
+        qValues = self.lookupQValueList(canonicalId, typeName)
+        if qValues is None:
+            return list(legalQMoves)
+        bestQValue = max([qValues[qMove] for qMove in legalQMoves])
+        return [qMove for qMove in legalQMoves if qValues[qMove] == bestQValue]
+
+    def getBestQValue(self, board: str, typeName: str) -> float:
+        # Like QTable, the best over all the cells, not just the empty ones.
+        qValues = self.lookupQValueList(self.index.boardToCanonicalId[board], typeName)
+        return 0.0 if qValues is None else max(qValues)
+
+    def getQValueDict(self, board: str, typeName: str) -> Dict[int, float]:
+        """
+        A copy of the q-values of board's class as a dict. Changing it does not change the table.
+        """
+        qValues = self.lookupQValueList(self.index.boardToCanonicalId[board], typeName)
+        return dict.fromkeys(range(self.geometry.cells), 0.0) if qValues is None else dict(enumerate(qValues))
+
+    def lookupQValueList(self, canonicalId: int, typeName: str) -> Optional[List[float]]:
+        """
+        The q-values of a canonical board, counting the lookup. None if typeName has no id yet.
+        """
+        typeId = self.typeIds.get(typeName)
+        if typeId is None:
+            self.lookups += 1
+            self.lookupMisses += 1
+            return None
+        self.countLookup(canonicalId, typeId)
+        return self.qValues[canonicalId, typeId].tolist()
+
+    def updateQValue(self, board: str, typeName: str, move: int, alpha: float, newQValue: float) -> NoReturn:
+        canonicalId = self.index.boardToCanonicalId[board]
+        typeId = self.typeIds.get(typeName)
+        if typeId is None:
+            typeId = self.typeId(typeName)
+        cell = (canonicalId, typeId, self.getQMove(board, move))
+        self.unshare()
+        # qValues first: if it is read-only (a snapshot, or a file mapped for reading), this raises ValueError
+        # before anything has changed.
+        self.qValues[cell] = weightedAvg(self.qValues.item(cell), alpha, newQValue)
+        self.visitCounts[cell] += 1
+        self.visited[canonicalId, typeId] = True
+        self.updates += 1
+
+    def unshare(self) -> NoReturn:
+        """
+        Copy the arrays if a snapshot shares them, before they are changed.
+        """
+        if self.isShared:
+            self.qValues = self.qValues.copy()
+            self.visitCounts = self.visitCounts.copy()
+            self.isShared = False
+
+    def countLookup(self, canonicalId: int, typeId: int) -> NoReturn:
+        self.lookups += 1
+        if not self.visited.item(canonicalId, typeId):
+            self.lookupMisses += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {'states': int(self.visited.any(axis=1).sum()), 'entries': int(self.visited.sum()),
+                'lookups': self.lookups, 'lookupMisses': self.lookupMisses, 'updates': self.updates}
+
+    def getVisitCounts(self, qBoard: str, typeName: str) -> List[int]:
+        typeId = self.typeIds.get(typeName)
+        if typeId is None:
+            return [0] * self.geometry.cells
+        return self.visitCounts[self.index.boardToCanonicalId[qBoard], typeId].tolist()
+
+    def setEntry(self, qBoard: str, typeName: str, qValueDict: Dict[int, float], visitCounts: List[int]) -> NoReturn:
+        canonicalId = self.index.boardToCanonicalId[qBoard]
+        typeId = self.typeId(typeName)
+        self.unshare()
+        # qValues first, as in updateQValue.
+        for (move, qValue) in qValueDict.items():
+            self.qValues[canonicalId, typeId, move] = qValue
+        self.visitCounts[canonicalId, typeId] = visitCounts
+        self.visited[canonicalId, typeId] = True
+
+    def entries(self) -> Iterator[Tuple[str, str, Dict[int, float]]]:
+        """
+        :return: (qBoard, typeName, qValueDict) for each visited entry. The dicts are copies.
+        """
+        for (canonicalId, typeId) in zip(*np.nonzero(self.visited)):
+            yield (self.index.canonicalBoard(canonicalId), self.typeNames[typeId],
+                   dict(enumerate(self.qValues[canonicalId, typeId].tolist())))
+
+    # ============================================================================
+    # Snapshots
+    def snapshot(self) -> 'ArrayQTable':
+        """
+        A read-only ArrayQTable that shares this table's values until this table is next updated.
+        Taking one costs no copy; the first update afterwards copies the array (copy-on-write).
+        A table that writes through to a file is copied at once instead.
+        """
+        if self.writesThrough:
+            # Copy now: copying at the next update would stop the updates from reaching the file.
+            (qValues, visitCounts) = (self.qValues.copy(), self.visitCounts.copy())
+        else:
+            (qValues, visitCounts) = (self.qValues.view(), self.visitCounts.view())
+            self.isShared = True
+        qValues.flags.writeable = False
+        visitCounts.flags.writeable = False
+        return self.snapshotOf(qValues, visitCounts)
+
+    def snapshotOf(self, qValues: np.ndarray, visitCounts: np.ndarray) -> 'ArrayQTable':
+        return ArrayQTable.fromArrays(qValues, self.visited.copy(), self.typeNames, self.index, visitCounts,
+                                      cacheCapacity=self.qBoardCache.capacity, cachePolicy=self.qBoardCache.policy,
+                                      collapseSymmetricMoves=self.collapseSymmetricMoves)
+
+    # ============================================================================
+    # Whole batches of boards at once.
+    def canonicalIds(self, boards: Sequence[str]) -> np.ndarray:
+        boardToCanonicalId = self.index.boardToCanonicalId
+        return np.fromiter((boardToCanonicalId[board] for board in boards), dtype=np.intp, count=len(boards))
+
+    def bestQValues(self, canonicalIds: np.ndarray, typeName: str, legalOnly: bool=False) -> np.ndarray:
+        """
+        The best q-value of each board.
+        :param canonicalIds: (N,) array
+        :param typeName:
+        :param legalOnly: consider only the legal moves that have q-values (see legalMasks).
+                          Otherwise all cells, as getBestQValue does.
+        :return: (N,) float32 array
+        """
+        qValues = self.typeQValues(canonicalIds, typeName)
+        if legalOnly:
+            qValues = np.where(self.legalMasks[canonicalIds], qValues, -np.inf)
+        return qValues.max(axis=1)
+
+    def bestQMoves(self, canonicalIds: np.ndarray, typeName: str) -> np.ndarray:
+        """
+        A best legal move on each canonical board: the first, if there are ties.
+        :param canonicalIds: (N,) array
+        :param typeName:
+        :return: (N,) array of moves on the canonical boards
+        """
+        qValues = self.typeQValues(canonicalIds, typeName)
+        return np.where(self.legalMasks[canonicalIds], qValues, -np.inf).argmax(axis=1)
+
+    def typeQValues(self, canonicalIds: np.ndarray, typeName: str) -> np.ndarray:
+        """
+        The q-values of each board: all 0 if typeName has no id yet, which is not given one.
+        :return: (N, cells) float32 array
+        """
+        typeId = self.typeIds.get(typeName)
+        if typeId is None:
+            return np.zeros((len(canonicalIds), self.geometry.cells), dtype=np.float32)
+        return self.qValues[canonicalIds, typeId]
+
+    # ============================================================================
+    # Batch updates. Boards are given by state id: their index in StateSpace.boards (see StateSpace.ids).
+    def supportsBatch(self) -> bool:
+        return True
+
+    def stateTables(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (stateCanonicalIds, stateQMoves). stateCanonicalIds[stateId] is the board's canonical id, and
+                 stateQMoves[stateId, move] is getQMove(board, move).
+        """
+        if self.stateCanonicalIds is None:
+            # The index's boards are in state id order.
+            boards = list(self.index.boardToCanonicalId)
+            self.stateCanonicalIds = np.array(self.index.canonicalIds, dtype=np.intp)
+            self.stateQMoves = np.array([[self.getQMove(board, move) for move in range(self.geometry.cells)]
+                                         for board in boards], dtype=np.intp)
+        return (self.stateCanonicalIds, self.stateQMoves)
+
+    def updateQValues(self, typeName: str, stateIds: np.ndarray, moves: np.ndarray, rewards: np.ndarray,
+                      nextStateIds: np.ndarray, alphas: np.ndarray, gammas: np.ndarray) -> np.ndarray:
+        """
+        Apply a batch of q-learning updates at once.
+        Every target, reward + gamma * (the best q-value of the next state), uses the q-values from before the batch.
+        Each q-value then ends up as if updateQValue had been called for each of its transitions in turn,
+        so a state and move that appear several times in the batch get all their updates, in batch order.
+        :param typeName:
+        :param stateIds: (N,) the board before each move.
+        :param moves: (N,) the moves, on those boards.
+        :param rewards: (N,)
+        :param nextStateIds: (N,) the player's next board, or -1 at the end of the game.
+        :param alphas: (N,) or a scalar.
+        :param gammas: (N,) or a scalar.
+        :return: (N,) the TD errors: each target minus its q-value before the batch
+        """
+        (stateCanonicalIds, stateQMoves) = self.stateTables()
+        canonicalIds = stateCanonicalIds[stateIds]
+        qMoves = stateQMoves[stateIds, moves]
+        typeId = self.typeId(typeName)
+        # The best q-value of each next state, as in getBestQValue. For a large batch, the best of every canonical
+        # state is found first: one max over the states is much cheaper than one per transition.
+        done = nextStateIds < 0
+        nextIds = stateCanonicalIds[np.where(done, 0, nextStateIds)]
+        if len(nextIds) < len(self.index):
+            nextBestQValues = self.qValues[nextIds, typeId].max(axis=1).astype(np.float64)
+        else:
+            nextBestQValues = self.qValues[:, typeId].max(axis=1).astype(np.float64)[nextIds]
+        targets = rewards + gammas * np.where(done, 0.0, nextBestQValues)
+        tdErrors = targets - self.qValues[canonicalIds, typeId, qMoves]
+        self.applyUpdates(typeId, canonicalIds, qMoves, np.broadcast_to(alphas, targets.shape), targets)
+        return tdErrors
+
+    def applyUpdates(self, typeId: int, canonicalIds: np.ndarray, qMoves: np.ndarray, alphas: np.ndarray,
+                     targets: np.ndarray) -> NoReturn:
+        """
+        Move each q-value alpha of the way to its target, in order.
+        Repeated updates of one q-value compose: after q <- (1 - a1) q + a1 t1, then q <- (1 - a2) q + a2 t2,
+        q is (1 - a1)(1 - a2) q + a1 (1 - a2) t1 + a2 t2. Each update's weight is its alpha times the product of
+        (1 - alpha) over the later updates of the same q-value, computed from running sums of log(1 - alpha).
+        """
+        if len(targets) == 0:
+            return
+        keys = canonicalIds * self.geometry.cells + qMoves
+        # Group the updates of each q-value together, keeping their order.
+        # numpy sorts 16-bit keys stably with a radix sort, and every key of the standard board fits.
+        order = np.argsort(keys.astype(np.uint16) if keys.size and keys.max() < 1 << 16 else keys, kind='stable')
+        keys = keys[order]
+        alphas = np.minimum(alphas[order], MAXALPHA)
+        targets = targets[order]
+        logDecays = np.log1p(-alphas)
+        runningLogDecays = np.cumsum(logDecays)
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        ends = np.append(starts[1:], len(keys)) - 1
+        counts = ends - starts + 1
+        # The sum of log(1 - alpha) over each update's group, and over the updates after it in its group.
+        groupLogDecays = runningLogDecays[ends] - runningLogDecays[starts] + logDecays[starts]
+        laterLogDecays = np.repeat(runningLogDecays[ends], counts) - runningLogDecays
+        weightedTargets = np.add.reduceat(alphas * np.exp(laterLogDecays) * targets, starts)
+
+        (groupIds, groupQMoves) = np.divmod(keys[starts], self.geometry.cells)
+        self.unshare()
+        oldQValues = self.qValues[groupIds, typeId, groupQMoves].astype(np.float64)
+        self.qValues[groupIds, typeId, groupQMoves] = np.exp(groupLogDecays) * oldQValues + weightedTargets
+        self.visitCounts[groupIds, typeId, groupQMoves] += counts.astype(np.uint32)
+        self.visited[groupIds, typeId] = True
+        self.updates += len(keys)
+
+    # ============================================================================
+    # Print the Q Table
+    def printQTable(self, output: Output=output) -> NoReturn:
+        if not output.isEnabled(TABLES):
+            return
+        visitedIds = np.flatnonzero(self.visited.any(axis=1))
+        output.print(f'\n\nQTable contains {len(visitedIds)} entries.')
+        cells = self.geometry.cells
+        # The number of empty cells, to sort by moves made as QTable does.
+        emptyCounts = batch.emptyCellsCount(batch.fromBoards(self.index.canonicalBoards))
+        for canonicalId in sorted(visitedIds.tolist(), key=lambda cId: cells - emptyCounts[cId]):
+            qValuesDicts = {typeName: dict(enumerate(self.qValues[canonicalId, typeId].tolist()))
+                            for (typeId, typeName) in enumerate(self.typeNames) if self.visited[canonicalId, typeId]}
+            self.printQValuesForPattern(self.index.canonicalBoard(canonicalId), qValuesDicts, output)
@@ -0,0 +1,104 @@
+import numpy as np
+from geometry import TICTACTOE, BoardGeometry
+from typing import Dict, List, Optional, Sequence
+from utils import EMPTYCELL, OMARK, XMARK
+
+"""
+    Vectorized versions of the board functions in utils.
+    A batch of N boards is an (N, cells) int8 array with EMPTY, X and O cell values,
+    the same digits stateIndex uses for base-3 codes. Each function handles the whole batch in one call.
+"""
+
+EMPTY: int = 0
+X: int = 1
+O: int = 2
+
+CELLVALUES: Dict[str, int] = {EMPTYCELL: EMPTY, XMARK: X, OMARK: O}
+# The marks for the values returned by theWinner and whoseMove. theWinner uses EMPTY for no winner.
+VALUEMARKS: List[Optional[str]] = [None, XMARK, OMARK]
+
+# The win lines of each geometry as an (L, k) index array, built the first time it is needed.
+_lineIndexes: Dict[BoardGeometry, np.ndarray] = {}
+
+
+def codes(boards: np.ndarray) -> np.ndarray:
+    """
+    The base-3 code of each board, as in stateIndex.encode.
+    :param boards: (N, cells) array
+    :return: (N,) int64 array
+    """
+    powers = 3 ** np.arange(boards.shape[1], dtype=np.int64)
+    return boards.astype(np.int64) @ powers
+
+def emptyCellsCount(boards: np.ndarray) -> np.ndarray:
+    return np.count_nonzero(boards == EMPTY, axis=1)
+
+def fromBoards(boards: Sequence[str]) -> np.ndarray:
+    """
+    Convert board strings to a batch. All the boards must be the same size.
+    """
+    marks = np.frombuffer(''.join(boards).encode('ascii'), dtype=np.uint8).reshape(len(boards), -1)
+    array = np.zeros(marks.shape, dtype=np.int8)
+    array[marks == ord(XMARK)] = X
+    array[marks == ord(OMARK)] = O
+    return array
+
+def lineIndex(geometry: BoardGeometry=TICTACTOE) -> np.ndarray:
+    if geometry not in _lineIndexes:
+        _lineIndexes[geometry] = np.array(geometry.winLines, dtype=np.intp)
+    return _lineIndexes[geometry]
+
+def newBoards(n: int, geometry: BoardGeometry=TICTACTOE) -> np.ndarray:
+    return np.zeros((n, geometry.cells), dtype=np.int8)
+
+def setMove(boards: np.ndarray, moves: np.ndarray, marks: Optional[np.ndarray]=None) -> np.ndarray:
+    """
+    Puts marks[i] at position moves[i] of boards[i]. A copy is made, as in utils.setMove.
+    :param boards: (N, cells) array
+    :param moves: (N,) array of cells
+    :param marks: (N,) array of X or O; by default, whoever is to move on each board.
+    :return: the updated boards
+    """
+    if marks is None:
+        marks = whoseMove(boards)
+    nextBoards = boards.copy()
+    nextBoards[np.arange(len(boards)), moves] = marks
+    return nextBoards
+
+def theWinner(boards: np.ndarray, geometry: BoardGeometry=TICTACTOE) -> np.ndarray:
+    """
+    The winner of each board: X, O, or EMPTY if there is none.
+    :param boards: (N, cells) array
+    :param geometry:
+    :return: (N,) int8 array
+    """
+    # (N, L, k): the marks on every win line of every board.
+    lineMarks = boards[:, lineIndex(geometry)]
+    xWins = np.all(lineMarks == X, axis=2).any(axis=1)
+    oWins = np.all(lineMarks == O, axis=2).any(axis=1)
+    return np.where(xWins, X, np.where(oWins, O, EMPTY)).astype(np.int8)
+
+def toBoards(boards: np.ndarray) -> List[str]:
+    """
+    Convert a batch back to board strings.
+    """
+    marks = np.array([ord(EMPTYCELL), ord(XMARK), ord(OMARK)], dtype=np.uint8)[boards]
+    return [row.tobytes().decode('ascii') for row in marks]
+
+def validMoves(boards: np.ndarray) -> np.ndarray:
+    """
+    The legal-move mask of each board: True where the cell is empty.
+    :param boards: (N, cells) array
+    :return: (N, cells) bool array
+    """
+    return boards == EMPTY
+
+def whoseMove(boards: np.ndarray) -> np.ndarray:
+    """
+    Whose move it is on each board: X, or O if X has made more moves.
+    :param boards: (N, cells) array
+    :return: (N,) int8 array
+    """
+    xCounts = np.count_nonzero(boards == X, axis=1)
+    oCounts = np.count_nonzero(boards == O, axis=1)
+    return np.where(xCounts > oCounts, O, X).astype(np.int8)
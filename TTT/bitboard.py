@@ -0,0 +1,82 @@
+from geometry import EMPTYCELL, OMARK, TICTACTOE, XMARK, BoardGeometry
+from typing import Dict, List, Optional, Tuple
+
+"""
+    A board as a pair of bit masks, one for X and one for O.
+    Bit i of a mask is set if that player has a mark in cell i.
+    The cells are numbered as in utils.
+                0 1 2
+                3 4 5
+                6 7 8
+    The win masks and lookup tables come from the BoardGeometry, which builds them once.
+    The functions below default to the standard 3 x 3 board.
+"""
+
+Masks = Tuple[int, int]
+
+# The standard board's tables, for code that only plays 3 x 3.
+CELLS: int = TICTACTOE.cells
+FULLMASK: int = TICTACTOE.fullMask
+CELLBITS: Tuple[int, ...] = TICTACTOE.cellBits
+# These are the eight three-element sequences that could make a win, as masks.
+WINMASKS: Tuple[int, ...] = TICTACTOE.winMasks
+# MOVES[emptyMask] is the tuple of cells set in emptyMask, i.e., the valid moves.
+MOVES: Tuple[Tuple[int, ...], ...] = TICTACTOE.movesTable
+
+# Board strings seen so far and their masks. Only boards of at most CACHECELLS cells are cached:
+# there are at most 3**9 of those, but far too many larger ones.
+CACHECELLS: int = 9
+_masksCache: Dict[str, Masks] = {}
+
+
+def emptyMask(xMask: int, oMask: int, geometry: BoardGeometry=TICTACTOE) -> int:
+    return geometry.fullMask & ~(xMask | oMask)
+
+def emptyCount(xMask: int, oMask: int, geometry: BoardGeometry=TICTACTOE) -> int:
+    return geometry.cells - geometry.popcount(xMask | oMask)
+
+def fromMasks(xMask: int, oMask: int, geometry: BoardGeometry=TICTACTOE) -> str:
+    """
+    Convert a pair of masks back to a board string.
+    :param xMask:
+    :param oMask:
+    :param geometry:
+    :return: the board string
+    """
+    return ''.join([XMARK if xMask & bit else OMARK if oMask & bit else EMPTYCELL for bit in geometry.cellBits])
+
+def hasWin(mask: int, geometry: BoardGeometry=TICTACTOE) -> bool:
+    return geometry.hasWin(mask)
+
+def setMove(xMask: int, oMask: int, move: int, mark: str) -> Masks:
+    bit = 1 << move
+    return (xMask | bit, oMask) if mark == XMARK else (xMask, oMask | bit)
+
+def toMasks(board: str) -> Masks:
+    """
+    Convert a board string to its (xMask, oMask) pair. Any cell that is not XMARK or OMARK is empty.
+    Works for any board size. The result for small boards is cached,
+    so repeated conversions of the same board are a single dict lookup.
+    :param board:
+    :return: (xMask, oMask)
+    """
+    masks = _masksCache.get(board)
+    if masks is None:
+        xMask = sum(1 << pos for (pos, cell) in enumerate(board) if cell == XMARK)
+        oMask = sum(1 << pos for (pos, cell) in enumerate(board) if cell == OMARK)
+        masks = (xMask, oMask)
+        if len(board) <= CACHECELLS:
+            _masksCache[board] = masks
+    return masks
+
+def validMoves(xMask: int, oMask: int, geometry: BoardGeometry=TICTACTOE) -> List[int]:
+    return list(geometry.moves(geometry.fullMask & ~(xMask | oMask)))
+
+def whoseMove(xMask: int, oMask: int, geometry: BoardGeometry=TICTACTOE) -> str:
+    return OMARK if geometry.popcount(xMask) > geometry.popcount(oMask) else XMARK
+
+def winner(xMask: int, oMask: int, geometry: BoardGeometry=TICTACTOE) -> Optional[str]:
+    """
+    Is there a winner? If so return its mark. Otherwise, return None.
+    """
+    return XMARK if geometry.hasWin(xMask) else OMARK if geometry.hasWin(oMask) else None
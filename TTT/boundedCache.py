@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NoReturn, Optional
+
+"""
+    A memo for a one-argument function, with a capacity and counters.
+
+    Unlike functools.lru_cache on a method, each object makes its own cache, so caches are not shared
+    between instances, do not keep them alive, and can be sized and cleared one at a time.
+
+    Eviction policies, used when a new entry would exceed the capacity:
+        LRU   drop the least recently used entry (each hit moves its entry to the end)
+        FIFO  drop the oldest entry (hits are cheaper: nothing moves)
+"""
+
+LRU: str = 'lru'
+FIFO: str = 'fifo'
+
+# Enough for every reachable 3 x 3 board several times over.
+DEFAULTCAPACITY: int = 1 << 16
+
+# Marks a key that is not in the cache. (None may be a cached value.)
+_MISSING = object()
+
+
+class BoundedCache:
+
+    def __init__(self, function: Callable[[Hashable], Any], capacity: Optional[int]=DEFAULTCAPACITY,
+                 policy: str=LRU) -> NoReturn:
+        """
+        :param function: the function whose results are cached.
+        :param capacity: the most entries kept. None means no limit.
+        :param policy: LRU or FIFO.
+        """
+        assert policy in (LRU, FIFO), f'Unknown eviction policy: {policy}.'
+        assert capacity is None or capacity > 0, f'Capacity must be positive: {capacity}.'
+        self.function = function
+        self.capacity = capacity
+        self.policy = policy
+        self.isLRU = policy == LRU
+        self.entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __call__(self, key: Hashable) -> Any:
+        entries = self.entries
+        value = entries.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            if self.isLRU:
+                entries.move_to_end(key)
+            return value
+        self.misses += 1
+        value = self.function(key)
+        entries[key] = value
+        if self.capacity is not None and len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self) -> NoReturn:
+        """
+        Drop all the entries and reset the counters.
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.entries), 'capacity': self.capacity, 'policy': self.policy}
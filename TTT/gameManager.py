@@ -1,25 +1,52 @@
 
+import bitboard
+from bitboard import Masks
+from gameRecord import Record, encode
+from geometry import TICTACTOE, BoardGeometry
 from itertools import zip_longest
+from output import GAMES, PROGRESS, Output, output
 # noinspection PyUnresolvedReferences
 from players import HardWiredPlayer, HumanPlayer, LearningPlayer, MinimaxPlayer, \
                     Player, WinsBlocksPlayer, WinsBlocksForksPlayer
-from typing import ClassVar, Dict, NoReturn, Optional, Union
-from utils import NEWBOARD, XMARK, OMARK, \
-                  emptyCellsCount, formatBoard, isAvailable, render, setMove, theWinner, whoseMove
+from rng import RNG
+from stateSpace import NOSTATE, StateSpace, getStateSpace
+from typing import ClassVar, Dict, List, NoReturn, Optional, Tuple, Union
+from utils import XMARK, OMARK, \
+                  formatBoard, render, setMove, whoseMove, winnerAfterMove
 
 
 PlayerDict = Dict[str, Union[str, float, Player]]
 
 class GameManager:
 
-    def __init__(self) -> None:
+    def __init__(self, geometry: BoardGeometry=TICTACTOE, output: Output=output, rng: Optional[RNG]=None) -> None:
 
+        self.geometry = geometry
+        # Where replays and messages go, and which of them are shown.
+        self.output = output
+        # Each game gets its own stream, split from this one. If no RNG is given, games are not reproducible.
+        self.rng: RNG = RNG() if rng is None else rng
+        self.gamesPlayed: int = 0
         self.XDict: Optional[PlayerDict] = None
         self.ODict: Optional[PlayerDict] = None
+        # All reachable boards with their winners, successors, etc. precomputed.
+        # Only available for the standard board. Other boards are played directly on the board strings.
+        self.states: Optional[StateSpace] = getStateSpace() if geometry == TICTACTOE else None
+        # The number of moves made so far in the current game.
+        self.movesMade: int = 0
+        # The (xMask, oMask) of the current board. They are kept up to date move by move and passed to the players,
+        # so no one re-derives them from the board string.
+        self.masks: Masks = (0, 0)
+        # The moves of the current (or last) game, and its winner. Used by gameRecord.
+        self.moves: List[int] = []
+        self.winnerMark: Optional[str] = None
 
     # noinspection PyTypeChecker
     def gameLoop(self, isATestGame: bool=True) -> (PlayerDict, str):
-        board = NEWBOARD
+        board = self.geometry.newBoard
+        self.movesMade = 0
+        self.masks = (0, 0)
+        self.moves = []
 
         # X always makes the first move.
         currentPlayerDict: PlayerDict = self.XDict
@@ -28,10 +55,12 @@ class GameManager:
         while not done:
             player: Player = currentPlayerDict['player']
             reward: int = currentPlayerDict['cachedReward']
-            move: int = player.makeAMove(reward, board, isATestGame)
+            move: int = player.makeAMove(reward, board, isATestGame, self.masks)
+            self.moves.append(move)
             (winnerDict, board) = self.step(board, move)
-            done = winnerDict is not None or emptyCellsCount(board) == 0
+            done = winnerDict is not None or self.movesMade == self.geometry.cells
             currentPlayerDict = self.otherDict(currentPlayerDict)
+        self.winnerMark = None if winnerDict is None else winnerDict['mark']
 
         # Tell the players the final reward for the game.
         currentPlayerDict['player'].finalReward(currentPlayerDict['cachedReward'])
@@ -39,6 +68,14 @@ class GameManager:
         otherPlayerDict['player'].finalReward(otherPlayerDict['cachedReward'])
         return (winnerDict, board)
 
+    def gameRecord(self) -> Record:
+        """
+        The last game played, packed by gameRecord.encode.
+        gameRecord.sarsLists(record) rebuilds the players' sarsLists from it.
+        """
+        return encode(self.moves, self.winnerMark,
+                      self.XDict['player'].typeName, self.ODict['player'].typeName, self.geometry)
+
     def markToPlayerDict(self, mark: str) -> PlayerDict:
         return self.XDict if mark is XMARK else self.ODict
 
@@ -54,26 +91,33 @@ class GameManager:
         result = result1 + result2
         if HumanPlayer in [type(self.XDict['player']), type(self.ODict['player'])]:
             print('\n\n' + result)
-            render(finalBoard)
+            render(finalBoard, self.geometry)
         return (finalBoard, result)
 
     def printReplay(self, finalBoard: str, result: str) -> NoReturn:
+        # Don't build the replay unless it will be shown.
+        if not self.output.isEnabled(GAMES):
+            return
+        write = self.output.print
         xMoves = self.XDict['player'].sarsList
         oMoves = self.ODict['player'].sarsList
-        print(f'\n\nReplay: {self.XDict["player"].typeName} (X) vs {self.ODict["player"].typeName} (O)')
+        write(f'\n\nReplay: {self.XDict["player"].typeName} (X) vs {self.ODict["player"].typeName} (O)')
         # xMoves will be one longer than oMoves unless O wins. Make an extra oMove (None, None, None) if necessary.
         zippedMoves = list(zip_longest(xMoves, oMoves, fillvalue=(None, None, None, None)))
         for xoMoves in zippedMoves:
             ((xBoard, xMove, _, _), (oBoard, oMove, _, _)) = xoMoves
             # Don't print the initial empty board.
-            print("" if xBoard == NEWBOARD else formatBoard(xBoard) + "\n", f'\nX -> {xMove}')
+            write("" if xBoard == self.geometry.newBoard else formatBoard(xBoard, self.geometry) + "\n",
+                  f'\nX -> {xMove}')
             if oBoard is not None:
-                print(f'{formatBoard(oBoard)}\n\nO -> {oMove}')
-        print(f'{formatBoard(finalBoard)}\n{result}')
+                write(f'{formatBoard(oBoard, self.geometry)}\n\nO -> {oMove}')
+        write(f'{formatBoard(finalBoard, self.geometry)}\n{result}')
 
     def reset(self, xPlayerClass: ClassVar, oPlayerClass: ClassVar) -> NoReturn:
-        xPlayer: Player = xPlayerClass(XMARK)
-        oPlayer: Player = oPlayerClass(OMARK)
+        gameRng: RNG = self.rng.spawn('game', self.gamesPlayed)
+        self.gamesPlayed += 1
+        xPlayer: Player = xPlayerClass(XMARK, self.geometry, gameRng)
+        oPlayer: Player = oPlayerClass(OMARK, self.geometry, gameRng)
         self.XDict: PlayerDict = {'mark': XMARK, 'cachedReward': None, 'player': xPlayer}
         self.ODict: PlayerDict = {'mark': OMARK, 'cachedReward': None, 'player': oPlayer}
         xPlayer.reset()
@@ -87,27 +131,30 @@ class GameManager:
         :param move:
         :return: (winnerDict, updatedBoard)
         """
-        currentPlayerDict: PlayerDict = self.whoseTurn(board)
+        (mark, updatedBoard) = self.nextBoard(board, move)
+        currentPlayerDict: PlayerDict = self.markToPlayerDict(mark)
         otherPlayerDict: PlayerDict = self.otherDict(currentPlayerDict)
 
         # The following are all game-ending cases.
-        if not isAvailable(board, move):
+        if updatedBoard is None:
             # Illegal move. currentPlayerDict loses.
             # Illegal moves should be blocked and should not occur.
             currentPlayerDict['cachedReward'] = -100
             otherPlayerDict['cachedReward'] = 100
-            print(f'\n\nInvalid move by {currentPlayerDict["mark"]}: {move}.', end='')
+            self.output.say(PROGRESS, f'\n\nInvalid move by {currentPlayerDict["mark"]}: {move}.', end='')
             return (otherPlayerDict, board)
 
-        updatedBoard = setMove(board, move, currentPlayerDict['mark'])
-        if theWinner(updatedBoard):
+        self.movesMade += 1
+        self.masks = bitboard.setMove(*self.masks, move, mark)
+        (winner, isFull) = winnerAfterMove(self.masks, move, mark, self.movesMade, self.geometry)
+        if winner:
             # The current player just won the game with
             # its current move.
             currentPlayerDict['cachedReward'] = 100
             otherPlayerDict['cachedReward'] = -100
             return (currentPlayerDict, updatedBoard)
 
-        if emptyCellsCount(updatedBoard) == 0:
+        if isFull:
             # The game is over. It's a tie.
             currentPlayerDict['cachedReward'] = 0
             otherPlayerDict['cachedReward'] = 0
@@ -118,8 +165,26 @@ class GameManager:
         currentPlayerDict['cachedReward'] = 1
         return (None, updatedBoard)
 
+    def nextBoard(self, board: str, move: int) -> Tuple[str, Optional[str]]:
+        """
+        Who is to move on board, and the board after they make move.
+        Uses the state table when there is one. Otherwise board must be the current board, whose masks are self.masks.
+        :param board:
+        :param move:
+        :return: (mark, updatedBoard); updatedBoard is None if move is not legal.
+        """
+        if self.states is not None:
+            stateId: int = self.states.ids[board]
+            nextStateId: int = self.states.successors[stateId][move]
+            return (self.states.toMove[stateId], None if nextStateId == NOSTATE else self.states.boards[nextStateId])
+        (xMask, oMask) = self.masks
+        # X moves first.
+        mark: str = XMARK if self.movesMade % 2 == 0 else OMARK
+        isLegal = not (xMask | oMask) & self.geometry.cellBits[move]
+        return (mark, setMove(board, move, mark) if isLegal else None)
+
     def whoseTurn(self, board: str) -> PlayerDict:
-        mark: str = whoseMove(board)
+        mark: str = whoseMove(board, self.geometry)
         playerDict: PlayerDict = self.markToPlayerDict(mark)
         return playerDict
 
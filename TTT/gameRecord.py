@@ -0,0 +1,152 @@
+from geometry import TICTACTOE, BoardGeometry
+from players import SarsList
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from utils import OMARK, XMARK, isAvailable, setMove
+
+"""
+    A finished game packed into one int.
+
+    From the least significant bit up, a record holds:
+        the number of moves          (cells.bit_length() bits)
+        the outcome                  (2 bits: 0 tie, 1 X won, 2 O won)
+        X's player type              (4 bits, an index into PLAYERTYPES)
+        O's player type              (4 bits)
+        the moves, first move lowest ((cells - 1).bit_length() bits each)
+
+    A 3 x 3 game fits in 50 bits, so 7 bytes on disk. The sars lists the players
+    built during the game can be regenerated from the record with sarsLists.
+"""
+
+# Player type names, by id. Add new types at the end so that stored records keep their meaning.
+PLAYERTYPES: Tuple[str, ...] = ('Player', 'HumanPlayer', 'LearningPlayer', 'WinsBlocksForksPlayer',
+                                'WinsBlocksPlayer', 'HardWiredPlayer', 'MinimaxPlayer')
+PLAYERTYPEIDS: Dict[str, int] = {typeName: typeId for (typeId, typeName) in enumerate(PLAYERTYPES)}
+TYPEBITS: int = 4
+
+# The winner, by outcome id. None is a tie.
+OUTCOMES: Tuple[Optional[str], ...] = (None, XMARK, OMARK)
+OUTCOMEIDS: Dict[Optional[str], int] = {winner: outcomeId for (outcomeId, winner) in enumerate(OUTCOMES)}
+OUTCOMEBITS: int = 2
+
+# The rewards GameManager.step gives.
+WINREWARD: int = 100
+LOSSREWARD: int = -100
+TIEREWARD: int = 0
+EXTENDREWARD: int = 1
+
+Record = int
+
+
+def countBits(geometry: BoardGeometry=TICTACTOE) -> int:
+    return geometry.cells.bit_length()
+
+def moveBits(geometry: BoardGeometry=TICTACTOE) -> int:
+    return max(1, (geometry.cells - 1).bit_length())
+
+def recordBytes(geometry: BoardGeometry=TICTACTOE) -> int:
+    """
+    The number of bytes each record takes in toBytes and writeRecords.
+    """
+    bits = countBits(geometry) + OUTCOMEBITS + 2*TYPEBITS + geometry.cells * moveBits(geometry)
+    return (bits + 7) // 8
+
+def decode(record: Record, geometry: BoardGeometry=TICTACTOE) -> Tuple[List[int], Optional[str], str, str]:
+    """
+    Unpack a record.
+    :param record:
+    :param geometry: the geometry the record was encoded with.
+    :return: (moves, winner, xTypeName, oTypeName). winner is None for a tie.
+    """
+    nBits = countBits(geometry)
+    count = record & ((1 << nBits) - 1)
+    record >>= nBits
+    winner = OUTCOMES[record & ((1 << OUTCOMEBITS) - 1)]
+    record >>= OUTCOMEBITS
+    xTypeName = PLAYERTYPES[record & ((1 << TYPEBITS) - 1)]
+    record >>= TYPEBITS
+    oTypeName = PLAYERTYPES[record & ((1 << TYPEBITS) - 1)]
+    record >>= TYPEBITS
+    mBits = moveBits(geometry)
+    moveMask = (1 << mBits) - 1
+    moves = []
+    for _ in range(count):
+        moves.append(record & moveMask)
+        record >>= mBits
+    return (moves, winner, xTypeName, oTypeName)
+
+def encode(moves: List[int], winner: Optional[str], xTypeName: str, oTypeName: str,
+           geometry: BoardGeometry=TICTACTOE) -> Record:
+    """
+    Pack a game into a record.
+    :param moves: the moves in the order they were made, X's first.
+    :param winner: XMARK, OMARK, or None for a tie.
+    :param xTypeName: X's typeName, one of PLAYERTYPES.
+    :param oTypeName: O's typeName.
+    :param geometry:
+    :return: the record
+    """
+    assert len(moves) <= geometry.cells, f'{len(moves)} moves is more than a {geometry.cells}-cell board allows.'
+    assert xTypeName in PLAYERTYPEIDS and oTypeName in PLAYERTYPEIDS, \
+           f'Unknown player type {xTypeName} or {oTypeName}. Add it to PLAYERTYPES.'
+    mBits = moveBits(geometry)
+    record = 0
+    for move in reversed(moves):
+        record = (record << mBits) | move
+    record = (record << TYPEBITS) | PLAYERTYPEIDS[oTypeName]
+    record = (record << TYPEBITS) | PLAYERTYPEIDS[xTypeName]
+    record = (record << OUTCOMEBITS) | OUTCOMEIDS[winner]
+    return (record << countBits(geometry)) | len(moves)
+
+def fromBytes(data: bytes) -> Record:
+    return int.from_bytes(data, 'little')
+
+def toBytes(record: Record, geometry: BoardGeometry=TICTACTOE) -> bytes:
+    return record.to_bytes(recordBytes(geometry), 'little')
+
+def readRecords(file: BinaryIO, geometry: BoardGeometry=TICTACTOE) -> Iterator[Record]:
+    """
+    The records in a file written by writeRecords, one at a time.
+    """
+    size = recordBytes(geometry)
+    data = file.read(size)
+    while len(data) == size:
+        yield fromBytes(data)
+        data = file.read(size)
+
+def sarsLists(record: Record, geometry: BoardGeometry=TICTACTOE) -> Tuple[SarsList, SarsList]:
+    """
+    Replay a record and build the sars lists X and O had at the end of the game.
+    Each move's reward is EXTENDREWARD unless it is the player's last move,
+    in which case it is the reward for the outcome.
+    :param record:
+    :param geometry:
+    :return: (X's sarsList, O's sarsList)
+    """
+    (moves, winner, _, _) = decode(record, geometry)
+    # boards[i] is the board before moves[i]. An illegal move leaves the board unchanged; it ends the game.
+    boards = []
+    board = geometry.newBoard
+    for (i, move) in enumerate(moves):
+        boards.append(board)
+        if isAvailable(board, move):
+            board = setMove(board, move, OMARK if i % 2 else XMARK)
+    finalRewards = ((TIEREWARD, TIEREWARD) if winner is None else
+                    (WINREWARD, LOSSREWARD) if winner == XMARK else
+                    (LOSSREWARD, WINREWARD))
+    lists: Tuple[SarsList, SarsList] = ([], [])
+    for (i, move) in enumerate(moves):
+        if i + 2 < len(moves):
+            lists[i % 2].append((boards[i], move, EXTENDREWARD, boards[i + 2]))
+        else:
+            lists[i % 2].append((boards[i], move, finalRewards[i % 2], None))
+    return lists
+
+def writeRecords(file: BinaryIO, records: Iterable[Record], geometry: BoardGeometry=TICTACTOE) -> int:
+    """
+    Append records to a binary file, recordBytes(geometry) bytes each.
+    :return: the number of records written
+    """
+    size = recordBytes(geometry)
+    data = b''.join(record.to_bytes(size, 'little') for record in records)
+    file.write(data)
+    return len(data) // size
@@ -0,0 +1,169 @@
+from typing import Callable, List, NoReturn, Optional, Tuple
+
+"""
+    The shape of the game: a board of rows x cols cells on which k marks in a row win.
+    Cells are numbered row by row. For the standard 3 x 3 board:
+                0 1 2
+                3 4 5
+                6 7 8
+    Everything that depends on the shape (win lines, symmetries, corners, labels, bit masks)
+    is computed once, when the BoardGeometry is created.
+"""
+
+EMPTYCELL: str = '.'
+XMARK: str = 'X'
+OMARK: str = 'O'
+
+# Boards with at most this many cells get full lookup tables indexed by mask.
+TABLECELLS: int = 12
+
+
+class BoardGeometry:
+
+    def __init__(self, rows: int=3, cols: int=3, k: int=3) -> NoReturn:
+        """
+        :param rows:
+        :param cols:
+        :param k: the number of marks in a row needed to win.
+        """
+        assert 0 < k <= max(rows, cols), f'Cannot get {k} in a row on a {rows} x {cols} board.'
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.cells = rows * cols
+        self.isSquare = rows == cols
+
+        self.newBoard: str = EMPTYCELL * self.cells
+        # The label of each cell, e.g., for formatBoard and HumanPlayer.
+        self.labels: List[str] = [str(pos) for pos in range(self.cells)]
+
+        self.cellBits: Tuple[int, ...] = tuple(1 << pos for pos in range(self.cells))
+        self.fullMask: int = (1 << self.cells) - 1
+
+        # All k-in-a-row sequences, ordered: diagonals, anti-diagonals, rows, columns.
+        self.winLines: List[Tuple[int, ...]] = (self._lines(1, 1) + self._lines(1, -1) +
+                                                self._lines(0, 1) + self._lines(1, 0))
+        self.winMasks: Tuple[int, ...] = tuple(self.lineMask(line) for line in self.winLines)
+        # For each cell, the win lines (and their masks) that include it.
+        self.linesThroughCell: List[List[Tuple[int, ...]]] = [[line for line in self.winLines if pos in line]
+                                                             for pos in range(self.cells)]
+        self.winMasksThroughCell: List[Tuple[int, ...]] = [tuple(self.lineMask(line) for line in lines)
+                                                           for lines in self.linesThroughCell]
+
+        lastRow = (rows - 1) * cols
+        self.corners: List[int] = sorted({0, cols - 1, lastRow, lastRow + cols - 1})
+        # The single center cell, if there is one.
+        self.center: Optional[int] = (rows // 2) * cols + cols // 2 if rows % 2 == 1 and cols % 2 == 1 else None
+        # Edge cells that are not corners.
+        self.sides: List[int] = [pos for pos in range(self.cells)
+                                 if pos not in self.corners and (pos // cols in (0, rows - 1) or
+                                                                 pos % cols in (0, cols - 1))]
+
+        # The symmetries of the board as permutations: the transformed board is ''.join(board[i] for i in perm).
+        # transforms[t] is the (rotations, flips) pair that produces symmetries[t]: r clockwise quarter turns
+        # followed by f flips about the center column. Non-square boards only have half turns (r in 0, 2).
+        self.transforms: List[Tuple[int, int]] = [(r, f) for r in (range(4) if self.isSquare else (0, 2))
+                                                  for f in range(2)]
+        self.symmetries: List[Tuple[int, ...]] = [self._symmetry(r, f) for (r, f) in self.transforms]
+        # inverseSymmetries[t][pos] is where the mark in cell pos goes under symmetries[t].
+        self.inverseSymmetries: List[Tuple[int, ...]] = [self._inverse(perm) for perm in self.symmetries]
+
+        # Lookup functions. Small boards use tables indexed by mask; larger ones compute the answer.
+        self.hasWin: Callable[[int], bool]
+        self.popcount: Callable[[int], int]
+        self.moves: Callable[[int], Tuple[int, ...]]
+        if self.cells <= TABLECELLS:
+            masks = range(self.fullMask + 1)
+            self.isWinTable: Tuple[bool, ...] = tuple(self._hasWin(mask) for mask in masks)
+            self.popcountTable: Tuple[int, ...] = tuple(bin(mask).count('1') for mask in masks)
+            self.movesTable: Tuple[Tuple[int, ...], ...] = tuple(self._moves(mask) for mask in masks)
+            self.hasWin = self.isWinTable.__getitem__
+            self.popcount = self.popcountTable.__getitem__
+            self.moves = self.movesTable.__getitem__
+        else:
+            self.hasWin = self._hasWin
+            self.popcount = int.bit_count
+            self.moves = self._movesOfBits
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BoardGeometry) and (self.rows, self.cols, self.k) == (other.rows, other.cols, other.k)
+
+    def __hash__(self) -> int:
+        return hash((self.rows, self.cols, self.k))
+
+    def __repr__(self) -> str:
+        return f'BoardGeometry({self.rows}, {self.cols}, {self.k})'
+
+    def hasWinThrough(self, mask: int, pos: int) -> bool:
+        """
+        Does mask cover a win line through pos? Only these lines can be new wins after a move at pos.
+        """
+        for winMask in self.winMasksThroughCell[pos]:
+            if mask & winMask == winMask:
+                return True
+        return False
+
+    def lineMask(self, line: Tuple[int, ...]) -> int:
+        return sum(self.cellBits[pos] for pos in line)
+
+    # =================================================================================
+    # These build the tables. They are also used directly for boards too large for tables.
+    def _hasWin(self, mask: int) -> bool:
+        for winMask in self.winMasks:
+            if mask & winMask == winMask:
+                return True
+        return False
+
+    @staticmethod
+    def _inverse(perm: Tuple[int, ...]) -> Tuple[int, ...]:
+        inverse = [0] * len(perm)
+        for (pos, source) in enumerate(perm):
+            inverse[source] = pos
+        return tuple(inverse)
+
+    def _lines(self, dRow: int, dCol: int) -> List[Tuple[int, ...]]:
+        """
+        All k-long lines going in direction (dRow, dCol).
+        """
+        lines = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                (endRow, endCol) = (row + dRow * (self.k - 1), col + dCol * (self.k - 1))
+                if 0 <= endRow < self.rows and 0 <= endCol < self.cols:
+                    lines.append(tuple((row + dRow * i) * self.cols + col + dCol * i for i in range(self.k)))
+        return lines
+
+    def _moves(self, mask: int) -> Tuple[int, ...]:
+        return tuple(pos for (pos, bit) in enumerate(self.cellBits) if mask & bit)
+
+    @staticmethod
+    def _movesOfBits(mask: int) -> Tuple[int, ...]:
+        """
+        Like _moves, but visits only the set bits, lowest first, rather than every cell.
+        """
+        moves = []
+        while mask:
+            lowBit = mask & -mask
+            moves.append(lowBit.bit_length() - 1)
+            mask ^= lowBit
+        return tuple(moves)
+
+    def _symmetry(self, r: int, f: int) -> Tuple[int, ...]:
+        (rows, cols) = (self.rows, self.cols)
+        perm = tuple(range(self.cells))
+        if self.isSquare:
+            # A clockwise quarter turn: cell (row, col) gets the mark from cell (rows-1-col, row).
+            rotatePattern = [(rows - 1 - col) * cols + row for row in range(rows) for col in range(cols)]
+            for _ in range(r):
+                perm = tuple(perm[i] for i in rotatePattern)
+        elif r == 2:
+            perm = tuple(reversed(perm))
+        # A flip about the center column: cell (row, col) gets the mark from cell (row, cols-1-col).
+        flipPattern = [row * cols + cols - 1 - col for row in range(rows) for col in range(cols)]
+        for _ in range(f):
+            perm = tuple(perm[i] for i in flipPattern)
+        return perm
+
+
+# The standard game.
+TICTACTOE = BoardGeometry(3, 3, 3)
@@ -0,0 +1,79 @@
+import sys
+from typing import Callable, NoReturn, Optional, TextIO, Union
+
+"""
+    Where the GameManager, Trainer and QTable send what they print, and how much of it.
+    Each message has a level. It is written only if the Output's level is at least that high.
+    Messages may be passed as functions that build the text, so nothing is formatted
+    when the level is too low to show it.
+
+    Levels:
+        QUIET     nothing
+        PROGRESS  training progress: one line per segment, start and end of training
+        GAMES     game replays
+        TABLES    the contents of the QTable
+"""
+
+QUIET: int = 0
+PROGRESS: int = 1
+GAMES: int = 2
+TABLES: int = 3
+
+Message = Union[str, Callable[[], str]]
+
+
+class Output:
+
+    def __init__(self, level: int=TABLES, fileName: Optional[str]=None) -> NoReturn:
+        """
+        :param level: the highest level that is written.
+        :param fileName: write to this file rather than to stdout.
+        """
+        self.level = level
+        self.sink: TextIO = sys.stdout
+        self.ownsSink = False
+        if fileName is not None:
+            self.setSink(fileName)
+
+    def close(self) -> NoReturn:
+        """
+        Close the file (if any) and go back to stdout.
+        """
+        if self.ownsSink:
+            self.sink.close()
+        self.sink = sys.stdout
+        self.ownsSink = False
+
+    def isEnabled(self, level: int) -> bool:
+        return level <= self.level
+
+    def print(self, *args, sep: str=' ', end: str='\n') -> NoReturn:
+        """
+        Like the builtin print, but to the sink. Callers check isEnabled first.
+        """
+        print(*args, sep=sep, end=end, file=self.sink)
+
+    def say(self, level: int, message: Message, end: str='\n') -> NoReturn:
+        """
+        Write message if level is enabled.
+        :param level:
+        :param message: the text, or a function that builds it. The function is called only if level is enabled.
+        :param end:
+        """
+        if level <= self.level:
+            print(message if isinstance(message, str) else message(), end=end, file=self.sink)
+
+    def setLevel(self, level: int) -> NoReturn:
+        self.level = level
+
+    def setSink(self, fileName: str) -> NoReturn:
+        """
+        Write to fileName (appending) instead of the current sink.
+        """
+        self.close()
+        self.sink = open(fileName, 'a')
+        self.ownsSink = True
+
+
+# The Output used unless another is given. Everything is shown, as before there were levels.
+output = Output()
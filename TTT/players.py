@@ -1,10 +1,11 @@
 
-from qTable import qTable
-from random import choice
+import bitboard
+from bitboard import Masks
+from geometry import TICTACTOE, BoardGeometry
+from qTable import getQTable
+from rng import RNG, defaultRNG
 from typing import List, NoReturn, Optional, Set, Tuple
-from utils import CENTER, CORNERS, LABELLEDBOARD, OMARK, SIDES, XMARK, \
-                  emptyCellsCount, formatBoard, isAvailable, marksAtTriple, possibleWinners, \
-                  oppositeCorner, otherMark, setMove, theWinner, validMoves, whoseMove
+from utils import OMARK, XMARK, formatBoard, isAvailable, oppositeCorner, otherMark, winnerAfterMove
 
 # A list of (board, move, reward, nextBoard) tuples for a game.
 SarsList = List[Tuple[str, int, float, Optional[str]]]
@@ -16,12 +17,18 @@ class Player:
     0 1 2
     3 4 5
     6 7 8
+    Other board shapes are described by a BoardGeometry.
     """
 
-    def __init__(self, myMark: str) -> NoReturn:
+    def __init__(self, myMark: str, geometry: BoardGeometry=TICTACTOE, rng: RNG=defaultRNG) -> NoReturn:
         self.isATestGame = None
+        self.geometry = geometry
+        # Every random choice the player makes comes from here.
+        self.rng = rng
         self.myMark = myMark
         self.opMark = otherMark(myMark)
+        # The (xMask, oMask) of the board being moved on. See makeAMove.
+        self.masks: Masks = (0, 0)
         # The previous board and move before being entered into the SarsList.
         self.prevBoardMove: Optional[Tuple[str, int]] = None
         self.sarsList: SarsList = []
@@ -38,15 +45,18 @@ class Player:
         self.sarsList.append((board, move, reward, None))
         return self.sarsList
 
-    def makeAMove(self, reward: float, board: str, isATestGame: bool=True) -> int:
+    def makeAMove(self, reward: float, board: str, isATestGame: bool=True, masks: Optional[Masks]=None) -> int:
         """
         Called by the GameManager to get this player's move.
         :param reward: The reward from the previous move.
         :param board: The board after the previous move.
         :param isATestGame:
+        :param masks: board's (xMask, oMask). The GameManager keeps them up to date; if not given,
+                      they are computed from board.
         :return: A move
         """
         self.isATestGame = isATestGame
+        self.masks = bitboard.toMasks(board) if masks is None else masks
         # self._makeAMove selects the move.
         move = self._makeAMove(board)
         self.updateSarsList(reward, board, move)
@@ -55,9 +65,17 @@ class Player:
     def _makeAMove(self, board: str) -> int:
         """ Select and return a move. Overridden by subclasses. """
         # If not overridden, make a random valid move.
-        move = choice(validMoves(board))
+        move = self.rng.choice(self.availableMoves())
         return move
 
+    def availableMoves(self) -> List[int]:
+        """ The valid moves on the board being moved on, from self.masks. """
+        return bitboard.validMoves(*self.masks, self.geometry)
+
+    def emptyCount(self) -> int:
+        """ The number of empty cells on the board being moved on, from self.masks. """
+        return bitboard.emptyCount(*self.masks, self.geometry)
+
     def reset(self) -> NoReturn:
         self.prevBoardMove = None
         self.sarsList = []
@@ -72,31 +90,38 @@ class Player:
 class HumanPlayer(Player):
 
     def _makeAMove(self, board: str) -> int:
+        labels = self.geometry.labels
         c = '?'
-        while c not in LABELLEDBOARD or not isAvailable(board, int(c)):
+        while c not in labels or not isAvailable(board, int(c)):
             print()
-            if c in LABELLEDBOARD and not isAvailable(board, int(c)):
+            if c in labels and not isAvailable(board, int(c)):
                 print(f'Cell {c} is taken.')
-            if c != '?' and c not in LABELLEDBOARD:
+            if c != '?' and c not in labels:
                 print(f'Invalid move: "{c}".')
-            print(formatBoard(board))
-            # Keep only last character.
-            c = input(f'{self.myMark} to move > ')
-            c = c[-1] if len(c) > 0 else '?'
+            print(formatBoard(board, self.geometry))
+            # Keep only as many characters as the longest label.
+            c = input(f'{self.myMark} to move > ').strip()
+            c = c[-len(labels[-1]):] if len(c) > 0 else '?'
         move = int(c)
         return move
 
 
 class LearningPlayer(Player):
 
+    def __init__(self, myMark: str, geometry: BoardGeometry=TICTACTOE, rng: RNG=defaultRNG) -> NoReturn:
+        super().__init__(myMark, geometry, rng)
+        # The chance of a random move in a training game. The Trainer sets it from its schedule for each game.
+        self.epsilon: float = 1.0
+
     def _makeAMove(self, board: str) -> int:
         """
         Update qValues and select a move based on representative board from this board's equivalence class.
-        Should not be random like the following.
+        In training games, explore with probability epsilon.
         """
         # Either a random move or the move with the highest QValue for this state.
-        move = (qTable.getBestMove(board, self.typeName) if self.isATestGame else
-                choice(validMoves(board))
+        explore = not self.isATestGame and (self.epsilon >= 1 or self.rng.random() < self.epsilon)
+        move = (self.rng.choice(self.availableMoves()) if explore else
+                getQTable(self.geometry).getBestMove(board, self.typeName, self.rng)
                 )
         return move
 
@@ -105,26 +130,35 @@ class WinsBlocksForksPlayer(Player):
 
     def _makeAMove(self, board: str) -> int:
         (myWins, otherWins, myForks, otherForks) = self.winsBlocksForks(board)
-        availCorners = [pos for pos in CORNERS if isAvailable(board, pos)]
-        availCenter = [pos for pos in [CENTER] if isAvailable(board, pos)]
-        availSides = [pos for pos in SIDES if isAvailable(board, pos)]
-        myOppositeCorners = [pos for pos in CORNERS if isAvailable(board, pos) and board[oppositeCorner(pos)] == self.myMark]
-        move = choice([self.findEmptyCell(board, myWin) for myWin in myWins] if myWins else
-                      [self.findEmptyCell(board, otherWin) for otherWin in otherWins] if otherWins else
-                      myForks if myForks else
-                      # If emptyCellsCount(board) == 6, I'm playing 'O'. If a diagonal is XOX, don't take corner.
-                      availSides if board[CENTER] == self.myMark and emptyCellsCount(board) == 6 else
-                      otherForks if otherForks else
-                      availCorners if availCorners and self.myMark == 'X' and len(availCorners)%2 == 0 else
-                      availCenter if availCenter else
-                      myOppositeCorners if board[CENTER] == self.opMark and myOppositeCorners else
-                      availCorners if availCorners else
-                      validMoves(board)
-                      )
+        corners = self.geometry.corners
+        availCorners = [pos for pos in corners if isAvailable(board, pos)]
+        availCenter = [pos for pos in self.centerCells() if isAvailable(board, pos)]
+        availSides = [pos for pos in self.geometry.sides if isAvailable(board, pos)]
+        myOppositeCorners = [pos for pos in corners
+                             if isAvailable(board, pos) and board[oppositeCorner(pos, self.geometry)] == self.myMark]
+        move = self.rng.choice([self.findEmptyCell(board, myWin) for myWin in myWins] if myWins else
+                               [self.findEmptyCell(board, otherWin) for otherWin in otherWins] if otherWins else
+                               myForks if myForks else
+                               # If 3 cells are taken, I'm playing 'O'. If a diagonal is XOX, don't take corner.
+                               availSides if self.hasCenter(board, self.myMark) and
+                                             self.emptyCount() == self.geometry.cells - 3 else
+                               otherForks if otherForks else
+                               availCorners if availCorners and self.myMark == 'X' and len(availCorners)%2 == 0 else
+                               availCenter if availCenter else
+                               myOppositeCorners if self.hasCenter(board, self.opMark) and myOppositeCorners else
+                               availCorners if availCorners else
+                               self.availableMoves()
+                               )
         return move
 
-    @staticmethod
-    def findEmptyCell(board: str, threeInRow: Tuple[int, int, int]) -> int:
+    def centerCells(self) -> List[int]:
+        """ The center cell in a list, or an empty list if the board has no single center. """
+        return [] if self.geometry.center is None else [self.geometry.center]
+
+    def hasCenter(self, board: str, mark: str) -> bool:
+        return self.geometry.center is not None and board[self.geometry.center] == mark
+
+    def findEmptyCell(self, board: str, threeInRow: Tuple[int, ...]) -> int:
         """
         Return a choice of the EMPTYCELL positions in threeInRow. (There is guaranteed to be one.)
         :param board:
@@ -132,10 +166,10 @@ class WinsBlocksForksPlayer(Player):
         :return:
         """
         emptyCells = [index for index in threeInRow if isAvailable(board, index)]
-        return choice(emptyCells)
+        return self.rng.choice(emptyCells)
 
     @staticmethod
-    def findForks(board: str, singletons: List[Tuple[int, int, int]]) -> List[int]:
+    def findForks(board: str, singletons: List[Tuple[int, ...]]) -> List[int]:
         """
         Finds moves that create forks
         :param board:
@@ -147,11 +181,16 @@ class WinsBlocksForksPlayer(Player):
                      for pos in singletons[idx1] if isAvailable(board, pos) and pos in singletons[idx2]}
         return list(forkCells)
 
-    def winsBlocksForks(self, board: str) -> Tuple[List[Tuple[int, int, int]],
-                                                      List[Tuple[int, int, int]],
+    def winsBlocksForks(self, board: str) -> Tuple[List[Tuple[int, ...]],
+                                                      List[Tuple[int, ...]],
                                                       List[int],
                                                       List[int]
                                                      ]:
+        """
+        Classify the win lines. A win (or block) is a line one mark short of k in a row with the rest empty.
+        A singleton is a line two marks short with the rest empty; two singletons sharing an empty cell make a fork.
+        For 3 x 3 these are the usual two-in-a-row and one-in-a-row lines.
+        """
         myWins = []
         mySingletons = []
         otherWins = []
@@ -159,20 +198,26 @@ class WinsBlocksForksPlayer(Player):
         empties = []
         myForks = []
         otherForks = []
-        for threeInRow in possibleWinners:
-            marks = marksAtTriple(board, threeInRow)
-            emptyCellCount = marks.count('.')
-            if emptyCellCount == 3:
+        geometry = self.geometry
+        popcount = geometry.popcount
+        k = geometry.k
+        (xMask, oMask) = self.masks
+        (myMask, opMask) = (xMask, oMask) if self.myMark == XMARK else (oMask, xMask)
+        for (threeInRow, winMask) in zip(geometry.winLines, geometry.winMasks):
+            myCount = popcount(myMask & winMask)
+            opCount = popcount(opMask & winMask)
+            emptyCellCount = k - myCount - opCount
+            if emptyCellCount == k:
                 empties.append(threeInRow)
             if emptyCellCount == 1:
-                if marks.count(self.myMark) == 2:
+                if myCount == k-1:
                     myWins.append(threeInRow)
-                if marks.count(self.opMark) == 2:
+                if opCount == k-1:
                     otherWins.append(threeInRow)
             if emptyCellCount == 2:
-                if marks.count(self.myMark) == 1:
+                if myCount == k-2:
                     mySingletons.append(threeInRow)
-                if marks.count(self.opMark) == 1:
+                if opCount == k-2:
                     otherSingletons.append(threeInRow)
         if not myWins and not otherWins:
             if mySingletons:
@@ -186,10 +231,10 @@ class WinsBlocksPlayer(WinsBlocksForksPlayer):
 
     def _makeAMove(self, board: str) -> int:
         (myWins, otherWins, _, _) = self.winsBlocksForks(board)
-        move = choice([self.findEmptyCell(board, myWin) for myWin in myWins] if myWins else
-                      [self.findEmptyCell(board, otherWin) for otherWin in otherWins] if otherWins else
-                      validMoves(board)
-                      )
+        move = self.rng.choice([self.findEmptyCell(board, myWin) for myWin in myWins] if myWins else
+                               [self.findEmptyCell(board, otherWin) for otherWin in otherWins] if otherWins else
+                               self.availableMoves()
+                               )
         return move
 
 class HardWiredPlayer(WinsBlocksForksPlayer):
@@ -206,47 +251,48 @@ class HardWiredPlayer(WinsBlocksForksPlayer):
         """
 
         (myWins, otherWins, _, _) = self.winsBlocksForks(board)
-        move = choice([self.findEmptyCell(board, myWin) for myWin in myWins] if myWins else
-                      [self.findEmptyCell(board, otherWin) for otherWin in otherWins] if otherWins else
-                      list(self.otherMove(board, emptyCellsCount(board)))
-                      )
+        move = self.rng.choice([self.findEmptyCell(board, myWin) for myWin in myWins] if myWins else
+                               [self.findEmptyCell(board, otherWin) for otherWin in otherWins] if otherWins else
+                               list(self.otherMove(board, self.emptyCount()))
+                               )
         return move
 
-    @staticmethod
-    def otherMove(board: str, emptyCells: int) -> Set[int]:
+    def otherMove(self, board: str, emptyCells: int) -> Set[int]:
         """
-        Special case moves.
+        Special case moves. They are written for 3 x 3; on other boards they are only heuristics.
         :param board:
         :param emptyCells: number of empty cells
         :return: Selected move
         """
-
-        availableCorners = {pos for pos in CORNERS if isAvailable(board, pos)}
-        if emptyCells == 9:
+        cells = self.geometry.cells
+        corners = self.geometry.corners
+        availableCorners = {pos for pos in corners if isAvailable(board, pos)}
+        availableCenter = {pos for pos in self.centerCells() if isAvailable(board, pos)}
+        if emptyCells == cells:
             return availableCorners
-        if emptyCells == 8:
-            return {CENTER} if isAvailable(board, CENTER) else availableCorners
+        if emptyCells == cells - 1:
+            return availableCenter if availableCenter else availableCorners
         # The following is for X's second move. It applies only if X's first move was to a corner.
-        if emptyCells == 7 and board.index(XMARK) in CORNERS:
+        if emptyCells == cells - 2 and board.index(XMARK) in corners:
             oFirstMove = board.index(OMARK)
             # If O's first move is a side cell, X should take the center.
             # Otherwise, X should take the corner opposite its first move.
-            if oFirstMove in SIDES:
-                return {CENTER}
-            if oFirstMove == CENTER:
-                opCorner = oppositeCorner(board.index(XMARK))
+            if oFirstMove in self.geometry.sides and availableCenter:
+                return availableCenter
+            if oFirstMove == self.geometry.center:
+                opCorner = oppositeCorner(board.index(XMARK), self.geometry)
                 return {opCorner}
             return availableCorners
         # If this is O's second move and X has diagonal corners, O should take a side move.
         # If X has two adjacent corners, O blocked (above). So, if there are 2 available corners
         # they are diagonal.
-        if emptyCells == 6 and len(availableCorners) == 2:
-            return {pos for pos in SIDES if isAvailable(board, pos)}
+        if emptyCells == cells - 3 and len(availableCorners) == 2:
+            return {pos for pos in self.geometry.sides if isAvailable(board, pos)}
         # If none of the special cases apply, take the center if available,
         # otherwise a corner, otherwise any valid move.
-        return ({CENTER} if isAvailable(board, CENTER) else
+        return (availableCenter if availableCenter else
                 availableCorners if availableCorners else
-                validMoves(board)
+                self.availableMoves()
                 )
 
 
@@ -254,51 +300,59 @@ class MinimaxPlayer(HardWiredPlayer):
 
     def _makeAMove(self, board: str) -> int:
         # The first few moves are hard-wired into HardWiredPlayer.
-        move = (super()._makeAMove(board) if emptyCellsCount(board) >= 7 else
+        move = (super()._makeAMove(board) if self.emptyCount() >= self.geometry.cells - 2 else
                 # minimax returns (val, move, count). Extract move.
-                self.minimax(board)[1])
+                self.minimax(self.masks)[1])
         return move
 
-    def makeAndEvaluateMove(self, board: str, move: int, mark: str, count: int) -> Tuple[int, int, int]:
+    def makeAndEvaluateMove(self, masks: Masks, move: int, mark: str, count: int,
+                            movesMade: int) -> Tuple[int, int, int]:
         """
         Make the move and evaluate the board.
-        :param board:
+        :param masks: the board's (xMask, oMask). The search works on masks only.
         :param move:
         :param mark:
         :param count: A longer game is better.
+        :param movesMade: The number of marks on the board after this move.
         :return: 'X' is maximizer; 'O' is minimizer
         """
-        boardCopy = setMove(board, move, mark)
-        winner = theWinner(boardCopy)
+        nextMasks = bitboard.setMove(*masks, move, mark)
+        (winner, isFull) = winnerAfterMove(nextMasks, move, mark, movesMade, self.geometry)
         (val, nextCount) = ( ( 1, count) if winner == XMARK else
                              (-1, count) if winner == OMARK else
                              # winner == None. Is the game a tie because board is full?
-                             ( 0, count) if emptyCellsCount(boardCopy) == 0 else
+                             ( 0, count) if isFull else
                              # The game is not over.  Minimax is is called as the argument to this lambda function.
                              # Minimax returns (val, move, count). Select and return val and count.
                              # move is the next player's best move, which we don't return.
-                             (lambda mmResult: (mmResult[0], mmResult[2])) (self.minimax(boardCopy, count) )
+                             (lambda mmResult: (mmResult[0], mmResult[2])) (self.minimax(nextMasks, count, movesMade) )
                           )
         return (val, move, nextCount)
 
-    def minimax(self, board: str, count: int=0) -> (int, int, int):
+    def minimax(self, masks: Masks, count: int=0, movesMade: Optional[int]=None) -> (int, int, int):
         """
         Does a minimax search.
-        :param board:
+        :param masks: the board's (xMask, oMask).
         :param count: The length of the game. A longer count is better.
+        :param movesMade: The number of marks on the board. Counted from the board only at the top of the search;
+                          each level passes its count down.
         :return: (val, move, count): the best minimax val for current player with longest count.
                  The move to achieve that.
         """
-        mark = whoseMove(board)
-        # possMoves are [(val, move, count)] (val in [1, 0, -1]) for move in self.validMoves(board)]
+        if movesMade is None:
+            movesMade = self.geometry.cells - bitboard.emptyCount(*masks, self.geometry)
+        # X moves first, so X is to move whenever an even number of marks are down.
+        mark = XMARK if movesMade % 2 == 0 else OMARK
+        # possMoves are [(val, move, count)] (val in [1, 0, -1]) for move in the valid moves]
         # These are the possible moves considering a full minimax analysis.
-        # The recursive call to minimax is made in self.makeAndEvaluateMove(board, move, mark, count+1)
-        possMoves = [self.makeAndEvaluateMove(board, move, mark, count+1) for move in validMoves(board)]
+        # The recursive call to minimax is made in self.makeAndEvaluateMove(masks, move, mark, count+1, movesMade+1)
+        possMoves = [self.makeAndEvaluateMove(masks, move, mark, count+1, movesMade+1)
+                     for move in bitboard.validMoves(*masks, self.geometry)]
         minOrMax = max if mark == XMARK else min
         (bestVal, _, _) = minOrMax(possMoves, key=lambda possMove: possMove[0])
         bestMoves = [(val, move, count) for (val, move, count) in possMoves if val == bestVal]
         (_, _, longestBestMoveCount) = max(bestMoves, key=lambda possMove: possMove[2])
         # Get all moves with best val and with longest count
         longestBestMoves = [(val, move, count) for (val, move, count) in bestMoves if count == longestBestMoveCount]
-        return choice(longestBestMoves)
+        return self.rng.choice(longestBestMoves)
 
@@ -0,0 +1,127 @@
+import numpy as np
+from geometry import TICTACTOE, BoardGeometry
+from output import Output
+from rng import RNG
+from typing import Callable, Dict, Iterator, List, NoReturn, Protocol, Tuple, runtime_checkable
+
+"""
+    What Trainer and LearningPlayer need from a table of q-values, and the storages that provide it.
+
+    Storages are registered by name, like schedules' curves, and made with makeStorage:
+        DICT    QTable: nested dicts. Any board shape.
+        ARRAY   ArrayQTable: one float32 array. 3 x 3 only.
+        MMAP    an ArrayQTable mapped from a qTableFile file (makeStorage(MMAP, fileName=...)),
+                copy-on-write by default so training does not change the file.
+        SQLITE  a SqliteQTable: entries in an SQLite file (makeStorage(SQLITE, fileName=...)),
+                with the hot ones cached in memory. Any board shape, including ones too big for DICT.
+
+        Trainer(storage=ARRAY)
+        Trainer(storage=MMAP, storageOptions={'fileName': 'q.bin'})
+        registerStorage('myStore', lambda geometry, **kwargs: MyStore(geometry))
+
+    A Trainer installs its storage with qTable.setQTable, which is where LearningPlayers find it.
+    The storage modules are imported only when one of their storages is made.
+"""
+
+DICT: str = 'dict'
+ARRAY: str = 'array'
+MMAP: str = 'mmap'
+SQLITE: str = 'sqlite'
+
+StorageFactory = Callable[..., 'QStore']
+
+_storages: Dict[str, StorageFactory] = {}
+
+
+@runtime_checkable
+class QStore(Protocol):
+    """
+    Boards may be raw or canonical. Moves are cells of the board passed in,
+    except in getBestQMovesFromQBoard, getQValueDict and setEntry, whose moves are canonical.
+    updateQValues is only for storages whose supportsBatch() is True.
+    """
+    geometry: BoardGeometry
+    # Whether equivalent moves on a symmetric board share one q-value. See QTable.
+    collapseSymmetricMoves: bool
+
+    def entries(self) -> Iterator[Tuple[str, str, Dict[int, float]]]:
+        """ (qBoard, typeName, qValueDict) for every entry that has been updated. """
+
+    def getBestMove(self, board: str, typeName: str, rng: RNG=...) -> int:
+        """ A legal move with the best q-value. """
+
+    def getBestQMovesFromQBoard(self, qBoard: str, typeName: str) -> List[int]:
+        """ All the legal moves on a canonical board with the best q-value. """
+
+    def getBestQValue(self, board: str, typeName: str) -> float:
+        """ The best q-value of board. """
+
+    def getQBoard(self, board: str) -> str:
+        """ The canonical form of board. """
+
+    def getQValueDict(self, board: str, typeName: str) -> Dict[int, float]:
+        """ A copy of the q-values of board, by canonical move. """
+
+    def printQTable(self, output: Output=...) -> NoReturn:
+        ...
+
+    def setEntry(self, qBoard: str, typeName: str, qValueDict: Dict[int, float], visitCounts: List[int]) -> NoReturn:
+        """ Replace (or add) the entry of a canonical board. """
+
+    def stats(self) -> Dict[str, int]:
+        ...
+
+    def supportsBatch(self) -> bool:
+        """ Whether updateQValues may be called. """
+
+    def updateQValue(self, board: str, typeName: str, move: int, alpha: float, newQValue: float) -> NoReturn:
+        """ Move the q-value of (board, move) alpha of the way to newQValue. """
+
+    def updateQValues(self, typeName: str, stateIds: np.ndarray, moves: np.ndarray, rewards: np.ndarray,
+                      nextStateIds: np.ndarray, alphas: np.ndarray, gammas: np.ndarray) -> np.ndarray:
+        """ A batch of q-learning updates, with boards given by StateSpace state id. See ArrayQTable. """
+
+
+def getStorage(name: str) -> StorageFactory:
+    assert name in _storages, f'No storage named {name}. Known storages: {sorted(_storages)}'
+    return _storages[name]
+
+def makeStorage(name: str, geometry: BoardGeometry=TICTACTOE, **kwargs) -> QStore:
+    """
+    A new, empty (or loaded) storage.
+    :param name: a registered storage name.
+    :param geometry:
+    :param kwargs: passed to the storage's factory.
+    """
+    return getStorage(name)(geometry, **kwargs)
+
+def registerStorage(name: str, factory: StorageFactory) -> NoReturn:
+    """
+    :param name:
+    :param factory: called as factory(geometry, **kwargs) to make a storage.
+    """
+    _storages[name] = factory
+
+
+def _dictStorage(geometry: BoardGeometry, **kwargs) -> QStore:
+    from qTable import QTable
+    return QTable(geometry, **kwargs)
+
+def _arrayStorage(geometry: BoardGeometry, **kwargs) -> QStore:
+    assert geometry == TICTACTOE, 'The array storage only holds 3 x 3 boards.'
+    from arrayQTable import ArrayQTable
+    return ArrayQTable(**kwargs)
+
+def _mmapStorage(geometry: BoardGeometry, fileName: str, mode: str='c', **kwargs) -> QStore:
+    assert geometry == TICTACTOE, 'The mmap storage only holds 3 x 3 boards.'
+    from qTableFile import loadQTable
+    return loadQTable(fileName, mode, **kwargs)
+
+def _sqliteStorage(geometry: BoardGeometry, fileName: str, **kwargs) -> QStore:
+    from sqliteQTable import SqliteQTable
+    return SqliteQTable(fileName, geometry, **kwargs)
+
+registerStorage(DICT, _dictStorage)
+registerStorage(ARRAY, _arrayStorage)
+registerStorage(MMAP, _mmapStorage)
+registerStorage(SQLITE, _sqliteStorage)
@@ -1,17 +1,21 @@
 
-from collections import defaultdict
-from functools import lru_cache
-from random import choice
-from typing import Dict, List, NoReturn, Tuple
-from utils import NEWBOARD, \
-                  argmaxList, emptyCellsCount, formatBoard, isAvailable, roundDict, setMove, weightedAvg, whoseMove
+import numpy as np
+from boundedCache import DEFAULTCAPACITY, LRU, BoundedCache
+from geometry import TICTACTOE, BoardGeometry
+from operator import itemgetter
+from output import TABLES, Output, output
+from qStore import QStore
+from rng import RNG, defaultRNG
+from typing import Any, Callable, Dict, Iterator, List, NoReturn, Optional, Set, Tuple
+from utils import argmaxList, emptyCellsCount, formatBoard, isAvailable, roundDict, weightedAvg, whoseMove
 
 class QTable:
     """
     This class represents boards that can be associated with equivalence classes of boards.
     The equivalence class of a board are all the boards it can transform into by rotations and flips.
     """
-    def __init__(self) -> NoReturn:
+    def __init__(self, geometry: BoardGeometry=TICTACTOE, cacheCapacity: Optional[int]=DEFAULTCAPACITY,
+                 cachePolicy: str=LRU, collapseSymmetricMoves: bool=True) -> NoReturn:
         """
         Boards are numbered as follows.
 
@@ -25,66 +29,125 @@ class QTable:
                                  etc.
         In other words, it rotates the board 90 degrees clockwise.
         The flip pattern flips the board horizontally about its center column.
-        See transformAux() to see these patterns in action.
 
         0 to 3 rotates and  0 or 1 flip generates all the equivalent boards.
-        See representative() to see how all the equivalent boards are generated.
-        """
-
-        # self.rotatePattern = [6, 3, 0,
-        #                       7, 4, 1,
-        #                       8, 5, 2]
-        self.rotatePattern = ('630' +
-                              '741' +
-                              '852')
-        # self.flipPattern = [2, 1, 0,
-        #                     5, 4, 3,
-        #                     8, 7, 6]
-        self.flipPattern = ('210' +
-                            '543' +
-                            '876')
+        The geometry supplies the pattern for each (rotations, flips) pair. (See BoardGeometry.symmetries.)
+        Boards that are not square only have 0 or 2 rotations.
+        See getQBoardWithRF() to see how all the equivalent boards are generated.
+
+        Some canonical boards are their own image under some transforms (e.g., the empty board under all of them).
+        Moves on such a board that those transforms map onto each other are equivalent. If collapseSymmetricMoves,
+        each class of equivalent moves (an orbit) has one q-value, stored at its smallest cell. See moveOrbits().
+
+        :param geometry:
+        :param cacheCapacity: the most boards whose canonical forms are remembered. None means no limit.
+        :param cachePolicy: which remembered board to drop when the cache is full. See boundedCache.
+        :param collapseSymmetricMoves: keep one q-value per orbit of equivalent moves.
+        """
+        self.geometry = geometry
+
+        # self.patterns[(r, f)] is the combined pattern for r rotations followed by f flips.
+        # For 3 x 3, self.patterns[(1, 0)] is (6, 3, 0,
+        #                                      7, 4, 1,
+        #                                      8, 5, 2)
+        self.patterns: Dict[Tuple[int, int], Tuple[int, ...]] = dict(zip(geometry.transforms, geometry.symmetries))
+        # self.inversePatterns[(r, f)] undoes self.patterns[(r, f)].
+        self.inversePatterns: Dict[Tuple[int, int], Tuple[int, ...]] = dict(zip(geometry.transforms,
+                                                                                geometry.inverseSymmetries))
+        # The patterns as itemgetters, which pick out all the cells in one C call.
+        # self.transformers is in the order of geometry.transforms, so the first of equal boards has the least (r, f).
+        self.transformers: List[Tuple[Callable[[str], Tuple[str, ...]], int, int]] = \
+            [(itemgetter(*self.patterns[(r, f)]), r, f) for (r, f) in geometry.transforms]
+        self.inverseTransformers: Dict[Tuple[int, int], Callable[[str], Tuple[str, ...]]] = \
+            {rf: itemgetter(*pattern) for (rf, pattern) in self.inversePatterns.items()}
+        # Moves are mapped by lookup. self.patterns[(r, f)][qMove] is the cell the (r, f) transform moved to qMove,
+        # and self.inversePatterns[(r, f)][move] is where it moves move to.
+
+        # The canonical form of each board seen recently. Each QTable has its own.
+        self.qBoardCache = BoundedCache(self.findQBoardWithRF, cacheCapacity, cachePolicy)
+        self.collapseSymmetricMoves = collapseSymmetricMoves
+        # The orbit representative of each cell, for canonical boards seen recently.
+        self.orbitCache = BoundedCache(self.findMoveOrbits, cacheCapacity, cachePolicy)
 
         # The initial q-values of each Q[state]: {0:0, 1:0, ... , 8:0}
         # Don't access this directly. For each new state, make a copy.
-        self._i_state = {0:0, 1:0, 2:0, 3:0, 4:0, 5:0, 6:0, 7:0, 8:0}
+        self._i_state = {pos: 0 for pos in range(geometry.cells)}
 
-        # The Q states. They are added as encountered.
+        # The Q states. They are added when first updated. Reading a state that has none returns self._i_state.
         # For each state, there is a dictionary of typeNames.
         # Each is a dictionary of moves and their q-values. See self._i_state.
-        self.qTable = defaultdict(lambda : defaultdict(lambda : self._i_state.copy()))
+        self.qTable: Dict[str, Dict[str, Dict[int, float]]] = {}
+        # visitCounts[(qBoard, typeName)][qMove] is the number of times that q-value was updated.
+        # Merging tables weights by these. See qTableMerge.
+        self.visitCounts: Dict[Tuple[str, str], List[int]] = {}
+        # Copy-on-write for snapshots (see snapshot). While isShared, the latest snapshot has these very dicts,
+        # and the next change copies them (but not the entries in them). After a snapshot, ownedQBoards are the
+        # boards whose entries have been copied since; the others' are still shared. None: all are this table's.
+        self.isShared = False
+        self.ownedQBoards: Optional[Set[str]] = None
+        # Snapshots cannot be changed.
+        self.isReadOnly = False
+
+        # How often entries were read, how often a read found none, and how often one was updated.
+        self.lookups: int = 0
+        self.lookupMisses: int = 0
+        self.updates: int = 0
 
 
     # ============================================================================
     # The following methods require both the board and the typename of the requester.
     # These are the external interface to the QTable.
-    def getBestMove(self, board: str, typeName: str) -> int:
+    def getBestMove(self, board: str, typeName: str, rng: RNG=defaultRNG) -> int:
         (qBoard, r, f) = self.getQBoardWithRF(board)
         bestQMoves = self.getBestQMovesFromQBoard(qBoard, typeName)
-        bestQMove = choice(bestQMoves)
+        bestQMove = rng.choice(bestQMoves)
         bestMove = self.reverseTransformMove(bestQMove, r, f)
         return bestMove
 
     def getBestQMovesFromQBoard(self, qBoard: str, typeName: str) -> List[int]:
-        qValues = self.qTable[qBoard][typeName]
-        availableQValues = {i: val for (i, val) in qValues.items() if isAvailable(qBoard, i)}
+        qValues = self.lookupQValues(qBoard, typeName)
+        availableQValues = {i: qValues[i] for i in self.choosableQMoves(qBoard)}
         bestQMoves = argmaxList(availableQValues)
         return bestQMoves
 
     def getBestQValue(self, board: str, typeName: str) -> float:
-        bestQValue = max(self.getQValueDict(board, typeName).values())
+        bestQValue = max(self.lookupQValues(self.getQBoard(board), typeName).values())
         return bestQValue
     
     def getQValueDict(self, board: str, typeName: str) -> Dict[int, float]:
+        """
+        A copy of the q-values of board's class. Changing it does not change the table.
+        """
         qBoard = self.getQBoard(board)
-        qValueDict = self.qTable[qBoard][typeName]
+        qValueDict = self.lookupQValues(qBoard, typeName).copy()
+        return qValueDict
+
+    def lookupQValues(self, qBoard: str, typeName: str) -> Dict[int, float]:
+        """
+        The q-values of qBoard, or the initial values if it has none. Nothing is added to the table.
+        Read the result but don't change it.
+        """
+        self.lookups += 1
+        qValuesDicts = self.qTable.get(qBoard)
+        qValueDict = None if qValuesDicts is None else qValuesDicts.get(typeName)
+        if qValueDict is None:
+            self.lookupMisses += 1
+            return self._i_state
         return qValueDict
 
     def updateQValue(self, board: str, typeName: str, move: int, alpha: float, newQValue: float) -> NoReturn:
-        # qBoard = self.getQBoard(board)
-        qValueDict = self.getQValueDict(board, typeName)
+        qBoard = self.getQBoard(board)
+        # This and setEntry are the only places entries are added.
+        qValuesDicts = self.ownQValuesDicts(qBoard)
+        qValueDict = qValuesDicts.get(typeName)
+        if qValueDict is None:
+            qValueDict = qValuesDicts[typeName] = self._i_state.copy()
+            self.visitCounts[(qBoard, typeName)] = [0] * self.geometry.cells
+        self.updates += 1
         qMove = self.getQMove(board, move)
         # print(f'\n\nBefore: board: {board} qBoard: {qBoard} move: {qMove} newQValue: {newQValue} qValues: {qValues}')
         qValueDict[qMove] = weightedAvg(qValueDict[qMove], alpha, newQValue)
+        self.visitCounts[(qBoard, typeName)][qMove] += 1
 
     # =================================================================================
     # The following methods transform a board or move to their q-version equivalents
@@ -93,47 +156,192 @@ class QTable:
         (qBoard, _, _) = self.getQBoardWithRF(board)
         return qBoard
 
-    @lru_cache(maxsize=None)
     def getQBoardWithRF(self, board: str) -> Tuple[str, int, int]:
+        """
+        The canonical form of board, from the cache if it is there.
+        :param board:
+        :return: (board, rotations, flips). See findQBoardWithRF.
+        """
+        return self.qBoardCache(board)
+
+    def findQBoardWithRF(self, board: str) -> Tuple[str, int, int]:
         """
         Generate the equivalence class of boards and select the lexicographically smallest.
         :param board:
         :return: (board, rotations, flips); rotations will be in range(4); flips will be in range(2)
                  The rotations and flips are returned so that they can be undone later.
         """
-        sortedTransformation = sorted([(self.transform(board, r, f), r, f) for r in range(4) for f in range(2)])
-        return sortedTransformation[0]
+        # Keep the first smallest, which is the one sorting the (board, r, f) tuples would put first.
+        (qBoard, qR, qF) = (None, 0, 0)
+        for (transformer, r, f) in self.transformers:
+            transformed = ''.join(transformer(board))
+            if qBoard is None or transformed < qBoard:
+                (qBoard, qR, qF) = (transformed, r, f)
+        return (qBoard, qR, qF)
 
     def getQMove(self, board: str, move: int) -> int:
-        (_, r, f) = self.getQBoardWithRF(board)
-        tempBoard = setMove(NEWBOARD, move, 'M')
-        qTempBoard = self.transform(tempBoard, r, f)
-        qMove = qTempBoard.index('M')
+        (qBoard, r, f) = self.getQBoardWithRF(board)
+        qMove = self.inversePatterns[(r, f)][move]
+        if self.collapseSymmetricMoves:
+            qMove = self.moveOrbits(qBoard)[qMove]
         return qMove
 
+    def choosableQMoves(self, qBoard: str) -> List[int]:
+        """
+        The legal moves on a canonical board that have q-values: all of them, or one per orbit.
+        """
+        if not self.collapseSymmetricMoves:
+            return [i for i in range(self.geometry.cells) if isAvailable(qBoard, i)]
+        orbits = self.moveOrbits(qBoard)
+        return [i for i in range(self.geometry.cells) if orbits[i] == i and isAvailable(qBoard, i)]
+
+    def moveOrbits(self, qBoard: str) -> Tuple[int, ...]:
+        """
+        For each cell, the smallest cell equivalent to it on qBoard. See findMoveOrbits.
+        """
+        return self.orbitCache(qBoard)
+
+    def findMoveOrbits(self, qBoard: str) -> Tuple[int, ...]:
+        """
+        The transforms that leave qBoard unchanged (its stabilizer) move each cell around its orbit.
+        Every move in an orbit leads to equivalent boards, so the orbit needs only one q-value.
+        :param qBoard: a canonical board.
+        :return: for each cell, the smallest cell in its orbit
+        """
+        stabilizer = [self.inversePatterns[(r, f)] for (transformer, r, f) in self.transformers
+                      if ''.join(transformer(qBoard)) == qBoard]
+        return tuple(min(inverse[cell] for inverse in stabilizer) for cell in range(self.geometry.cells))
+
+
+    # =================================================================================
+    # All the entries, one at a time, in no particular order. See qTableExport.
+    def entries(self) -> Iterator[Tuple[str, str, Dict[int, float]]]:
+        """
+        :return: (qBoard, typeName, qValueDict) for each entry in the table. The dicts are the table's own.
+        """
+        for (qBoard, qValuesDicts) in self.qTable.items():
+            for (typeName, qValueDict) in qValuesDicts.items():
+                yield (qBoard, typeName, qValueDict)
+
+    def getVisitCounts(self, qBoard: str, typeName: str) -> List[int]:
+        """
+        A copy of the number of updates of each q-value of qBoard. All 0 if it has no entry.
+        """
+        visitCounts = self.visitCounts.get((qBoard, typeName))
+        return [0] * self.geometry.cells if visitCounts is None else visitCounts.copy()
+
+    def setEntry(self, qBoard: str, typeName: str, qValueDict: Dict[int, float], visitCounts: List[int]) -> NoReturn:
+        """
+        Replace (or add) the entry of a canonical board, e.g., with the result of a merge.
+        """
+        self.ownQValuesDicts(qBoard)[typeName] = dict(qValueDict)
+        self.visitCounts[(qBoard, typeName)] = list(visitCounts)
+
+    def ownQValuesDicts(self, qBoard: str) -> Dict[str, Dict[int, float]]:
+        """
+        The entries of qBoard, by typeName, ready to be changed: first copied if a snapshot shares them.
+        Added (empty) if qBoard has none.
+        """
+        if self.isReadOnly:
+            raise ValueError('This QTable is a snapshot. Snapshots cannot be changed.')
+        if self.isShared:
+            (self.qTable, self.visitCounts) = (dict(self.qTable), dict(self.visitCounts))
+            self.isShared = False
+        qValuesDicts = self.qTable.get(qBoard)
+        if qValuesDicts is None:
+            qValuesDicts = self.qTable[qBoard] = {}
+        elif self.ownedQBoards is not None and qBoard not in self.ownedQBoards:
+            qValuesDicts = self.qTable[qBoard] = {typeName: qValueDict.copy()
+                                                  for (typeName, qValueDict) in qValuesDicts.items()}
+            for typeName in qValuesDicts:
+                self.visitCounts[(qBoard, typeName)] = self.visitCounts[(qBoard, typeName)].copy()
+        if self.ownedQBoards is not None:
+            self.ownedQBoards.add(qBoard)
+        return qValuesDicts
+
+
+    # =================================================================================
+    # Batch updates. See ArrayQTable.updateQValues.
+    def supportsBatch(self) -> bool:
+        return False
+
+    def updateQValues(self, typeName: str, stateIds: np.ndarray, moves: np.ndarray, rewards: np.ndarray,
+                      nextStateIds: np.ndarray, alphas: np.ndarray, gammas: np.ndarray) -> np.ndarray:
+        raise NotImplementedError(f'{type(self).__name__} has no batch updates. Use updateQValue.')
+
+
+    # =================================================================================
+    # Snapshots
+    def snapshot(self) -> 'QTable':
+        """
+        A read-only QTable with the q-values as they are now. Later updates to this table do not change it,
+        and updating it raises ValueError. Meant to be read (e.g., by evaluation games) while this table keeps
+        training.
+        Taking one copies nothing. The snapshot shares this table's dicts (copy-on-write): the next change to
+        this table copies the two outer dicts, and each entry is copied the first time it changes afterwards.
+        """
+        snapshot = QTable(self.geometry, self.qBoardCache.capacity, self.qBoardCache.policy,
+                          self.collapseSymmetricMoves)
+        (snapshot.qTable, snapshot.visitCounts) = (self.qTable, self.visitCounts)
+        snapshot.isReadOnly = True
+        self.isShared = True
+        self.ownedQBoards = set()
+        return snapshot
+
+
+    # =================================================================================
+    # Sizes and counters
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: the number of states and of (state, typeName) entries in the table, which are those that
+                 have been updated, and the lookups, lookupMisses and updates counters.
+        """
+        return {'states': len(self.qTable), 'entries': sum(len(qValuesDicts) for qValuesDicts in self.qTable.values()),
+                'lookups': self.lookups, 'lookupMisses': self.lookupMisses, 'updates': self.updates}
+
+
+    # =================================================================================
+    # The caches of canonical forms and of move orbits.
+    def caches(self) -> Dict[str, BoundedCache]:
+        return {'qBoardCache': self.qBoardCache, 'orbitCache': self.orbitCache}
+
+    def cacheInfo(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: for each cache, by name: its hits, misses, evictions, size, capacity and policy.
+        """
+        return {name: cache.info() for (name, cache) in self.caches().items()}
+
+    def clearCache(self) -> NoReturn:
+        for cache in self.caches().values():
+            cache.clear()
+
 
     # =================================================================================
     # Print the Q Table
-    def printQTable(self) -> NoReturn:
-        print(f'\n\nQTable contains {len(self.qTable)} entries.')
-        for (qBoard, qValuesDicts) in sorted(self.qTable.items(), key=lambda bv: 9 - emptyCellsCount(bv[0])):
-            self.printQValuesForPattern(qBoard, qValuesDicts)
+    def printQTable(self, output: Output=output) -> NoReturn:
+        # Sorting and formatting the table is expensive. Skip it unless it will be shown.
+        if not output.isEnabled(TABLES):
+            return
+        output.print(f'\n\nQTable contains {len(self.qTable)} entries.')
+        cells = self.geometry.cells
+        for (qBoard, qValuesDicts) in sorted(self.qTable.items(),
+                                             key=lambda bv: cells - emptyCellsCount(bv[0], self.geometry)):
+            self.printQValuesForPattern(qBoard, qValuesDicts, output)
 
-    @staticmethod
-    def printQValuesForPattern(qBoard: str, qValuesDicts: Dict[str, Dict[int, float]]) -> NoReturn:
-        print(f'\n{formatBoard(qBoard)}')
-        print(f'{whoseMove(qBoard)} to move')
+    def printQValuesForPattern(self, qBoard: str, qValuesDicts: Dict[str, Dict[int, float]],
+                               output: Output=output) -> NoReturn:
+        output.print(f'\n{formatBoard(qBoard, self.geometry)}')
+        output.print(f'{whoseMove(qBoard, self.geometry)} to move')
         for (typeName, qValueDict) in sorted(qValuesDicts.items()):
-            availableQValues = {i: val for (i, val) in qValueDict.items() if isAvailable(qBoard, i)}
+            availableQValues = {i: qValueDict[i] for i in self.choosableQMoves(qBoard)}
             bestQMoves = argmaxList(availableQValues)
-            print(f'{f"{typeName}"+": ":<25}{roundDict(availableQValues)}. Best moves: {bestQMoves}')
+            output.print(f'{f"{typeName}"+": ":<25}{roundDict(availableQValues)}. Best moves: {bestQMoves}')
 
     # =================================================================================
     # The following methods transform a board to its equivalent -- or back.
     @staticmethod
-    @lru_cache(maxsize=None)
-    def applyPattern(board: str, pattern: str) -> str:
-        return ''.join([board[int(i)] for i in pattern])
+    def applyPattern(board: str, pattern: Tuple[int, ...]) -> str:
+        return ''.join([board[i] for i in pattern])
 
     def restore(self, board: str, r: int, f: int) -> str:
         """
@@ -143,11 +351,8 @@ class QTable:
         :param f:
         :return:
         """
-        # unflipping is the same as flipping a second time.
-        unflipped = self.transformAux(board, self.flipPattern, f)
-        # unrotating is the same as rotating 4 - r times.
-        unrotateedAndFlipped = self.transformAux(unflipped, self.rotatePattern, 4 - r)
-        return unrotateedAndFlipped
+        unrotatedAndUnflipped = ''.join(self.inverseTransformers[(r, f)](board))
+        return unrotatedAndUnflipped
 
     def reverseTransformMove(self, move: int, r: int, f: int) -> int:
         """
@@ -157,14 +362,9 @@ class QTable:
         :param f:
         :return:
         """
-        board = NEWBOARD
-        # board[move] = 'M'
-        updatedBoard = setMove(board, move, 'M')
-        restoredBoard = self.restore(updatedBoard, r, f)
-        nOrig = restoredBoard.index('M')
+        nOrig = self.patterns[(r, f)][move]
         return nOrig
 
-    @lru_cache(maxsize=None)
     def transform(self, board: str, r: int, f: int) -> str:
         """
         Perform r rotations and then f flips on the board
@@ -173,28 +373,28 @@ class QTable:
         :param f: number of flips
         :return: the rotated and flipped board
         """
-        rotated = self.transformAux(board, self.rotatePattern, r)
-        rotatedAndFlipped = self.transformAux(rotated, self.flipPattern, f)
+        rotatedAndFlipped = self.applyPattern(board, self.patterns[(r, f)])
         return rotatedAndFlipped
 
-    def transformAux(self, board: str, pattern: str, n: int) -> str:
-        """
-        Rotate or flip the board (according to the pattern) n times.
-        :param board:
-        :param pattern:
-        :param n:
-        :return: the transformed board
-        """
-        # Recursive version
-        # board if n == 0 else self.transformAux(self.applyPattern(board, pattern), pattern, n - 1)
+qTable = QTable()
 
-        # "Pythonic" version. Uses a mutable variable.
-        transformedBoard = board
-        for _ in range(n):
-            transformedBoard = self.applyPattern(transformedBoard, pattern)
-        return transformedBoard
+# One table per board shape. The standard board's is qTable unless another storage is set.
+_qTables: Dict[BoardGeometry, QStore] = {TICTACTOE: qTable}
 
-qTable = QTable()
+def getQTable(geometry: BoardGeometry=TICTACTOE) -> QStore:
+    """
+    The shared table for boards of this geometry. A (dict) QTable is created the first time it is asked for.
+    """
+    if geometry not in _qTables:
+        _qTables[geometry] = QTable(geometry)
+    return _qTables[geometry]
+
+def setQTable(table: QStore) -> NoReturn:
+    """
+    Make table the shared QTable for its geometry, e.g., to use a different storage.
+    The module-level qTable is not changed.
+    """
+    _qTables[table.geometry] = table
 
 if __name__ == '__main__':
     # Test the board transformer.
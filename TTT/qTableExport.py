@@ -0,0 +1,87 @@
+import csv
+import json
+from qTable import QTable
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO
+from utils import argmaxList, emptyCellsCount, whoseMove
+
+"""
+    Query a QTable and export it as JSON Lines or CSV.
+
+    Entries are streamed from QTable.entries one at a time and written as they are produced,
+    so nothing is sorted and no second copy of the table is built. Filters (all optional, combined with and):
+        depth      the number of moves made on the board
+        toMove     XMARK or OMARK
+        typeName   the player type
+        minValue   the best legal q-value is at least this
+        maxValue   the best legal q-value is at most this
+
+        with open('table.jsonl', 'w') as file:
+            exportJsonLines(qTable, file, typeName='LearningPlayer', depth=2)
+"""
+
+
+class Entry(NamedTuple):
+    board: str
+    typeName: str
+    depth: int
+    toMove: str
+    # The q-values of the legal moves only (one per orbit, if the table collapses symmetric moves),
+    # as printQTable shows them.
+    qValues: Dict[int, float]
+    bestMoves: List[int]
+    bestValue: float
+
+
+def query(table: QTable, depth: Optional[int]=None, toMove: Optional[str]=None, typeName: Optional[str]=None,
+          minValue: Optional[float]=None, maxValue: Optional[float]=None) -> Iterator[Entry]:
+    """
+    The entries of table that pass every filter given.
+    """
+    geometry = table.geometry
+    for (qBoard, entryTypeName, qValueDict) in table.entries():
+        if typeName is not None and entryTypeName != typeName:
+            continue
+        entryDepth = geometry.cells - emptyCellsCount(qBoard, geometry)
+        if depth is not None and entryDepth != depth:
+            continue
+        entryToMove = whoseMove(qBoard, geometry)
+        if toMove is not None and entryToMove != toMove:
+            continue
+        availableQValues = {move: qValueDict[move] for move in table.choosableQMoves(qBoard)}
+        if not availableQValues:
+            # A full board. There is nothing to choose.
+            continue
+        bestValue = max(availableQValues.values())
+        if (minValue is not None and bestValue < minValue) or (maxValue is not None and bestValue > maxValue):
+            continue
+        yield Entry(qBoard, entryTypeName, entryDepth, entryToMove, availableQValues,
+                    argmaxList(availableQValues), bestValue)
+
+def exportCsv(table: QTable, file: TextIO, **filters) -> int:
+    """
+    Write the entries that pass filters (see query) to file as CSV: one row per entry,
+    with a q<move> column per cell that is empty for moves that are not legal.
+    :return: the number of rows written
+    """
+    cells = table.geometry.cells
+    writer = csv.writer(file)
+    writer.writerow(['board', 'typeName', 'depth', 'toMove'] + [f'q{move}' for move in range(cells)] +
+                    ['bestMoves', 'bestValue'])
+    count = 0
+    for entry in query(table, **filters):
+        writer.writerow([entry.board, entry.typeName, entry.depth, entry.toMove] +
+                        [entry.qValues.get(move, '') for move in range(cells)] +
+                        [' '.join(map(str, entry.bestMoves)), entry.bestValue])
+        count += 1
+    return count
+
+def exportJsonLines(table: QTable, file: TextIO, **filters) -> int:
+    """
+    Write the entries that pass filters (see query) to file, one JSON object per line.
+    :return: the number of lines written
+    """
+    count = 0
+    for entry in query(table, **filters):
+        file.write(json.dumps(entry._asdict()) + '\n')
+        count += 1
+    return count
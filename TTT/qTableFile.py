@@ -0,0 +1,120 @@
+import mmap
+import numpy as np
+import os
+import struct
+from arrayQTable import ArrayQTable
+from qTable import QTable
+from stateIndex import StateIndex
+from typing import NoReturn
+
+"""
+    Save a QTable to a binary file and map it back into memory.
+
+    The file is little-endian:
+        header            HEADER: magic, version, cells, canonical states, type slots, types, boards, type-name bytes,
+                          collapseSymmetricMoves (0 or 1)
+        type names        utf-8, joined by newlines
+        boards            every reachable board, cells ascii bytes each
+        canonical ids     int32 per board: the StateIndex
+        canonical boards  cells ascii bytes each, in canonical id order
+        visited           one byte per (canonical state, type slot)
+        values            float32 [canonical states, type slots, cells], starting at a multiple of ALIGNMENT
+        visit counts      uint32 [canonical states, type slots, cells]
+
+    loadQTable maps the file and points the ArrayQTable's qValues at the values in place, so nothing
+    is copied or recomputed. With mode READ, every process that opens the file shares the same pages.
+    With mode READWRITE, updates (to q-values, visit counts and visited) go straight to the file. Its types are
+    fixed then: adding one raises ValueError.
+"""
+
+MAGIC: bytes = b'TTTQ'
+# Change this whenever the layout changes.
+VERSION: int = 3
+HEADER = struct.Struct('<4sIIIIIIII')
+ALIGNMENT: int = 64
+
+# Load modes, as in numpy.memmap.
+READ: str = 'r'          # read-only, shared between processes
+COPYONWRITE: str = 'c'   # writable, but changes stay in this process
+READWRITE: str = 'r+'    # changes are written to the file
+_ACCESS = {READ: mmap.ACCESS_READ, COPYONWRITE: mmap.ACCESS_COPY, READWRITE: mmap.ACCESS_WRITE}
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def loadQTable(fileName: str, mode: str=READ, **kwargs) -> ArrayQTable:
+    """
+    Map a file written by saveQTable.
+    :param fileName:
+    :param mode: READ, COPYONWRITE or READWRITE. In READ mode, updateQValue raises ValueError.
+                 In READWRITE mode, so does using a type the file doesn't have.
+    :param kwargs: other ArrayQTable arguments, e.g., cacheCapacity. collapseSymmetricMoves comes from the file:
+                   giving a different one raises ValueError, since the values were stored per orbit or per move.
+    :return: an ArrayQTable whose qValues and visitCounts are the file's
+    """
+    assert mode in _ACCESS, f'Unknown mode: {mode}.'
+    with open(fileName, 'rb' if mode == READ else 'r+b') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=_ACCESS[mode])
+    (magic, version, cells, states, typeSlots, types, boards, namesLength, collapseSymmetricMoves) = \
+        HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{fileName} is not a version {VERSION} QTable file.')
+    collapseSymmetricMoves = bool(collapseSymmetricMoves)
+    if kwargs.setdefault('collapseSymmetricMoves', collapseSymmetricMoves) != collapseSymmetricMoves:
+        raise ValueError(f'{fileName} was saved with collapseSymmetricMoves={collapseSymmetricMoves}.')
+    offset = HEADER.size
+    typeNames = bytes(buffer[offset: offset + namesLength]).decode('utf-8').split('\n') if types else []
+    offset += namesLength
+    boardBytes = bytes(buffer[offset: offset + boards * cells]).decode('ascii')
+    offset += boards * cells
+    canonicalIds = np.frombuffer(buffer, dtype='<i4', count=boards, offset=offset).tolist()
+    offset += 4 * boards
+    canonicalBytes = bytes(buffer[offset: offset + states * cells]).decode('ascii')
+    offset += states * cells
+    # The bytes are 0 or 1, so they can be viewed as bools. In READ mode, each process keeps its own copy of visited,
+    # so it stays writable even when the values are read-only. Otherwise it is the file's, like the values.
+    visited = np.frombuffer(buffer, dtype=bool, count=states * typeSlots, offset=offset).reshape(states, typeSlots)
+    if mode == READ:
+        visited = visited.copy()
+    offset = _aligned(offset + states * typeSlots)
+    qValues = np.frombuffer(buffer, dtype='<f4', count=states * typeSlots * cells, offset=offset)
+    offset += qValues.nbytes
+    visitCounts = np.frombuffer(buffer, dtype='<u4', count=states * typeSlots * cells, offset=offset)
+
+    index = StateIndex.fromBoards([canonicalBytes[i: i + cells] for i in range(0, states * cells, cells)],
+                                  [boardBytes[i: i + cells] for i in range(0, boards * cells, cells)],
+                                  canonicalIds)
+    shape = (states, typeSlots, cells)
+    table = ArrayQTable.fromArrays(qValues.reshape(shape), visited, typeNames, index, visitCounts.reshape(shape),
+                                   **kwargs)
+    table.writesThrough = mode == READWRITE
+    return table
+
+def saveQTable(table: QTable, fileName: str) -> NoReturn:
+    """
+    Write table (an ArrayQTable, or a QTable of the standard board, which is converted) to fileName.
+    The file is written under a temporary name and then renamed, so readers never see part of one.
+    """
+    table = ArrayQTable.fromQTable(table)
+    index = table.index
+    (states, typeSlots, cells) = table.qValues.shape
+    names = '\n'.join(table.typeNames).encode('utf-8')
+    boards = list(index.boardToCanonicalId)
+    parts = [HEADER.pack(MAGIC, VERSION, cells, states, typeSlots, len(table.typeNames), len(boards), len(names),
+                         table.collapseSymmetricMoves),
+             names,
+             ''.join(boards).encode('ascii'),
+             np.array([index.boardToCanonicalId[board] for board in boards], dtype='<i4').tobytes(),
+             ''.join(index.canonicalBoards).encode('ascii'),
+             table.visited.astype(np.uint8).tobytes()]
+    length = sum(len(part) for part in parts)
+    parts.append(bytes(_aligned(length) - length))
+    parts.append(np.ascontiguousarray(table.qValues, dtype='<f4').tobytes())
+    parts.append(np.ascontiguousarray(table.visitCounts, dtype='<u4').tobytes())
+
+    tempName = f'{fileName}.{os.getpid()}.tmp'
+    with open(tempName, 'wb') as file:
+        for part in parts:
+            file.write(part)
+    os.replace(tempName, fileName)
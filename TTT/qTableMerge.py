@@ -0,0 +1,101 @@
+from qTable import QTable
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+"""
+    Combine QTables trained independently, and compare them.
+
+    Merge policies, applied to each q-value of each (qBoard, typeName) entry:
+        VISITWEIGHTED  the average of the tables' values, weighted by how often each table updated it
+        MAX            the largest value among the tables that updated it
+        LASTWRITER     the value of the last table (in the order given) that updated it
+    A value no table updated (e.g., in a table loaded without visit counts) is the plain average, max, or last value.
+    The merged visit counts are the sums of the tables' counts.
+
+        merged = merge([workerTable1, workerTable2], VISITWEIGHTED, into=ArrayQTable())
+        bigChanges = list(diff(before, merged, threshold=5))
+"""
+
+VISITWEIGHTED: str = 'visitWeighted'
+MAX: str = 'max'
+LASTWRITER: str = 'lastWriter'
+
+# One table's values and visit counts for an entry.
+Source = Tuple[Dict[int, float], List[int]]
+
+
+class Change(NamedTuple):
+    board: str
+    typeName: str
+    move: int
+    before: float
+    after: float
+
+
+def diff(before: QTable, after: QTable, threshold: float=0.0) -> Iterator[Change]:
+    """
+    The q-values that differ by more than threshold, over the entries of either table.
+    A missing entry counts as the initial values.
+    :param before:
+    :param after:
+    :param threshold:
+    :return: a Change for each such (canonical board, typeName, move)
+    """
+    seen: Set[Tuple[str, str]] = set()
+    for table in (before, after):
+        for (qBoard, typeName, _) in table.entries():
+            if (qBoard, typeName) in seen:
+                continue
+            seen.add((qBoard, typeName))
+            beforeValues = before.getQValueDict(qBoard, typeName)
+            afterValues = after.getQValueDict(qBoard, typeName)
+            for move in range(before.geometry.cells):
+                if abs(afterValues[move] - beforeValues[move]) > threshold:
+                    yield Change(qBoard, typeName, move, beforeValues[move], afterValues[move])
+
+def merge(tables: Sequence[QTable], policy: str=VISITWEIGHTED, into: Optional[QTable]=None) -> QTable:
+    """
+    Merge tables with policy.
+    :param tables: tables of the same geometry and collapseSymmetricMoves.
+    :param policy: VISITWEIGHTED, MAX or LASTWRITER.
+    :param into: the table to write the merged entries to. It may be one of tables.
+                 It must have the same collapseSymmetricMoves. By default, a new QTable.
+    :return: into
+    """
+    assert policy in (VISITWEIGHTED, MAX, LASTWRITER), f'Unknown merge policy: {policy}.'
+    assert tables, 'Nothing to merge.'
+    geometry = tables[0].geometry
+    assert all(table.geometry == geometry for table in tables), 'The tables are for different boards.'
+    # With collapseSymmetricMoves, a table has one q-value per orbit of moves, so mixing the two would be wrong.
+    collapseSymmetricMoves = tables[0].collapseSymmetricMoves
+    if into is None:
+        into = QTable(geometry, collapseSymmetricMoves=collapseSymmetricMoves)
+    assert all(table.collapseSymmetricMoves == collapseSymmetricMoves for table in list(tables) + [into]), \
+        'The tables differ in collapseSymmetricMoves.'
+
+    # Read everything before writing anything, since into may be one of the tables.
+    sources: Dict[Tuple[str, str], List[Source]] = {}
+    for table in tables:
+        for (qBoard, typeName, qValueDict) in table.entries():
+            sources.setdefault((qBoard, typeName), []).append((dict(qValueDict),
+                                                               table.getVisitCounts(qBoard, typeName)))
+    for ((qBoard, typeName), entrySources) in sources.items():
+        qValueDict = {move: mergeValue([(qValues[move], counts[move]) for (qValues, counts) in entrySources], policy)
+                      for move in range(geometry.cells)}
+        visitCounts = [sum(counts[move] for (_, counts) in entrySources) for move in range(geometry.cells)]
+        into.setEntry(qBoard, typeName, qValueDict, visitCounts)
+    return into
+
+def mergeValue(valueCounts: List[Tuple[float, int]], policy: str) -> float:
+    """
+    :param valueCounts: (value, visit count) from each table that has the entry, in table order.
+    :param policy:
+    :return: the merged value
+    """
+    # Only the tables that updated this value count, unless none did.
+    visited = ([(value, count) for (value, count) in valueCounts if count > 0] or
+               [(value, 1) for (value, _) in valueCounts])
+    if policy == VISITWEIGHTED:
+        return sum(value * count for (value, count) in visited) / sum(count for (_, count) in visited)
+    if policy == MAX:
+        return max(value for (value, _) in visited)
+    return visited[-1][0]
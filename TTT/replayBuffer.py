@@ -0,0 +1,191 @@
+import numpy as np
+from rng import RNG
+from stateSpace import StateSpace, getStateSpace
+from typing import Dict, List, NoReturn, Optional, Tuple
+from utils import XMARK
+
+"""
+    A fixed-size store of past transitions, for learning from each one more than once.
+
+    Transitions are kept in preallocated numpy arrays, one slot each, with boards as StateSpace ids
+    (the standard board only). When the buffer is full, each new transition overwrites the oldest.
+    Minibatches are drawn by one of:
+        UNIFORM      every stored transition equally likely
+        PRIORITIZED  in proportion to priority ** priorityExponent, where a transition's priority is the size of
+                     its last TD error (new transitions get the largest priority so far, so each is drawn soon).
+                     The bias this causes is corrected by importance weights, (size * P(i)) ** -importanceExponent
+                     divided by their largest value, by which the trainer scales each transition's alpha.
+                     The priorities are kept in a SumTree, so drawing and updating take O(log capacity) each.
+
+        Trainer(storage=ARRAY, replayBuffer=ReplayBuffer(PRIORITIZED, rng=RNG(seed)))
+"""
+
+UNIFORM: str = 'uniform'
+PRIORITIZED: str = 'prioritized'
+
+DEFAULTREPLAYCAPACITY: int = 1 << 16
+
+# The smallest priority, so that no transition stops being drawn.
+MINPRIORITY: float = 1e-3
+
+
+class SumTree:
+    """
+    A binary tree over capacity leaves whose inner nodes hold the sums of their children,
+    for drawing leaves in proportion to their values.
+    tree[1] is the root; the children of node i are 2i and 2i + 1; leaf j is node leaves + j.
+    """
+
+    def __init__(self, capacity: int) -> NoReturn:
+        # The number of leaves: capacity, rounded up to a power of 2.
+        self.leaves = 1 << (capacity - 1).bit_length()
+        self.depth = self.leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+        # Shifting a node right by each of these gives its ancestors.
+        self.shifts = np.arange(1, self.depth + 1)[:, None]
+        # Leaves set since the sums were last recomputed. See update.
+        self.updates: int = 0
+
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    def values(self, slots: np.ndarray) -> np.ndarray:
+        return self.tree[self.leaves + slots]
+
+    def update(self, slots: np.ndarray, values: np.ndarray) -> NoReturn:
+        """
+        Set the leaves of slots to values (the last one wins for a repeated slot), and add the changes
+        to the sums above them: one np.add.at over every (leaf, ancestor) rather than one numpy call per level.
+        Adding changes lets rounding errors build up in the sums, so they are recomputed every self.leaves
+        leaves, which costs O(1) per leaf on average.
+        """
+        (nodes, lastIndexes) = np.unique(self.leaves + np.asarray(slots)[::-1], return_index=True)
+        values = np.asarray(values)[::-1][lastIndexes]
+        changes = values - self.tree[nodes]
+        self.tree[nodes] = values
+        np.add.at(self.tree, (nodes >> self.shifts).ravel(), np.tile(changes, self.depth))
+        self.updates += len(nodes)
+        if self.updates >= self.leaves:
+            self.rebuild()
+
+    def rebuild(self) -> NoReturn:
+        """
+        Recompute every sum from the leaves, a level at a time.
+        """
+        for level in reversed(range(self.depth)):
+            (start, end) = (1 << level, 2 << level)
+            self.tree[start: end] = self.tree[2 * start: 2 * end: 2] + self.tree[2 * start + 1: 2 * end: 2]
+        self.updates = 0
+
+    def find(self, targets: np.ndarray) -> np.ndarray:
+        """
+        For each target in [0, total()), the slot whose leaf covers it when the leaves are laid end to end:
+        the first slot whose running sum exceeds the target.
+        """
+        nodes = np.ones(len(targets), dtype=np.intp)
+        targets = targets.copy()
+        for _ in range(self.depth):
+            # Go to the left child, then move right where the target is past the left child's sum.
+            nodes <<= 1
+            left = self.tree[nodes]
+            goRight = targets >= left
+            np.subtract(targets, left, out=targets, where=goRight)
+            nodes += goRight
+        return nodes - self.leaves
+
+
+class ReplayBuffer:
+
+    def __init__(self, sampling: str=UNIFORM, capacity: int=DEFAULTREPLAYCAPACITY, priorityExponent: float=0.6,
+                 importanceExponent: float=0.4, rng: Optional[RNG]=None, states: Optional[StateSpace]=None) -> NoReturn:
+        """
+        :param sampling: UNIFORM or PRIORITIZED.
+        :param capacity: the most transitions kept.
+        :param priorityExponent: for PRIORITIZED: 0 is uniform; 1 is fully in proportion to the TD errors.
+        :param importanceExponent: for PRIORITIZED: 0 is no correction; 1 is full correction.
+        :param rng: where the minibatches' randomness comes from. If None, they are not reproducible.
+        :param states: the StateSpace whose ids are stored. By default, getStateSpace().
+        """
+        assert sampling in (UNIFORM, PRIORITIZED), f'Unknown sampling: {sampling}.'
+        assert capacity > 0, f'Capacity must be positive: {capacity}.'
+        self.sampling = sampling
+        self.capacity = capacity
+        self.priorityExponent = priorityExponent
+        self.importanceExponent = importanceExponent
+        rng = RNG() if rng is None else rng
+        self.generator = np.random.default_rng(RNG.streamSeed(rng.seed, rng.path))
+        self.states: StateSpace = getStateSpace() if states is None else states
+
+        # Slot i holds one transition. Only the first self.size slots are filled.
+        self.typeIds = np.zeros(capacity, dtype=np.int32)
+        # 0 for X, 1 for O: which mark's alpha and gamma to use.
+        self.marks = np.zeros(capacity, dtype=np.int8)
+        self.stateIds = np.zeros(capacity, dtype=np.int32)
+        self.moves = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        # -1 at the end of a game.
+        self.nextStateIds = np.zeros(capacity, dtype=np.int32)
+        self.priorities = np.zeros(capacity, dtype=np.float64)
+        # For PRIORITIZED: priorities ** priorityExponent, one leaf per slot.
+        self.sumTree = SumTree(capacity) if sampling == PRIORITIZED else None
+        self.typeNames: List[str] = []
+        self.typeIdOf: Dict[str, int] = {}
+        # The next slot to write, and the number of slots filled.
+        self.position: int = 0
+        self.size: int = 0
+        self.maxPriority: float = 1.0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, typeName: str, mark: str, sarsList: List[Tuple[str, int, float, Optional[str]]]) -> NoReturn:
+        """
+        Store a player's transitions from one game, in the order Trainer learns from them (last move first).
+        """
+        typeId = self.typeIdOf.get(typeName)
+        if typeId is None:
+            typeId = self.typeIdOf[typeName] = len(self.typeNames)
+            self.typeNames.append(typeName)
+        ids = self.states.ids
+        slots = []
+        for (board, move, reward, nextBoard) in reversed(sarsList):
+            slot = self.position
+            slots.append(slot)
+            self.typeIds[slot] = typeId
+            self.marks[slot] = 0 if mark == XMARK else 1
+            self.stateIds[slot] = ids[board]
+            self.moves[slot] = move
+            self.rewards[slot] = reward
+            self.nextStateIds[slot] = -1 if nextBoard is None else ids[nextBoard]
+            self.priorities[slot] = self.maxPriority
+            self.position = (slot + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+        if self.sumTree is not None and slots:
+            self.sumTree.update(np.array(slots), np.full(len(slots), self.maxPriority ** self.priorityExponent))
+
+    def sample(self, batchSize: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draw a minibatch, with replacement.
+        :param batchSize:
+        :return: (slots, importance weights). The weights are all 1 for UNIFORM.
+        """
+        assert self.size > 0, 'The replay buffer is empty.'
+        if self.sampling == UNIFORM:
+            return (self.generator.integers(self.size, size=batchSize), np.ones(batchSize))
+        # Inverse-CDF sampling, by descending the sum tree. The empty slots' leaves are 0, so they are never drawn,
+        # except through rounding at the very end: hence the minimum.
+        total = self.sumTree.total()
+        slots = np.minimum(self.sumTree.find(self.generator.random(batchSize) * total), self.size - 1)
+        probabilities = self.sumTree.values(slots) / total
+        weights = (self.size * probabilities) ** -self.importanceExponent
+        return (slots, weights / weights.max())
+
+    def updatePriorities(self, slots: np.ndarray, tdErrors: np.ndarray) -> NoReturn:
+        """
+        Set the priorities of slots from the TD errors of their latest updates.
+        """
+        priorities = np.maximum(np.abs(tdErrors), MINPRIORITY)
+        self.priorities[slots] = priorities
+        if self.sumTree is not None:
+            self.sumTree.update(slots, priorities ** self.priorityExponent)
+        self.maxPriority = max(self.maxPriority, float(priorities.max()))
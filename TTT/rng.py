@@ -0,0 +1,60 @@
+import hashlib
+import os
+import random
+from typing import Any, Hashable, NoReturn, Optional, Sequence, Tuple
+
+"""
+    Seeded random number streams.
+
+    An RNG is a random.Random seeded from a root seed and a path of keys. spawn(key) makes a child stream
+    whose seed is a hash of the parent's seed and path plus key, so the child does not depend on how much
+    of the parent stream has been used. A run is reproducible given its seed, however the work is divided:
+
+        root = RNG(seed)
+        workerRng = root.spawn('worker', workerId)     # one per process
+        gameRng = workerRng.spawn('game', gameNumber)  # one per game
+
+    Every random choice made by players, QTable and utils.argmax comes from an RNG passed to them.
+"""
+
+
+class RNG:
+
+    def __init__(self, seed: Optional[int]=None, path: Tuple[Hashable, ...]=()) -> NoReturn:
+        """
+        :param seed: the root seed. If None, one is drawn from the OS, and the stream is not reproducible.
+        :param path: the keys that led from the root to this stream.
+        """
+        self.seed: int = int.from_bytes(os.urandom(8), 'big') if seed is None else seed
+        self.path: Tuple[Hashable, ...] = path
+        self.generator = random.Random(self.streamSeed(self.seed, path))
+
+    def __repr__(self) -> str:
+        return f'RNG({self.seed}, {self.path})'
+
+    @staticmethod
+    def streamSeed(seed: int, path: Tuple[Hashable, ...]) -> int:
+        # Use a fixed hash (not hash()) so that seeds are the same in every process.
+        digest = hashlib.sha256(repr((seed, path)).encode()).digest()
+        return int.from_bytes(digest[:8], 'big')
+
+    def spawn(self, *keys: Hashable) -> 'RNG':
+        """
+        An independent child stream, identified by keys.
+        """
+        return RNG(self.seed, self.path + keys)
+
+    # =================================================================================
+    # The random-module functions used in this package.
+    def choice(self, seq: Sequence) -> Any:
+        return self.generator.choice(seq)
+
+    def random(self) -> float:
+        return self.generator.random()
+
+    def randrange(self, *args) -> int:
+        return self.generator.randrange(*args)
+
+
+# Used when no RNG is given.
+defaultRNG = RNG()
@@ -0,0 +1,76 @@
+from array import array
+from typing import Callable, Dict, NoReturn
+
+"""
+    Learning-rate (alpha), discount (gamma) and exploration (epsilon) schedules.
+
+    A curve maps the fraction of training done (0.0 to 1.0) to a value. Curves are registered by name,
+    so new ones can be added without editing this module:
+
+        registerCurve('slowAlpha', exponentialDecay(0.5, 0.995, 250))
+        Trainer(schedules={**DEFAULTSCHEDULES, 'alpha': {'X': 'slowAlpha', 'O': 'alphaO'}})
+
+    A Schedules object evaluates each curve once per game index when it is created,
+    so the trainer looks values up instead of computing them on every update.
+"""
+
+Curve = Callable[[float], float]
+# {parameter: {mark: curve name}}
+ScheduleNames = Dict[str, Dict[str, str]]
+
+_curves: Dict[str, Curve] = {}
+
+
+def constant(value: float) -> Curve:
+    return lambda pctTrained: value
+
+def exponentialDecay(cap: float, base: float, rate: float) -> Curve:
+    """
+    min(cap, base ** (rate * pctTrained))
+    """
+    return lambda pctTrained: min(cap, pow(base, rate * pctTrained))
+
+def linearDecay(start: float, end: float) -> Curve:
+    return lambda pctTrained: start + (end - start) * pctTrained
+
+def getCurve(name: str) -> Curve:
+    assert name in _curves, f'No curve named {name}. Known curves: {sorted(_curves)}'
+    return _curves[name]
+
+def registerCurve(name: str, curve: Curve) -> NoReturn:
+    _curves[name] = curve
+
+
+# Alpha is the learning rate. It declines with more games.
+registerCurve('alphaX', exponentialDecay(0.5, 0.99, 250))
+registerCurve('alphaO', exponentialDecay(0.75, 0.99, 200))
+# Gamma is the discount rate for future results.
+registerCurve('gammaX', constant(0.9))
+registerCurve('gammaO', constant(0.95))
+# Epsilon is the chance that a LearningPlayer makes a random move in a training game.
+registerCurve('alwaysExplore', constant(1.0))
+
+DEFAULTSCHEDULES: ScheduleNames = {'alpha': {'X': 'alphaX', 'O': 'alphaO'},
+                                   'gamma': {'X': 'gammaX', 'O': 'gammaO'},
+                                   'epsilon': {'X': 'alwaysExplore', 'O': 'alwaysExplore'}}
+
+
+class Schedules:
+
+    def __init__(self, N: int, names: ScheduleNames=DEFAULTSCHEDULES) -> NoReturn:
+        """
+        Precompute every schedule for game indexes 0 through N.
+        :param N: the number of games in the training run. Game n is n/N of the way through.
+        :param names: which registered curve to use for each parameter and mark.
+        """
+        self.N = N
+        self.names = names
+        self.values: Dict[str, Dict[str, array]] = {param: {mark: self.precompute(getCurve(name))
+                                                            for (mark, name) in curveNames.items()}
+                                                    for (param, curveNames) in names.items()}
+
+    def precompute(self, curve: Curve) -> array:
+        return array('d', [curve(n / self.N) for n in range(self.N + 1)])
+
+    def value(self, param: str, mark: str, n: int) -> float:
+        return self.values[param][mark][n]
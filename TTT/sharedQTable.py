@@ -0,0 +1,173 @@
+import multiprocessing
+import numpy as np
+from arrayQTable import ArrayQTable
+from gameRecord import PLAYERTYPES
+from geometry import TICTACTOE
+from multiprocessing import shared_memory
+from stateIndex import getStateIndex
+from typing import List, NamedTuple, NoReturn, Optional, Sequence
+from utils import weightedAvg
+
+"""
+    An ArrayQTable whose qValues, visitCounts and visited arrays live in multiprocessing.shared_memory,
+    so that trainers in several processes update one table.
+
+    The parent creates the table and passes its handle to each worker, which attaches to it:
+
+        table = SharedQTable.create()
+        Process(target=work, args=(table.handle(),)).start()
+        ...
+        def work(handle):
+            setQTable(SharedQTable.attach(handle))
+
+    The parent calls unlink() when every worker is done. The player types are fixed when the table is created
+    (by default, gameRecord.PLAYERTYPES), since the shared arrays cannot grow.
+
+    Consistency model. Reads never lock. Each q-value is one aligned float32, so a read sees either
+    the old or the new value, never a mix. For updateQValue and updateQValues there are two choices:
+        STRIPED   each update (read, average, write) holds the lock of its stripe of canonical states.
+                  No update is lost. Updates to states in different stripes proceed in parallel.
+                  updateQValues takes each stripe's lock once, for all of the batch's updates in that stripe.
+        HOGWILD   no locks. Two processes updating the same entry at once may lose one of the updates.
+                  Q-learning tolerates this, and it is the faster choice when there are many processes.
+    Either way, the best q-value of the next state that an update uses may be slightly stale.
+"""
+
+STRIPED: str = 'striped'
+HOGWILD: str = 'hogwild'
+
+DEFAULTSTRIPES: int = 64
+
+
+class SharedQTableHandle(NamedTuple):
+    """
+    What a worker needs to attach: pass it to the worker as a Process argument. (The locks cannot be sent later.)
+    """
+    name: str
+    typeNames: Sequence[str]
+    locks: Optional[List]
+
+
+class SharedQTable(ArrayQTable):
+
+    def __init__(self, memory: shared_memory.SharedMemory, typeNames: Sequence[str],
+                 locks: Optional[List], isOwner: bool, **kwargs) -> NoReturn:
+        """
+        Use create or attach rather than calling this.
+        :param memory: the shared block: qValues, then visitCounts, then visited.
+        :param typeNames: the fixed player types.
+        :param locks: one lock per stripe, or None for HOGWILD.
+        :param isOwner: True in the process that created the block. Only it may unlink it.
+        :param kwargs: other ArrayQTable arguments.
+        """
+        # The block was sized by size(), for getStateIndex().
+        (states, types, cells) = (len(getStateIndex()), len(typeNames), TICTACTOE.cells)
+        qValues = np.ndarray((states, types, cells), dtype=np.float32, buffer=memory.buf)
+        visitCounts = np.ndarray((states, types, cells), dtype=np.uint32, buffer=memory.buf, offset=qValues.nbytes)
+        visited = np.ndarray((states, types), dtype=bool, buffer=memory.buf, offset=qValues.nbytes + visitCounts.nbytes)
+        super().__init__(arrays=(qValues, visitCounts, visited), **kwargs)
+        self.typeNames = list(typeNames)
+        self.typeIds = {typeName: typeId for (typeId, typeName) in enumerate(typeNames)}
+        self.memory = memory
+        self.locks = locks
+        self.isOwner = isOwner
+
+    @staticmethod
+    def size(typeNames: Sequence[str]) -> int:
+        """
+        The bytes needed: a float32 and a uint32 per (state, type, cell) and a bool per (state, type).
+        """
+        return len(getStateIndex()) * len(typeNames) * (8 * TICTACTOE.cells + 1)
+
+    @classmethod
+    def create(cls, typeNames: Sequence[str]=PLAYERTYPES, policy: str=STRIPED, stripes: int=DEFAULTSTRIPES,
+               **kwargs) -> 'SharedQTable':
+        """
+        Make a new zeroed shared table.
+        :param typeNames: the player types it will hold.
+        :param policy: STRIPED or HOGWILD.
+        :param stripes: the number of locks for STRIPED.
+        :param kwargs: other ArrayQTable arguments.
+        """
+        assert policy in (STRIPED, HOGWILD), f'Unknown policy: {policy}.'
+        assert len(typeNames) > 0, 'A shared table needs at least one player type.'
+        memory = shared_memory.SharedMemory(create=True, size=cls.size(typeNames))
+        memory.buf[:] = bytes(len(memory.buf))
+        locks = [multiprocessing.Lock() for _ in range(stripes)] if policy == STRIPED else None
+        return cls(memory, typeNames, locks, True, **kwargs)
+
+    @classmethod
+    def attach(cls, handle: SharedQTableHandle, **kwargs) -> 'SharedQTable':
+        """
+        Attach to a table made by create in another process.
+        That process should have started this one: they then share a resource tracker,
+        and the block is not freed when this process exits.
+        """
+        memory = shared_memory.SharedMemory(name=handle.name)
+        return cls(memory, handle.typeNames, handle.locks, False, **kwargs)
+
+    def applyUpdates(self, typeId: int, canonicalIds: np.ndarray, qMoves: np.ndarray, alphas: np.ndarray,
+                     targets: np.ndarray) -> NoReturn:
+        """
+        As in ArrayQTable, but under STRIPED one stripe at a time, holding its lock.
+        Each q-value is in one stripe, and a stripe's updates keep their order, so the result is the same.
+        """
+        if self.locks is None:
+            super().applyUpdates(typeId, canonicalIds, qMoves, alphas, targets)
+            return
+        stripes = canonicalIds % len(self.locks)
+        for stripe in np.unique(stripes).tolist():
+            inStripe = stripes == stripe
+            with self.locks[stripe]:
+                super().applyUpdates(typeId, canonicalIds[inStripe], qMoves[inStripe], alphas[inStripe],
+                                     targets[inStripe])
+
+    def close(self) -> NoReturn:
+        """
+        Detach this process. The arrays may not be used afterwards.
+        """
+        self.qValues = None
+        self.visitCounts = None
+        self.visited = None
+        self.memory.close()
+
+    def handle(self) -> SharedQTableHandle:
+        return SharedQTableHandle(self.memory.name, self.typeNames, self.locks)
+
+    def snapshot(self) -> ArrayQTable:
+        """
+        A private, read-only copy. (Other processes keep writing the shared arrays, so they cannot be shared.)
+        """
+        (qValues, visitCounts) = (self.qValues.copy(), self.visitCounts.copy())
+        qValues.flags.writeable = False
+        visitCounts.flags.writeable = False
+        return self.snapshotOf(qValues, visitCounts)
+
+    def typeId(self, typeName: str) -> int:
+        typeId = self.typeIds.get(typeName)
+        if typeId is None:
+            raise ValueError(f'{typeName} is not one of the types this shared table was created with: '
+                             f'{self.typeNames}.')
+        return typeId
+
+    def unlink(self) -> NoReturn:
+        """
+        Close and free the shared block. Only the process that created it may do this, after the others have closed.
+        """
+        assert self.isOwner, 'Only the process that created the table may unlink it.'
+        self.close()
+        self.memory.unlink()
+
+    def updateQValue(self, board: str, typeName: str, move: int, alpha: float, newQValue: float) -> NoReturn:
+        if self.locks is None:
+            super().updateQValue(board, typeName, move, alpha, newQValue)
+            return
+        canonicalId = self.index.boardToCanonicalId[board]
+        typeId = self.typeId(typeName)
+        qMove = self.getQMove(board, move)
+        qValues = self.qValues[canonicalId, typeId]
+        self.updates += 1
+        with self.locks[canonicalId % len(self.locks)]:
+            self.visited[canonicalId, typeId] = True
+            qValues[qMove] = weightedAvg(float(qValues[qMove]), alpha, newQValue)
+            self.visitCounts[canonicalId, typeId, qMove] += 1
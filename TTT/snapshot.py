@@ -0,0 +1,72 @@
+import os
+from qTable import QTable
+from qTableFile import loadQTable, saveQTable
+from typing import NoReturn, Optional, Tuple
+
+"""
+    Publishing QTable snapshots while training continues.
+
+    The trainer publishes a snapshot of its table at the end of each segment. Each publication
+    has an epoch number, starting at 1. Readers in the same process (e.g., evaluation threads) call
+    latest() and keep using the snapshot they get for as long as they like: it never changes,
+    and newer snapshots replace it for later callers only.
+
+    With a fileName, each snapshot is also saved with qTableFile.saveQTable, which renames the finished file
+    into place. Readers in other processes (e.g., an inference server) use a SnapshotReader, which maps
+    the file again whenever a newer one has replaced it.
+"""
+
+Published = Tuple[int, Optional[QTable]]
+
+
+class SnapshotPublisher:
+
+    def __init__(self, fileName: Optional[str]=None) -> NoReturn:
+        """
+        :param fileName: also save each snapshot here. The table must be of the standard board.
+        """
+        self.fileName = fileName
+        # (epoch, snapshot). Replaced in one assignment, so a reader sees the old pair or the new one.
+        self.published: Published = (0, None)
+
+    def latest(self) -> Published:
+        """
+        :return: (epoch, snapshot); (0, None) if nothing has been published.
+        """
+        return self.published
+
+    def publish(self, table: QTable) -> int:
+        """
+        Snapshot table and make the snapshot the latest.
+        :return: its epoch
+        """
+        snapshot = table.snapshot()
+        epoch = self.published[0] + 1
+        if self.fileName is not None:
+            saveQTable(snapshot, self.fileName)
+        self.published = (epoch, snapshot)
+        return epoch
+
+
+class SnapshotReader:
+
+    def __init__(self, fileName: str) -> NoReturn:
+        self.fileName = fileName
+        # The identity of the file last loaded, and its table.
+        self.fileId: Optional[Tuple[int, int]] = None
+        self.table: Optional[QTable] = None
+
+    def latest(self) -> Optional[QTable]:
+        """
+        The most recently published table, loaded (read-only, shared) only if the file has been replaced.
+        None if nothing has been published yet.
+        """
+        try:
+            stat = os.stat(self.fileName)
+        except FileNotFoundError:
+            return self.table
+        fileId = (stat.st_ino, stat.st_mtime_ns)
+        if fileId != self.fileId:
+            self.table = loadQTable(self.fileName)
+            self.fileId = fileId
+        return self.table
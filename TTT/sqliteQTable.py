@@ -0,0 +1,253 @@
+import sqlite3
+import time
+from array import array
+from boundedCache import DEFAULTCAPACITY, LRU
+from collections import OrderedDict
+from geometry import TICTACTOE, BoardGeometry
+from output import TABLES, Output, output
+from qTable import QTable
+from typing import Any, Dict, Iterable, Iterator, List, NoReturn, Optional, Tuple
+from utils import emptyCellsCount, weightedAvg
+
+"""
+    A QTable whose entries are rows of an SQLite database, for boards too big for a dict of every state.
+    Only the standard library is used.
+
+    Each (qBoard, typeName) entry is one row: its q-values as float64s and its visit counts as uint32s.
+    The entries used most recently are kept in memory, in a write-back cache of up to hotCapacity entries.
+    Updates change the cached entry only. When a changed (dirty) entry is evicted it waits in a batch,
+    and a full batch (flushBatch entries) is written in one transaction. flush() writes everything
+    that has changed; call it (or close()) before another process reads the file.
+
+        table = SqliteQTable('4x4.db', BoardGeometry(4, 4))
+        Trainer(geometry=table.geometry, storage=table).train()
+        table.close()
+
+    writeBackInfo() reports the cache's hit ratio and how long flushes take.
+"""
+
+# Entries kept in memory.
+DEFAULTHOTCAPACITY: int = 1 << 16
+# Dirty entries written per transaction.
+DEFAULTFLUSHBATCH: int = 4096
+
+# Marks an entry that is not in the cache. (None is a cached entry that the database doesn't have.)
+_MISSING = object()
+
+# [qValueDict, visitCounts]
+CachedEntry = List
+
+
+class SqliteQTable(QTable):
+
+    def __init__(self, fileName: str, geometry: BoardGeometry=TICTACTOE,
+                 hotCapacity: int=DEFAULTHOTCAPACITY, flushBatch: int=DEFAULTFLUSHBATCH,
+                 cacheCapacity: Optional[int]=DEFAULTCAPACITY, cachePolicy: str=LRU,
+                 collapseSymmetricMoves: bool=True) -> NoReturn:
+        """
+        :param fileName: the database. It is created if need be, and its entries are used if it exists.
+                         ':memory:' keeps it in memory, which holds every entry there: only for tests.
+        :param geometry: as in QTable. It must be the geometry the file's entries were made with.
+        :param hotCapacity: the most entries kept in memory.
+        :param flushBatch: the number of evicted dirty entries written together.
+        :param cacheCapacity: as in QTable. (The cache of canonical boards, not of entries.)
+        :param cachePolicy: as in QTable.
+        :param collapseSymmetricMoves: as in QTable.
+        """
+        assert hotCapacity > 0 and flushBatch > 0, 'hotCapacity and flushBatch must be positive.'
+        super().__init__(geometry, cacheCapacity, cachePolicy, collapseSymmetricMoves)
+        # Not used: the entries are in the database and self.hot.
+        self.qTable = None
+        self.visitCounts = None
+        self.fileName = fileName
+        self.connection = sqlite3.connect(fileName)
+        self.connection.execute('pragma journal_mode = wal')
+        self.connection.execute('pragma synchronous = normal')
+        self.connection.execute('create table if not exists entries (board text, typeName text, qValues blob, '
+                                'visitCounts blob, primary key (board, typeName)) without rowid')
+        self.connection.commit()
+
+        self.hotCapacity = hotCapacity
+        self.flushBatch = flushBatch
+        # (qBoard, typeName) -> CachedEntry, or None if the database has no such entry. Least recently used first.
+        self.hot: OrderedDict = OrderedDict()
+        # The keys of the entries in self.hot that have changed since they were read or written.
+        self.dirty = set()
+        # Dirty entries evicted from self.hot, waiting to be written.
+        self.pending: Dict[Tuple[str, str], CachedEntry] = {}
+
+        # Counters for writeBackInfo.
+        self.hotHits: int = 0
+        self.hotMisses: int = 0
+        self.flushes: int = 0
+        self.flushedRows: int = 0
+        self.flushSeconds: float = 0.0
+        self.lastFlushSeconds: float = 0.0
+
+
+    # ============================================================================
+    # Reading and writing entries.
+    def lookupQValues(self, qBoard: str, typeName: str) -> Dict[int, float]:
+        self.lookups += 1
+        entry = self.entry(qBoard, typeName)
+        if entry is None:
+            self.lookupMisses += 1
+            return self._i_state
+        return entry[0]
+
+    def updateQValue(self, board: str, typeName: str, move: int, alpha: float, newQValue: float) -> NoReturn:
+        qBoard = self.getQBoard(board)
+        key = (qBoard, typeName)
+        entry = self.entry(qBoard, typeName)
+        if entry is None:
+            entry = self.hot[key] = [self._i_state.copy(), [0] * self.geometry.cells]
+        self.dirty.add(key)
+        self.updates += 1
+        qMove = self.getQMove(board, move)
+        (qValueDict, visitCounts) = entry
+        qValueDict[qMove] = weightedAvg(qValueDict[qMove], alpha, newQValue)
+        visitCounts[qMove] += 1
+
+    def entry(self, qBoard: str, typeName: str) -> Optional[CachedEntry]:
+        """
+        The entry of (qBoard, typeName) from the cache, from the batch waiting to be written, or from the database.
+        It is cached either way. None if there is none.
+        """
+        key = (qBoard, typeName)
+        entry = self.hot.get(key, _MISSING)
+        if entry is not _MISSING:
+            self.hotHits += 1
+            self.hot.move_to_end(key)
+            return entry
+        self.hotMisses += 1
+        entry = self.pending.pop(key, _MISSING)
+        if entry is not _MISSING:
+            # Still not written: it stays dirty.
+            self.dirty.add(key)
+        else:
+            row = self.connection.execute('select qValues, visitCounts from entries where board = ? and typeName = ?',
+                                          key).fetchone()
+            entry = None if row is None else self.decode(*row)
+        self.hot[key] = entry
+        if len(self.hot) > self.hotCapacity:
+            self.evict()
+        return entry
+
+    def evict(self) -> NoReturn:
+        """
+        Drop the least recently used entry from the cache. If it is dirty, add it to the batch to be written.
+        """
+        (key, entry) = self.hot.popitem(last=False)
+        if key in self.dirty:
+            self.dirty.remove(key)
+            self.pending[key] = entry
+            if len(self.pending) >= self.flushBatch:
+                self.write(self.pending.items())
+                self.pending.clear()
+
+    def getVisitCounts(self, qBoard: str, typeName: str) -> List[int]:
+        entry = self.entry(qBoard, typeName)
+        return [0] * self.geometry.cells if entry is None else entry[1].copy()
+
+    def setEntry(self, qBoard: str, typeName: str, qValueDict: Dict[int, float], visitCounts: List[int]) -> NoReturn:
+        key = (qBoard, typeName)
+        self.pending.pop(key, None)
+        self.hot[key] = [dict(qValueDict), list(visitCounts)]
+        self.hot.move_to_end(key)
+        self.dirty.add(key)
+        if len(self.hot) > self.hotCapacity:
+            self.evict()
+
+    def entries(self) -> Iterator[Tuple[str, str, Dict[int, float]]]:
+        """
+        :return: (qBoard, typeName, qValueDict) for each entry, read from the database after a flush.
+                 The dicts are copies.
+        """
+        self.flush()
+        for (qBoard, typeName, qValues, visitCounts) in self.connection.execute('select * from entries'):
+            yield (qBoard, typeName, self.decode(qValues, visitCounts)[0])
+
+
+    # ============================================================================
+    # Writing to the database.
+    def flush(self) -> NoReturn:
+        """
+        Write every changed entry, in one transaction.
+        """
+        if not self.pending and not self.dirty:
+            return
+        self.write(list(self.pending.items()) + [(key, self.hot[key]) for key in self.dirty])
+        self.pending.clear()
+        self.dirty.clear()
+
+    def write(self, keyEntries: Iterable[Tuple[Tuple[str, str], CachedEntry]]) -> NoReturn:
+        """
+        Write (key, entry) pairs in one transaction, and time it.
+        """
+        start = time.perf_counter()
+        rows = [key + self.encode(entry) for (key, entry) in keyEntries]
+        with self.connection:
+            self.connection.executemany('insert or replace into entries values (?, ?, ?, ?)', rows)
+        self.lastFlushSeconds = time.perf_counter() - start
+        self.flushSeconds += self.lastFlushSeconds
+        self.flushes += 1
+        self.flushedRows += len(rows)
+
+    def close(self) -> NoReturn:
+        """
+        Flush and close the database. The table may not be used afterwards.
+        """
+        self.flush()
+        self.connection.close()
+
+    def encode(self, entry: CachedEntry) -> Tuple[bytes, bytes]:
+        (qValueDict, visitCounts) = entry
+        return (array('d', [qValueDict[move] for move in range(self.geometry.cells)]).tobytes(),
+                array('I', visitCounts).tobytes())
+
+    @staticmethod
+    def decode(qValues: bytes, visitCounts: bytes) -> CachedEntry:
+        return [dict(enumerate(array('d', qValues))), array('I', visitCounts).tolist()]
+
+
+    # ============================================================================
+    # Snapshots, sizes and counters
+    def snapshot(self) -> 'SqliteQTable':
+        """
+        An in-memory copy of the database, made with SQLite's backup.
+        """
+        self.flush()
+        snapshot = SqliteQTable(':memory:', self.geometry, self.hotCapacity, self.flushBatch,
+                                self.qBoardCache.capacity, self.qBoardCache.policy, self.collapseSymmetricMoves)
+        self.connection.backup(snapshot.connection)
+        return snapshot
+
+    def stats(self) -> Dict[str, int]:
+        self.flush()
+        (states, entries) = self.connection.execute('select count(distinct board), count(*) from entries').fetchone()
+        return {'states': states, 'entries': entries,
+                'lookups': self.lookups, 'lookupMisses': self.lookupMisses, 'updates': self.updates}
+
+    def writeBackInfo(self) -> Dict[str, Any]:
+        """
+        :return: the entry cache's hits, misses, hitRatio, size and dirty entries, and the number of flushes
+                 (transactions), the rows they wrote, and their total, mean and last seconds.
+        """
+        reads = self.hotHits + self.hotMisses
+        return {'hits': self.hotHits, 'misses': self.hotMisses, 'hitRatio': self.hotHits / reads if reads else 0.0,
+                'size': len(self.hot), 'dirty': len(self.dirty) + len(self.pending),
+                'flushes': self.flushes, 'flushedRows': self.flushedRows, 'flushSeconds': self.flushSeconds,
+                'meanFlushSeconds': self.flushSeconds / self.flushes if self.flushes else 0.0,
+                'lastFlushSeconds': self.lastFlushSeconds}
+
+    def printQTable(self, output: Output=output) -> NoReturn:
+        if not output.isEnabled(TABLES):
+            return
+        qTable: Dict[str, Dict[str, Dict[int, float]]] = {}
+        for (qBoard, typeName, qValueDict) in self.entries():
+            qTable.setdefault(qBoard, {})[typeName] = qValueDict
+        output.print(f'\n\nQTable contains {len(qTable)} entries.')
+        cells = self.geometry.cells
+        for (qBoard, qValuesDicts) in sorted(qTable.items(),
+                                             key=lambda bv: cells - emptyCellsCount(bv[0], self.geometry)):
+            self.printQValuesForPattern(qBoard, qValuesDicts, output)
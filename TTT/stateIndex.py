@@ -0,0 +1,129 @@
+from geometry import TICTACTOE
+from stateSpace import StateSpace, getStateSpace
+from typing import Dict, List, NoReturn, Optional, Tuple
+from utils import EMPTYCELL, OMARK, XMARK
+
+"""
+    Numeric ids for boards.
+
+    A board's code is its base-3 number: cell i contributes 3**i times its digit,
+    where an empty cell is 0, X is 1 and O is 2. Codes run from 0 to 3**9 - 1.
+
+    A board's canonical id is a dense number in range(765), one per equivalence class of
+    reachable boards under rotations and flips. The representative of each class is the
+    lexicographically smallest of its eight transformations, the same board QTable.getQBoard
+    picks. Canonical ids are assigned in increasing order of the representatives' codes.
+"""
+
+DIGITS: Dict[str, int] = {EMPTYCELL: 0, XMARK: 1, OMARK: 2}
+MARKS: str = EMPTYCELL + XMARK + OMARK
+
+# The 8 transformations as permutations: the transformed board is ''.join(board[i] for i in perm).
+# Index 2*r + f is r clockwise rotations followed by f horizontal flips, as in QTable.transform.
+PERMUTATIONS: List[Tuple[int, ...]] = TICTACTOE.symmetries
+
+
+def canonicalForm(board: str) -> Tuple[str, int, int]:
+    """
+    The lexicographically smallest transformation of board.
+    :param board:
+    :return: (canonical board, rotations, flips), chosen exactly as QTable.getQBoardWithRF does.
+    """
+    return min((''.join([board[i] for i in PERMUTATIONS[2*r + f]]), r, f) for r in range(4) for f in range(2))
+
+def decode(code: int) -> str:
+    """
+    The board whose base-3 code is code.
+    """
+    cells = []
+    for _ in range(9):
+        (code, digit) = divmod(code, 3)
+        cells.append(MARKS[digit])
+    return ''.join(cells)
+
+def encode(board: str) -> int:
+    """
+    The base-3 code of board. Cell 0 is the least significant digit.
+    """
+    code = 0
+    for cell in reversed(board):
+        code = 3 * code + DIGITS[cell]
+    return code
+
+
+class StateIndex:
+
+    def __init__(self, states: StateSpace) -> NoReturn:
+        """
+        Number the equivalence classes of the reachable boards.
+        :param states: all reachable boards.
+        """
+        canonicalBoards = {canonicalForm(board)[0] for board in states.boards}
+        # The canonical boards in code order. canonicalBoards[canonicalId] is the class representative.
+        self.canonicalBoards: List[str] = sorted(canonicalBoards, key=encode)
+        self.canonicalCodes: List[int] = [encode(board) for board in self.canonicalBoards]
+        self.codeToCanonicalId: Dict[int, int] = {code: canonicalId
+                                                  for (canonicalId, code) in enumerate(self.canonicalCodes)}
+        # For every reachable board (raw or canonical) its canonical id.
+        self.boardToCanonicalId: Dict[str, int] = {}
+        # canonicalIds[stateId] is the canonical id of states.boards[stateId].
+        self.canonicalIds: List[int] = []
+        for board in states.boards:
+            canonicalId = self.codeToCanonicalId[encode(canonicalForm(board)[0])]
+            self.boardToCanonicalId[board] = canonicalId
+            self.canonicalIds.append(canonicalId)
+
+    @classmethod
+    def fromBoards(cls, canonicalBoards: List[str], boards: List[str], canonicalIds: List[int]) -> 'StateIndex':
+        """
+        Rebuild a StateIndex from its boards and ids, e.g., as stored by qTableFile, without canonicalizing anything.
+        :param canonicalBoards: the class representatives, in code order.
+        :param boards: every reachable board.
+        :param canonicalIds: canonicalIds[i] is the canonical id of boards[i].
+        """
+        index = cls.__new__(cls)
+        index.canonicalBoards = canonicalBoards
+        index.canonicalCodes = [encode(board) for board in canonicalBoards]
+        index.codeToCanonicalId = {code: canonicalId for (canonicalId, code) in enumerate(index.canonicalCodes)}
+        index.boardToCanonicalId = dict(zip(boards, canonicalIds))
+        index.canonicalIds = list(canonicalIds)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.canonicalBoards)
+
+    def canonicalBoard(self, canonicalId: int) -> str:
+        """
+        The inverse of canonicalId: the representative board of the class.
+        """
+        return self.canonicalBoards[canonicalId]
+
+    def canonicalId(self, board: str) -> int:
+        """
+        The dense id of board's equivalence class. Works for raw and canonical boards.
+        Raises KeyError if board is not reachable in a legal game.
+        """
+        canonicalId = self.boardToCanonicalId.get(board)
+        return self.codeToCanonicalId[encode(canonicalForm(board)[0])] if canonicalId is None else canonicalId
+
+
+_stateIndex: Optional[StateIndex] = None
+
+def getStateIndex() -> StateIndex:
+    """
+    The single StateIndex, built from getStateSpace() the first time it is asked for.
+    """
+    global _stateIndex
+    if _stateIndex is None:
+        _stateIndex = StateIndex(getStateSpace())
+    return _stateIndex
+
+
+if __name__ == '__main__':
+    index = getStateIndex()
+    print(f'{len(index)} canonical states.')
+    board = 'X...O...X'
+    print(f'{board}: code {encode(board)}, canonical id {index.canonicalId(board)}, '
+          f'canonical board {index.canonicalBoard(index.canonicalId(board))}')
+    assert all(decode(encode(bd)) == bd for bd in getStateSpace().boards)
+    assert all(index.canonicalId(index.canonicalBoard(cid)) == cid for cid in range(len(index)))
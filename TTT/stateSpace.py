@@ -0,0 +1,134 @@
+import bitboard
+import os
+import pickle
+from typing import Dict, List, NoReturn, Optional, Tuple
+from utils import NEWBOARD, OMARK, XMARK, setMove
+
+"""
+    Every board that can be reached in a legal game, enumerated once.
+    There are 5,478 of them. Each gets a dense integer id (the order in which it was discovered)
+    and precomputed: winner, side to move, legal-move mask, empty count, and successor ids.
+    Play stops at a win or a full board, so terminal boards have no legal moves and no successors.
+
+    The table is built the first time getStateSpace() is called and saved to CACHEFILE.
+    Later runs load it from there.
+"""
+
+CACHEFILE: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stateSpace.cache')
+# Change this whenever the layout of the cached file changes.
+CACHEVERSION: int = 1
+
+# No successor: the move is not legal on that board.
+NOSTATE: int = -1
+
+
+class StateSpace:
+
+    def __init__(self, boards: List[str]) -> NoReturn:
+        """
+        Compute everything else from the list of reachable boards.
+        :param boards: the reachable boards; boards[i] gets id i.
+        """
+        self.boards: List[str] = boards
+        self.ids: Dict[str, int] = {board: stateId for (stateId, board) in enumerate(boards)}
+        self.winners: List[Optional[str]] = []
+        self.toMove: List[str] = []
+        self.legalMasks: List[int] = []
+        self.emptyCounts: List[int] = []
+        self.validMoves: List[Tuple[int, ...]] = []
+        self.successors: List[Tuple[int, ...]] = []
+        for board in boards:
+            (xMask, oMask) = bitboard.toMasks(board)
+            winner = bitboard.winner(xMask, oMask)
+            mark = bitboard.whoseMove(xMask, oMask)
+            emptyCount = bitboard.emptyCount(xMask, oMask)
+            legalMask = 0 if winner else bitboard.emptyMask(xMask, oMask)
+            self.winners.append(winner)
+            self.toMove.append(mark)
+            self.legalMasks.append(legalMask)
+            self.emptyCounts.append(emptyCount)
+            self.validMoves.append(bitboard.MOVES[legalMask])
+            self.successors.append(tuple(self.ids[setMove(board, move, mark)] if legalMask & bit else NOSTATE
+                                         for (move, bit) in enumerate(bitboard.CELLBITS)))
+
+    def __len__(self) -> int:
+        return len(self.boards)
+
+    def getId(self, board: str) -> int:
+        return self.ids[board]
+
+    def isTerminal(self, stateId: int) -> bool:
+        return self.legalMasks[stateId] == 0
+
+    def successor(self, stateId: int, move: int) -> int:
+        """
+        The id of the board after the side to move plays move, or NOSTATE if move is not legal.
+        :param stateId:
+        :param move:
+        :return: the successor's id
+        """
+        return self.successors[stateId][move]
+
+
+def enumerateBoards() -> List[str]:
+    """
+    Breadth-first enumeration of all reachable boards, starting from NEWBOARD.
+    :return: the boards in the order they were discovered
+    """
+    boards = [NEWBOARD]
+    seen = {NEWBOARD}
+    for board in boards:
+        (xMask, oMask) = bitboard.toMasks(board)
+        if bitboard.winner(xMask, oMask):
+            continue
+        mark = bitboard.whoseMove(xMask, oMask)
+        for move in bitboard.validMoves(xMask, oMask):
+            nextBoard = setMove(board, move, mark)
+            if nextBoard not in seen:
+                seen.add(nextBoard)
+                boards.append(nextBoard)
+    return boards
+
+def loadStateSpace(fileName: str=CACHEFILE) -> Optional[StateSpace]:
+    """
+    Read the table from the cache file.
+    :param fileName:
+    :return: the StateSpace, or None if there is no usable cache file.
+    """
+    try:
+        with open(fileName, 'rb') as cacheFile:
+            (version, states) = pickle.load(cacheFile)
+    except (OSError, pickle.UnpicklingError, AttributeError, EOFError, ValueError, TypeError):
+        return None
+    return states if version == CACHEVERSION else None
+
+def saveStateSpace(states: StateSpace, fileName: str=CACHEFILE) -> NoReturn:
+    try:
+        with open(fileName, 'wb') as cacheFile:
+            pickle.dump((CACHEVERSION, states), cacheFile, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        # Not being able to write the cache is not an error. The table is rebuilt next time.
+        pass
+
+
+_stateSpace: Optional[StateSpace] = None
+
+def getStateSpace() -> StateSpace:
+    """
+    The single StateSpace, built (or loaded from CACHEFILE) the first time it is asked for.
+    """
+    global _stateSpace
+    if _stateSpace is None:
+        _stateSpace = loadStateSpace(CACHEFILE)
+        if _stateSpace is None:
+            _stateSpace = StateSpace(enumerateBoards())
+            saveStateSpace(_stateSpace, CACHEFILE)
+    return _stateSpace
+
+
+if __name__ == '__main__':
+    states = getStateSpace()
+    print(f'{len(states)} reachable boards. '
+          f'{sum(1 for winner in states.winners if winner == XMARK)} X wins, '
+          f'{sum(1 for winner in states.winners if winner == OMARK)} O wins, '
+          f'{sum(1 for (winner, empties) in zip(states.winners, states.emptyCounts) if not winner and empties == 0)} ties.')
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from arrayQTable import ArrayQTable
+from qTable import QTable
+from stateSpace import getStateSpace
+
+"""
+    ArrayQTable's batch update against one updateQValue call per transition, and its reads against QTable's.
+
+        python -m pytest test_arrayQTable.py
+"""
+
+TYPENAME: str = 'LearningPlayer'
+
+
+def randomTable(generator: np.random.Generator) -> ArrayQTable:
+    table = ArrayQTable(typeNames=[TYPENAME])
+    table.qValues[:] = generator.uniform(-10, 10, table.qValues.shape)
+    return table
+
+def randomTransitions(generator: np.random.Generator, size: int) -> tuple:
+    """
+    size transitions from non-terminal states, drawn from few states so that many (state, move)s repeat.
+    """
+    states = getStateSpace()
+    nonTerminal = [stateId for stateId in range(len(states)) if states.validMoves[stateId]][:40]
+    stateIds = generator.choice(nonTerminal, size)
+    moves = np.array([generator.choice(states.validMoves[stateId]) for stateId in stateIds.tolist()])
+    rewards = generator.uniform(-1, 1, size)
+    nextStateIds = np.where(generator.random(size) < 0.2, -1, generator.integers(len(states), size=size))
+    alphas = generator.uniform(0.05, 0.9, size)
+    return (stateIds, moves, rewards, nextStateIds, alphas, 0.9)
+
+def testUpdateQValuesMatchesUpdateQValueCalls():
+    generator = np.random.default_rng(1)
+    (batchTable, table) = (randomTable(np.random.default_rng(2)), randomTable(np.random.default_rng(2)))
+    (stateIds, moves, rewards, nextStateIds, alphas, gamma) = randomTransitions(generator, 2000)
+    boards = getStateSpace().boards
+
+    tdErrors = batchTable.updateQValues(TYPENAME, stateIds, moves, rewards, nextStateIds, alphas, gamma)
+
+    # Every target uses the q-values from before the batch.
+    targets = [reward + (0 if nextStateId < 0 else gamma * table.getBestQValue(boards[nextStateId], TYPENAME))
+               for (reward, nextStateId) in zip(rewards.tolist(), nextStateIds.tolist())]
+    oldQValues = [table.qValues[table.index.canonicalIds[stateId], 0, table.getQMove(boards[stateId], move)]
+                  for (stateId, move) in zip(stateIds.tolist(), moves.tolist())]
+    for (stateId, move, alpha, target) in zip(stateIds.tolist(), moves.tolist(), alphas.tolist(), targets):
+        table.updateQValue(boards[stateId], TYPENAME, move, alpha, target)
+
+    assert len(set(zip(stateIds.tolist(), moves.tolist()))) < len(stateIds)
+    np.testing.assert_allclose(batchTable.qValues, table.qValues, rtol=0, atol=1e-5)
+    np.testing.assert_array_equal(batchTable.visitCounts, table.visitCounts)
+    np.testing.assert_array_equal(batchTable.visited, table.visited)
+    np.testing.assert_allclose(tdErrors, np.array(targets) - np.array(oldQValues), rtol=0, atol=1e-5)
+    assert batchTable.updates == table.updates
+
+def testStateTablesFollowStateIds():
+    table = ArrayQTable()
+    (stateCanonicalIds, stateQMoves) = table.stateTables()
+    boards = getStateSpace().boards
+    assert stateCanonicalIds.tolist() == [table.index.canonicalId(board) for board in boards]
+    for stateId in range(0, len(boards), 97):
+        assert stateQMoves[stateId].tolist() == [table.getQMove(boards[stateId], move) for move in range(9)]
+
+def testReadsDoNotAddTypes():
+    table = ArrayQTable(typeNames=[TYPENAME])
+    board = 'X...O....'
+    canonicalIds = table.canonicalIds([board])
+    assert table.getQValueDict(board, 'WinsBlocksPlayer') == QTable().getQValueDict(board, 'WinsBlocksPlayer')
+    assert table.getBestQValue(board, 'WinsBlocksPlayer') == 0
+    assert table.getBestQMovesFromQBoard(table.getQBoard(board), 'WinsBlocksPlayer') == \
+           QTable().getBestQMovesFromQBoard(table.getQBoard(board), 'WinsBlocksPlayer')
+    assert table.bestQValues(canonicalIds, 'WinsBlocksPlayer').tolist() == [0]
+    assert table.bestQMoves(canonicalIds, 'WinsBlocksPlayer').tolist() == [table.legalQMoves[canonicalIds[0]][0]]
+    assert table.typeNames == [TYPENAME] and table.stats()['lookupMisses'] == 3
+
+def testUpdatesMatchQTable():
+    generator = np.random.default_rng(4)
+    (table, expected) = (ArrayQTable(), QTable())
+    boards = getStateSpace().boards
+    (stateIds, moves, rewards, _, alphas, _) = randomTransitions(generator, 1000)
+    for (stateId, move, reward, alpha) in zip(stateIds.tolist(), moves.tolist(), rewards.tolist(), alphas.tolist()):
+        for t in (table, expected):
+            t.updateQValue(boards[stateId], TYPENAME, move, alpha, reward)
+    for board in boards[:500]:
+        assert table.getQValueDict(board, TYPENAME) == pytest.approx(expected.getQValueDict(board, TYPENAME))
+        assert table.getBestQMovesFromQBoard(table.getQBoard(board), TYPENAME) == \
+               expected.getBestQMovesFromQBoard(expected.getQBoard(board), TYPENAME)
+    assert table.stats()['entries'] == expected.stats()['entries']
+    copied = ArrayQTable.fromQTable(expected)
+    np.testing.assert_allclose(copied.qValues, table.qValues, rtol=0, atol=1e-6)
+    np.testing.assert_array_equal(copied.visitCounts, table.visitCounts)
@@ -0,0 +1,39 @@
+import io
+from gameManager import GameManager
+from gameRecord import decode, encode, readRecords, recordBytes, sarsLists, writeRecords
+from geometry import BoardGeometry
+from output import QUIET, Output
+from players import LearningPlayer, WinsBlocksPlayer
+from rng import RNG
+from utils import OMARK, XMARK
+
+"""
+    Game records: packing, files, and the sars lists rebuilt from them.
+
+        python -m pytest test_gameRecord.py
+"""
+
+
+def testRecordsRoundTrip():
+    for (geometry, moves, winner) in ((BoardGeometry(), [4, 0, 8, 2, 1, 7, 6, 3, 5], None),
+                                      (BoardGeometry(), [0, 3, 1, 4, 2], XMARK),
+                                      (BoardGeometry(3, 4, 3), [11, 0, 10, 1, 5, 2], OMARK)):
+        record = encode(moves, winner, 'LearningPlayer', 'MinimaxPlayer', geometry)
+        assert decode(record, geometry) == (moves, winner, 'LearningPlayer', 'MinimaxPlayer')
+    assert recordBytes() == 7
+
+def testFilesRoundTrip():
+    geometry = BoardGeometry(4, 4, 3)
+    records = [encode(list(range(n)), None, 'Player', 'HumanPlayer', geometry) for n in range(17)]
+    file = io.BytesIO()
+    assert writeRecords(file, records, geometry) == len(records)
+    assert len(file.getvalue()) == len(records) * recordBytes(geometry)
+    assert list(readRecords(io.BytesIO(file.getvalue()), geometry)) == records
+
+def testSarsListsAreThePlayers():
+    for seed in range(20):
+        manager = GameManager(output=Output(QUIET), rng=RNG(seed))
+        for (xPlayerClass, oPlayerClass) in ((LearningPlayer, WinsBlocksPlayer), (WinsBlocksPlayer, LearningPlayer)):
+            manager.playAGame(xPlayerClass, oPlayerClass, isATestGame=False)
+            assert sarsLists(manager.gameRecord()) == (manager.XDict['player'].sarsList,
+                                                       manager.ODict['player'].sarsList)
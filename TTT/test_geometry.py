@@ -0,0 +1,64 @@
+import bitboard
+from geometry import TABLECELLS, TICTACTOE, BoardGeometry
+from utils import theWinner, winnerAfterMove
+
+"""
+    k in a row on square and non-square boards, and their symmetries.
+
+        python -m pytest test_geometry.py
+"""
+
+
+def testWinLinesOfNonSquareBoards():
+    # 3 rows x 4 columns, 3 in a row: 6 in rows, 4 in columns, 2 + 2 on the diagonals.
+    geometry = BoardGeometry(3, 4, 3)
+    assert len(geometry.winLines) == 14
+    assert (0, 1, 2) in geometry.winLines and (1, 2, 3) in geometry.winLines
+    assert (0, 4, 8) in geometry.winLines and (3, 6, 9) in geometry.winLines
+    assert (0, 1, 2, 3) not in geometry.winLines
+    # 4 rows x 5 columns, 4 in a row: 8 in rows, 5 in columns, 2 + 2 on the diagonals.
+    assert len(BoardGeometry(4, 5, 4).winLines) == 17
+    assert len(TICTACTOE.winLines) == 8
+
+def testWinsOnNonSquareBoards():
+    geometry = BoardGeometry(3, 4, 3)
+    board = 'XXX.' + 'OO..' + '....'
+    assert theWinner(board, geometry) == 'X'
+    assert theWinner('.XXX' + 'OO..' + '....', geometry) == 'X'
+    assert theWinner('XX.X' + 'OO..' + '....', geometry) is None
+    assert theWinner('O...' + 'XO..' + 'XXO.', geometry) == 'O'
+
+def testTablesMatchTheComputedAnswers():
+    # Boards of up to TABLECELLS cells look the answers up. Larger ones compute them.
+    for geometry in (BoardGeometry(3, 4, 3), BoardGeometry(4, 5, 4)):
+        for mask in range(0, geometry.fullMask + 1, 7 if geometry.cells <= TABLECELLS else 9973):
+            assert geometry.hasWin(mask) == geometry._hasWin(mask)
+            assert geometry.moves(mask) == geometry._movesOfBits(mask) == geometry._moves(mask)
+            assert geometry.popcount(mask) == bin(mask).count('1')
+
+def testWinsThroughACell():
+    geometry = BoardGeometry(4, 5, 4)
+    for line in geometry.winLines[::3]:
+        mask = geometry.lineMask(line)
+        for pos in range(geometry.cells):
+            assert geometry.hasWinThrough(mask, pos) == (pos in line)
+    masks = bitboard.setMove(0, 0, 7, 'X')
+    assert winnerAfterMove(masks, 7, 'X', 1, geometry) == (None, False)
+
+def testSymmetriesArePermutations():
+    for geometry in (TICTACTOE, BoardGeometry(3, 4, 3), BoardGeometry(4, 4, 3)):
+        assert len(geometry.symmetries) == (8 if geometry.isSquare else 4)
+        assert len(set(geometry.symmetries)) == len(geometry.symmetries)
+        for (perm, inverse) in zip(geometry.symmetries, geometry.inverseSymmetries):
+            assert sorted(perm) == list(range(geometry.cells))
+            assert [perm[inverse[pos]] for pos in range(geometry.cells)] == list(range(geometry.cells))
+            # Symmetries map win lines onto win lines.
+            lines = {frozenset(line) for line in geometry.winLines}
+            assert {frozenset(inverse[pos] for pos in line) for line in lines} == lines
+
+def testCornersSidesAndCenter():
+    geometry = BoardGeometry(3, 4, 3)
+    assert geometry.corners == [0, 3, 8, 11]
+    assert geometry.sides == [1, 2, 4, 7, 9, 10]
+    assert geometry.center is None
+    assert (TICTACTOE.corners, TICTACTOE.sides, TICTACTOE.center) == ([0, 2, 6, 8], [1, 3, 5, 7], 4)
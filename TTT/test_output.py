@@ -0,0 +1,53 @@
+from gameManager import GameManager
+from output import GAMES, PROGRESS, QUIET, TABLES, Output
+from players import LearningPlayer, WinsBlocksPlayer
+from qStore import DICT
+from qTable import QTable
+from rng import RNG
+from trainer import Trainer
+
+"""
+    Output levels: what is written at each, and that nothing is formatted when it is not shown.
+
+        python -m pytest test_output.py
+"""
+
+
+def testMessagesAreBuiltOnlyWhenShown(capsys):
+    built = []
+    def message():
+        built.append(1)
+        return 'shown'
+    quiet = Output(PROGRESS)
+    quiet.say(GAMES, message)
+    quiet.say(PROGRESS, message)
+    assert (built, capsys.readouterr().out) == ([1], 'shown\n')
+
+def testFileSinks(tmp_path):
+    fileName = str(tmp_path / 'out.txt')
+    out = Output(GAMES, fileName)
+    out.say(PROGRESS, 'one')
+    out.say(TABLES, 'hidden')
+    out.close()
+    Output(GAMES, fileName).say(GAMES, 'two')
+    with open(fileName) as file:
+        assert file.read() == 'one\ntwo\n'
+
+def testTablesAreShownOnlyAtTables(capsys):
+    table = QTable()
+    table.updateQValue('X........', 'LearningPlayer', 4, 0.5, 1.0)
+    table.printQTable(Output(GAMES))
+    assert capsys.readouterr().out == ''
+    table.printQTable(Output(TABLES))
+    assert 'QTable contains 1 entries.' in capsys.readouterr().out
+
+def testReplaysAreShownOnlyAtGames(capsys):
+    for (level, shown) in ((PROGRESS, False), (GAMES, True)):
+        manager = GameManager(output=Output(level), rng=RNG(1))
+        (finalBoard, result) = manager.playAGame(LearningPlayer, WinsBlocksPlayer)
+        manager.printReplay(finalBoard, result)
+        assert bool(capsys.readouterr().out) == shown
+
+def testQuietTrainingWritesNothing(capsys):
+    Trainer(N=20, trainingSegments=2, output=Output(QUIET), rng=RNG(1), storage=DICT).train()
+    assert capsys.readouterr().out == ''
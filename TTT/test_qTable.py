@@ -0,0 +1,93 @@
+import pytest
+from qTable import QTable
+
+"""
+    QTable snapshots, which are copy-on-write and read-only, QTable's caches, and its symmetries.
+
+        python -m pytest test_qTable.py
+"""
+
+BOARD: str = 'X...O....'
+TYPENAME: str = 'LearningPlayer'
+
+
+def testSnapshotsDoNotChangeWithTraining():
+    table = QTable()
+    table.updateQValue(BOARD, TYPENAME, 8, 0.5, 1.0)
+    snapshot = table.snapshot()
+    expected = (snapshot.getQValueDict(BOARD, TYPENAME), snapshot.getVisitCounts(snapshot.getQBoard(BOARD), TYPENAME))
+
+    # An update of the shared entry, of a new type on the same board, and of a new board.
+    table.updateQValue(BOARD, TYPENAME, 8, 0.5, 3.0)
+    table.updateQValue(BOARD, 'WinsBlocksPlayer', 8, 0.5, 1.0)
+    table.updateQValue('X........', TYPENAME, 4, 0.5, 1.0)
+    table.setEntry(table.getQBoard(BOARD), TYPENAME, {move: 7.0 for move in range(9)}, [1] * 9)
+
+    assert (snapshot.getQValueDict(BOARD, TYPENAME), snapshot.getVisitCounts(snapshot.getQBoard(BOARD), TYPENAME)) == \
+           expected
+    assert snapshot.stats()['entries'] == 1
+    assert table.stats()['entries'] == 3
+    assert table.getQValueDict(BOARD, TYPENAME)[table.getQMove(BOARD, 8)] == 7.0
+
+def testLaterSnapshotsSeeLaterUpdates():
+    table = QTable()
+    table.updateQValue(BOARD, TYPENAME, 8, 0.5, 1.0)
+    first = table.snapshot()
+    table.updateQValue(BOARD, TYPENAME, 8, 0.5, 3.0)
+    second = table.snapshot()
+    table.updateQValue(BOARD, TYPENAME, 8, 0.5, 5.0)
+    qMove = table.getQMove(BOARD, 8)
+    assert [t.getQValueDict(BOARD, TYPENAME)[qMove] for t in (first, second, table)] == [0.5, 1.75, 3.375]
+
+def testSnapshotsCannotBeChanged():
+    table = QTable()
+    table.updateQValue(BOARD, TYPENAME, 8, 0.5, 1.0)
+    snapshot = table.snapshot()
+    with pytest.raises(ValueError):
+        snapshot.updateQValue(BOARD, TYPENAME, 8, 0.5, 1.0)
+    with pytest.raises(ValueError):
+        snapshot.setEntry(snapshot.getQBoard(BOARD), TYPENAME, {move: 1.0 for move in range(9)}, [1] * 9)
+    assert snapshot.getQValueDict(BOARD, TYPENAME) == table.getQValueDict(BOARD, TYPENAME)
+
+def testCacheInfoCoversBothCaches():
+    table = QTable()
+    table.updateQValue(BOARD, TYPENAME, 8, 0.5, 1.0)
+    table.getBestMove(BOARD, TYPENAME)
+    info = table.cacheInfo()
+    assert set(info) == {'qBoardCache', 'orbitCache'}
+    assert all(cacheInfo['size'] == 1 and cacheInfo['hits'] > 0 for cacheInfo in info.values())
+    table.clearCache()
+    assert all(cacheInfo['size'] == 0 for cacheInfo in table.cacheInfo().values())
+
+def testTransformsRoundTrip():
+    table = QTable()
+    board = 'XO..X...O'
+    for (r, f) in table.geometry.transforms:
+        transformed = table.transform(board, r, f)
+        assert table.restore(transformed, r, f) == board
+        # A move on board is the move reverseTransformMove finds from its image.
+        for move in range(9):
+            qMove = table.inversePatterns[(r, f)][move]
+            assert transformed[qMove] == board[move]
+            assert table.reverseTransformMove(qMove, r, f) == move
+
+def testMovesMapOntoTheCanonicalBoard():
+    table = QTable(collapseSymmetricMoves=False)
+    for board in ('X........', '.X..O....', 'XO..X...O'):
+        (qBoard, r, f) = table.getQBoardWithRF(board)
+        assert qBoard == min(table.transform(board, r2, f2) for (r2, f2) in table.geometry.transforms)
+        for move in range(9):
+            assert qBoard[table.getQMove(board, move)] == board[move]
+
+def testSymmetricMovesShareAQValue():
+    table = QTable()
+    # On the empty board, the corners are equivalent, and so are the sides.
+    assert table.moveOrbits('.........') == (0, 1, 0, 1, 4, 1, 0, 1, 0)
+    assert table.choosableQMoves('.........') == [0, 1, 4]
+    table.updateQValue('.........', TYPENAME, 8, 0.5, 1.0)
+    assert table.getQValueDict('.........', TYPENAME)[0] == 0.5
+    assert table.getBestMove('.........', TYPENAME) in (0, 2, 6, 8)
+    separate = QTable(collapseSymmetricMoves=False)
+    separate.updateQValue('.........', TYPENAME, 8, 0.5, 1.0)
+    assert separate.getQValueDict('.........', TYPENAME)[8] == 0.5
+    assert separate.getBestMove('.........', TYPENAME) == 8
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+from arrayQTable import ArrayQTable
+from qTable import QTable
+from qTableExport import exportCsv, exportJsonLines, query
+from utils import OMARK, XMARK
+
+"""
+    Querying and exporting QTables.
+
+        python -m pytest test_qTableExport.py
+"""
+
+
+def trainedTable(table: QTable) -> QTable:
+    table.updateQValue('.........', 'LearningPlayer', 4, 0.5, 10.0)
+    table.updateQValue('X........', 'LearningPlayer', 4, 0.5, -4.0)
+    table.updateQValue('X...O....', 'LearningPlayer', 8, 0.5, 2.0)
+    table.updateQValue('X...O....', 'WinsBlocksPlayer', 8, 0.5, 1.0)
+    return table
+
+def testFilters():
+    table = trainedTable(QTable())
+    assert len(list(query(table))) == 4
+    assert [entry.depth for entry in query(table, typeName='LearningPlayer', toMove=OMARK)] == [1]
+    assert {entry.typeName for entry in query(table, depth=2)} == {'LearningPlayer', 'WinsBlocksPlayer'}
+    assert [entry.bestValue for entry in query(table, minValue=2)] == [5.0]
+    assert [entry.bestValue for entry in query(table, maxValue=0.5, toMove=XMARK)] == [0.5]
+
+def testEntries():
+    table = trainedTable(QTable())
+    (entry,) = query(table, depth=0)
+    # The empty board has three orbits of moves: the corners, the sides and the center.
+    assert entry.qValues == {0: 0, 1: 0, 4: 5.0}
+    assert (entry.bestMoves, entry.bestValue, entry.toMove) == ([4], 5.0, XMARK)
+
+def testJsonLinesAndCsvAgree():
+    for table in (trainedTable(QTable()), trainedTable(ArrayQTable())):
+        (jsonFile, csvFile) = (io.StringIO(), io.StringIO())
+        assert exportJsonLines(table, jsonFile, typeName='LearningPlayer') == 3
+        assert exportCsv(table, csvFile, typeName='LearningPlayer') == 3
+        lines = [json.loads(line) for line in jsonFile.getvalue().splitlines()]
+        rows = list(csv.DictReader(io.StringIO(csvFile.getvalue())))
+        assert [line['board'] for line in lines] == [row['board'] for row in rows]
+        for (line, row) in zip(lines, rows):
+            assert {int(move): value for (move, value) in line['qValues'].items()} == \
+                   {move: float(row[f'q{move}']) for move in range(9) if row[f'q{move}']}
+            assert line['bestMoves'] == [int(move) for move in row['bestMoves'].split()]
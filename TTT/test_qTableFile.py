@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from arrayQTable import ArrayQTable
+from qTableFile import COPYONWRITE, READ, READWRITE, loadQTable, saveQTable
+
+"""
+    Save, update and reload qTableFile files.
+
+        python -m pytest test_qTableFile.py
+"""
+
+BOARD: str = 'X........'
+
+
+def savedTable(fileName: str) -> ArrayQTable:
+    table = ArrayQTable(typeNames=['LearningPlayer', 'WinsBlocksPlayer'])
+    table.updateQValue(BOARD, 'LearningPlayer', 4, 0.5, 1.0)
+    saveQTable(table, fileName)
+    return table
+
+def testReadWriteUpdatesReachTheFile(tmp_path):
+    fileName = str(tmp_path / 'q.bin')
+    savedTable(fileName)
+    table = loadQTable(fileName, READWRITE)
+    board = 'X...O....'
+    table.updateQValue(board, 'WinsBlocksPlayer', 8, 0.25, 2.0)
+    table.updateQValue(BOARD, 'LearningPlayer', 4, 0.5, 1.0)
+    expected = (table.getQValueDict(board, 'WinsBlocksPlayer'), table.getQValueDict(BOARD, 'LearningPlayer'))
+    del table
+
+    reloaded = loadQTable(fileName, READ)
+    assert (reloaded.getQValueDict(board, 'WinsBlocksPlayer'), reloaded.getQValueDict(BOARD, 'LearningPlayer')) == \
+           expected
+    assert reloaded.getQValueDict(BOARD, 'LearningPlayer')[4] == 0.75
+    assert sum(reloaded.getVisitCounts(reloaded.getQBoard(BOARD), 'LearningPlayer')) == 2
+    assert reloaded.stats()['entries'] == 2
+    assert reloaded.visited.dtype == bool
+
+def testCopyOnWriteUpdatesStayInTheProcess(tmp_path):
+    fileName = str(tmp_path / 'q.bin')
+    savedTable(fileName)
+    table = loadQTable(fileName, COPYONWRITE)
+    table.updateQValue('X...O....', 'WinsBlocksPlayer', 8, 0.25, 2.0)
+    assert table.stats()['entries'] == 2
+    assert loadQTable(fileName, READ).stats()['entries'] == 1
+
+def testReadWriteCannotAddTypes(tmp_path):
+    fileName = str(tmp_path / 'q.bin')
+    savedTable(fileName)
+    table = loadQTable(fileName, READWRITE)
+    with pytest.raises(ValueError):
+        table.updateQValue(BOARD, 'HardWiredPlayer', 4, 0.5, 1.0)
+    # The arrays are still the file's.
+    table.updateQValue(BOARD, 'LearningPlayer', 4, 0.5, 1.0)
+    assert loadQTable(fileName, READ).getQValueDict(BOARD, 'LearningPlayer')[4] == 0.75
+
+def testReadWriteSnapshotsAreCopies(tmp_path):
+    fileName = str(tmp_path / 'q.bin')
+    savedTable(fileName)
+    table = loadQTable(fileName, READWRITE)
+    snapshot = table.snapshot()
+    table.updateQValue(BOARD, 'LearningPlayer', 4, 0.5, 1.0)
+    assert snapshot.getQValueDict(BOARD, 'LearningPlayer')[4] == 0.5
+    assert loadQTable(fileName, READ).getQValueDict(BOARD, 'LearningPlayer')[4] == 0.75
+    assert not np.shares_memory(snapshot.qValues, table.qValues)
+
+def testCollapseSymmetricMovesIsKept(tmp_path):
+    fileName = str(tmp_path / 'q.bin')
+    table = ArrayQTable(collapseSymmetricMoves=False)
+    table.updateQValue(BOARD, 'LearningPlayer', 8, 0.5, 1.0)
+    saveQTable(table, fileName)
+    reloaded = loadQTable(fileName)
+    assert not reloaded.collapseSymmetricMoves
+    assert reloaded.getQValueDict(BOARD, 'LearningPlayer') == table.getQValueDict(BOARD, 'LearningPlayer')
+    with pytest.raises(ValueError):
+        loadQTable(fileName, collapseSymmetricMoves=True)
+
+def testFailedUpdatesChangeNothing(tmp_path):
+    fileName = str(tmp_path / 'q.bin')
+    savedTable(fileName)
+    for table in (loadQTable(fileName, READ), savedTable(str(tmp_path / 'other.bin')).snapshot()):
+        board = 'X...O....'
+        with pytest.raises(ValueError):
+            table.updateQValue(board, 'LearningPlayer', 8, 0.5, 1.0)
+        assert table.stats()['entries'] == 1 and table.stats()['updates'] == 0
+        assert sum(table.getVisitCounts(table.getQBoard(board), 'LearningPlayer')) == 0
+
+def testLoadedTablesShareTheLegalMoveTables(tmp_path):
+    fileName = str(tmp_path / 'q.bin')
+    table = savedTable(fileName)
+    reloaded = loadQTable(fileName)
+    assert reloaded.legalMasks is table.legalMasks and reloaded.legalQMoves is table.legalQMoves
+    assert reloaded.typeNames == table.typeNames
+    assert reloaded.qValues.shape == table.qValues.shape
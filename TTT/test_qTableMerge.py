@@ -0,0 +1,65 @@
+import pytest
+from arrayQTable import ArrayQTable
+from qTable import QTable
+from qTableMerge import LASTWRITER, MAX, VISITWEIGHTED, Change, diff, merge
+
+"""
+    Merging independently trained QTables, and diffing them.
+
+        python -m pytest test_qTableMerge.py
+"""
+
+BOARD: str = 'X...O....'
+TYPENAME: str = 'LearningPlayer'
+
+
+def trainedTables() -> tuple:
+    """
+    Two tables that both updated BOARD's move 8, one of them twice, and each updated a board the other didn't.
+    """
+    (first, second) = (QTable(), QTable())
+    first.updateQValue(BOARD, TYPENAME, 8, 0.5, 4.0)
+    second.updateQValue(BOARD, TYPENAME, 8, 0.5, 1.0)
+    second.updateQValue(BOARD, TYPENAME, 8, 0.5, 1.0)
+    first.updateQValue('X........', TYPENAME, 4, 0.5, 2.0)
+    second.updateQValue('X...O...X', TYPENAME, 2, 0.5, 2.0)
+    return (first, second)
+
+@pytest.mark.parametrize('policy, expected', [(VISITWEIGHTED, (2.0 + 2 * 0.75) / 3), (MAX, 2.0),
+                                              (LASTWRITER, 0.75)])
+def testPolicies(policy, expected):
+    (first, second) = trainedTables()
+    merged = merge([first, second], policy)
+    qMove = merged.getQMove(BOARD, 8)
+    assert merged.getQValueDict(BOARD, TYPENAME)[qMove] == pytest.approx(expected)
+    assert merged.getVisitCounts(merged.getQBoard(BOARD), TYPENAME)[qMove] == 3
+    # Entries only one table has are copied.
+    assert merged.getQValueDict('X........', TYPENAME) == first.getQValueDict('X........', TYPENAME)
+    assert merged.getQValueDict('X...O...X', TYPENAME) == second.getQValueDict('X...O...X', TYPENAME)
+    assert merged.stats()['entries'] == 3
+
+def testMergeIntoAnArrayQTable():
+    (first, second) = trainedTables()
+    merged = merge([first, second], into=ArrayQTable())
+    assert list(diff(merge([first, second]), merged, threshold=1e-6)) == []
+
+def testMergeIntoOneOfTheTables():
+    (first, second) = trainedTables()
+    expected = merge([first, second])
+    assert merge([first, second], into=first) is first
+    assert list(diff(expected, first)) == []
+
+def testTablesMustMatch():
+    with pytest.raises(AssertionError):
+        merge([QTable(), QTable(collapseSymmetricMoves=False)])
+
+def testDiff():
+    (first, second) = trainedTables()
+    changes = list(diff(first, second, threshold=0.1))
+    qBoard = first.getQBoard(BOARD)
+    assert Change(qBoard, TYPENAME, first.getQMove(BOARD, 8), 2.0, 0.75) in changes
+    # Missing entries count as the initial values, 0.
+    assert {(change.board, change.before, change.after) for change in changes} == \
+           {(qBoard, 2.0, 0.75), (first.getQBoard('X........'), 1.0, 0), (first.getQBoard('X...O...X'), 0, 1.0)}
+    assert list(diff(first, first)) == []
+    assert len(list(diff(first, second, threshold=1.5))) == 0
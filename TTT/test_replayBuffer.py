@@ -0,0 +1,36 @@
+import numpy as np
+from replayBuffer import PRIORITIZED, ReplayBuffer, SumTree
+from rng import RNG
+
+"""
+    The sum tree behind PRIORITIZED sampling, against a running sum over every slot.
+
+        python -m pytest test_replayBuffer.py
+"""
+
+
+def testSumTreeFindsLikeARunningSum():
+    generator = np.random.default_rng(1)
+    for capacity in (1, 5, 8, 1000):
+        tree = SumTree(capacity)
+        values = np.zeros(capacity)
+        for _ in range(2000):
+            slots = generator.integers(capacity, size=generator.integers(1, 40))
+            newValues = generator.random(len(slots))
+            tree.update(slots, newValues)
+            # Like the tree, the last value wins for a repeated slot.
+            values[slots] = newValues
+        np.testing.assert_allclose(tree.values(np.arange(capacity)), values)
+        assert abs(tree.total() - values.sum()) < 1e-9
+        targets = generator.random(10000) * tree.total()
+        expected = np.searchsorted(np.cumsum(values), targets, side='right')
+        np.testing.assert_array_equal(np.minimum(tree.find(targets), capacity - 1),
+                                      np.minimum(expected, capacity - 1))
+
+def testManyPlayerTypes():
+    buffer = ReplayBuffer(PRIORITIZED, capacity=512, rng=RNG(1))
+    for typeNumber in range(300):
+        buffer.add(f'Player{typeNumber}', 'X', [('.........', 4, 0.0, None)])
+    assert buffer.typeNames[buffer.typeIds[299]] == 'Player299'
+    (slots, weights) = buffer.sample(64)
+    assert slots.max() < 300 and np.all(weights <= 1)
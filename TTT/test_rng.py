@@ -0,0 +1,48 @@
+from gameManager import GameManager
+from output import QUIET, Output
+from players import LearningPlayer, WinsBlocksPlayer
+from qStore import DICT
+from rng import RNG
+from trainer import Trainer
+from typing import List
+
+"""
+    Seeded RNG streams, and the runs that use them.
+
+        python -m pytest test_rng.py
+"""
+
+
+def draws(rng: RNG) -> List[float]:
+    return [rng.random() for _ in range(5)]
+
+def testStreamsAreReproducible():
+    assert draws(RNG(7)) == draws(RNG(7))
+    assert draws(RNG(7)) != draws(RNG(8))
+    assert draws(RNG(7).spawn('worker', 1)) == draws(RNG(7).spawn('worker', 1))
+    assert draws(RNG(7).spawn('worker', 1)) != draws(RNG(7).spawn('worker', 2))
+
+def testChildrenDoNotDependOnTheParentsUse():
+    (used, unused) = (RNG(7), RNG(7))
+    draws(used)
+    assert draws(used.spawn('game', 3)) == draws(unused.spawn('game', 3))
+    assert draws(unused.spawn('game').spawn(3)) == draws(unused.spawn('game', 3))
+
+def testGamesAreReproducible():
+    records = []
+    for _ in range(2):
+        manager = GameManager(output=Output(QUIET), rng=RNG(3))
+        for _ in range(10):
+            manager.playAGame(LearningPlayer, WinsBlocksPlayer, isATestGame=False)
+            records.append(manager.gameRecord())
+    assert records[:10] == records[10:]
+    assert len(set(records)) > 1
+
+def testTrainingIsReproducible():
+    tables = []
+    for _ in range(2):
+        trainer = Trainer(N=30, trainingSegments=3, output=Output(QUIET), rng=RNG(11), storage=DICT)
+        trainer.train()
+        tables.append(sorted((qBoard, typeName, sorted(qValueDict.items()))
+                             for (qBoard, typeName, qValueDict) in trainer.qTable.entries()))
+    assert tables[0] == tables[1]
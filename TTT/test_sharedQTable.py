@@ -0,0 +1,77 @@
+import multiprocessing
+import numpy as np
+import pytest
+from arrayQTable import ArrayQTable
+from multiprocessing import shared_memory
+from sharedQTable import HOGWILD, STRIPED, SharedQTable, SharedQTableHandle
+from stateSpace import getStateSpace
+from typing import NoReturn
+
+"""
+    SharedQTable's lifecycle, and STRIPED updates from several processes.
+
+        python -m pytest test_sharedQTable.py
+"""
+
+BOARD: str = 'X...O....'
+TYPENAMES = ['LearningPlayer', 'WinsBlocksPlayer']
+# Each process's updates of BOARD, and of each batch.
+UPDATES: int = 300
+BATCHSIZE: int = 50
+
+
+def update(handle: SharedQTableHandle) -> NoReturn:
+    table = SharedQTable.attach(handle)
+    for _ in range(UPDATES):
+        table.updateQValue(BOARD, TYPENAMES[0], 8, 0.5, 1.0)
+    table.close()
+
+def updateBatches(handle: SharedQTableHandle) -> NoReturn:
+    table = SharedQTable.attach(handle)
+    stateId = getStateSpace().ids[BOARD]
+    # Every update is of the same q-value, so each batch is one group in one stripe.
+    (stateIds, moves) = (np.full(BATCHSIZE, stateId), np.full(BATCHSIZE, 8))
+    for _ in range(UPDATES // BATCHSIZE):
+        table.updateQValues(TYPENAMES[0], stateIds, moves, np.ones(BATCHSIZE), np.full(BATCHSIZE, -1), 0.5, 0.9)
+    table.close()
+
+def testCreateAttachCloseUnlink():
+    table = SharedQTable.create(TYPENAMES)
+    other = SharedQTable.attach(table.handle())
+    table.updateQValue(BOARD, TYPENAMES[1], 8, 0.5, 1.0)
+    assert other.getQValueDict(BOARD, TYPENAMES[1]) == table.getQValueDict(BOARD, TYPENAMES[1])
+    assert other.stats()['entries'] == 1
+    with pytest.raises(ValueError):
+        other.updateQValue(BOARD, 'HardWiredPlayer', 8, 0.5, 1.0)
+    with pytest.raises(AssertionError):
+        other.unlink()
+
+    other.close()
+    assert other.qValues is None
+    name = table.handle().name
+    table.unlink()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+def testSnapshotsArePrivateCopies():
+    table = SharedQTable.create(TYPENAMES, policy=HOGWILD)
+    table.updateQValue(BOARD, TYPENAMES[0], 8, 0.5, 1.0)
+    snapshot = table.snapshot()
+    table.updateQValue(BOARD, TYPENAMES[0], 8, 0.5, 1.0)
+    assert type(snapshot) is ArrayQTable
+    assert sum(snapshot.getVisitCounts(snapshot.getQBoard(BOARD), TYPENAMES[0])) == 1
+    table.unlink()
+
+@pytest.mark.parametrize('work', [update, updateBatches])
+def testStripedUpdatesAreNotLost(work):
+    table = SharedQTable.create(TYPENAMES, policy=STRIPED)
+    processes = [multiprocessing.Process(target=work, args=(table.handle(),)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * len(processes)
+    assert sum(table.getVisitCounts(table.getQBoard(BOARD), TYPENAMES[0])) == len(processes) * UPDATES
+    # 1200 updates half way to 1 from 0 leave 1, as a float32.
+    assert table.getQValueDict(BOARD, TYPENAMES[0])[table.getQMove(BOARD, 8)] == 1.0
+    table.unlink()
@@ -0,0 +1,66 @@
+import numpy as np
+from qTable import QTable
+from sqliteQTable import SqliteQTable
+from stateSpace import getStateSpace
+from typing import NoReturn, Sequence, Set
+
+"""
+    SqliteQTable against QTable, through evictions, flushes and reopening the file.
+
+        python -m pytest test_sqliteQTable.py
+"""
+
+TYPENAMES = ['LearningPlayer', 'WinsBlocksPlayer']
+
+
+def update(tables: Sequence[QTable], updates: int, seed: int) -> NoReturn:
+    """
+    Apply the same random updates to each of tables.
+    """
+    generator = np.random.default_rng(seed)
+    states = getStateSpace()
+    nonTerminal = [stateId for stateId in range(len(states)) if states.validMoves[stateId]][:200]
+    for stateId in generator.choice(nonTerminal, updates).tolist():
+        (board, move) = (states.boards[stateId], int(generator.choice(states.validMoves[stateId])))
+        (typeName, alpha, newQValue) = (TYPENAMES[int(generator.integers(2))], generator.uniform(0.1, 0.9),
+                                        generator.uniform(-10, 10))
+        for table in tables:
+            table.updateQValue(board, typeName, move, alpha, newQValue)
+
+def entrySet(table: QTable) -> Set[tuple]:
+    return {(qBoard, typeName, tuple(sorted(qValueDict.items())), tuple(table.getVisitCounts(qBoard, typeName)))
+            for (qBoard, typeName, qValueDict) in table.entries()}
+
+def testSqliteMatchesQTable(tmp_path):
+    (table, expected) = (SqliteQTable(str(tmp_path / 'q.db'), hotCapacity=16, flushBatch=5), QTable())
+    update([table, expected], 3000, 1)
+    info = table.writeBackInfo()
+    assert info['size'] <= 16 and info['flushes'] > 0 and info['misses'] > 0
+    for board in getStateSpace().boards[:300]:
+        assert table.getQValueDict(board, TYPENAMES[0]) == expected.getQValueDict(board, TYPENAMES[0])
+    assert entrySet(table) == entrySet(expected)
+    assert table.stats()['entries'] == expected.stats()['entries']
+
+def testEntriesOutliveTheConnection(tmp_path):
+    fileName = str(tmp_path / 'q.db')
+    (table, expected) = (SqliteQTable(fileName, hotCapacity=8, flushBatch=3), QTable())
+    update([table, expected], 500, 2)
+    table.setEntry('.........', 'HardWiredPlayer', {move: 1.0 for move in range(9)}, [2] * 9)
+    expected.setEntry('.........', 'HardWiredPlayer', {move: 1.0 for move in range(9)}, [2] * 9)
+    table.close()
+    reopened = SqliteQTable(fileName)
+    assert entrySet(reopened) == entrySet(expected)
+    # Training goes on from where it stopped.
+    update([reopened, expected], 500, 3)
+    assert entrySet(reopened) == entrySet(expected)
+    reopened.close()
+
+def testSnapshotsAreCopies(tmp_path):
+    table = SqliteQTable(str(tmp_path / 'q.db'), hotCapacity=8, flushBatch=3)
+    update([table], 200, 4)
+    snapshot = table.snapshot()
+    before = entrySet(snapshot)
+    assert before == entrySet(table)
+    update([table], 200, 5)
+    assert entrySet(snapshot) == before != entrySet(table)
+    table.close()
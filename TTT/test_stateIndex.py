@@ -0,0 +1,37 @@
+from qTable import QTable
+from stateIndex import StateIndex, canonicalForm, decode, encode, getStateIndex
+from stateSpace import getStateSpace
+
+"""
+    Canonical ids against QTable's canonical forms, and the base-3 codes.
+
+        python -m pytest test_stateIndex.py
+"""
+
+
+def testThereAre765CanonicalIds():
+    index = getStateIndex()
+    assert len(index) == 765
+    assert sorted(set(index.canonicalIds)) == list(range(765))
+    assert index.canonicalCodes == sorted(index.canonicalCodes)
+
+def testIdsRoundTrip():
+    index = getStateIndex()
+    assert all(decode(encode(board)) == board for board in getStateSpace().boards)
+    assert all(index.canonicalId(index.canonicalBoard(canonicalId)) == canonicalId for canonicalId in range(len(index)))
+
+def testCanonicalBoardsAreQTables():
+    (index, table) = (getStateIndex(), QTable())
+    for board in getStateSpace().boards:
+        assert canonicalForm(board) == table.findQBoardWithRF(board)
+        assert index.canonicalBoard(index.canonicalId(board)) == table.getQBoard(board)
+
+def testFromBoardsRebuildsTheIndex():
+    index = getStateIndex()
+    boards = list(index.boardToCanonicalId)
+    rebuilt = StateIndex.fromBoards(index.canonicalBoards, boards, index.canonicalIds)
+    assert rebuilt.boardToCanonicalId == index.boardToCanonicalId
+    assert rebuilt.codeToCanonicalId == index.codeToCanonicalId
+    # Boards missing from boardToCanonicalId are canonicalized.
+    partial = StateIndex.fromBoards(index.canonicalBoards, boards[:100], index.canonicalIds[:100])
+    assert [partial.canonicalId(board) for board in boards] == index.canonicalIds
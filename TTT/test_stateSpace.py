@@ -0,0 +1,51 @@
+import pickle
+import stateSpace
+from stateSpace import CACHEVERSION, NOSTATE, StateSpace, enumerateBoards, loadStateSpace, saveStateSpace
+from utils import NEWBOARD, theWinner, validMoves
+
+"""
+    The table of reachable boards, and its cache file.
+
+        python -m pytest test_stateSpace.py
+"""
+
+
+def testTheTable():
+    states = StateSpace(enumerateBoards())
+    assert len(states) == 5478
+    assert states.getId(NEWBOARD) == 0
+    for stateId in range(0, len(states), 37):
+        board = states.boards[stateId]
+        assert states.winners[stateId] == theWinner(board)
+        assert states.isTerminal(stateId) == (theWinner(board) is not None or not validMoves(board))
+        for move in range(9):
+            successor = states.successor(stateId, move)
+            assert (successor == NOSTATE) == (move not in states.validMoves[stateId])
+
+def testTheCacheRoundTrips(tmp_path):
+    fileName = str(tmp_path / 'states.cache')
+    assert loadStateSpace(fileName) is None
+    states = StateSpace(enumerateBoards())
+    saveStateSpace(states, fileName)
+    loaded = loadStateSpace(fileName)
+    assert (loaded.boards, loaded.successors, loaded.legalMasks) == (states.boards, states.successors,
+                                                                     states.legalMasks)
+
+def testStaleOrBrokenCachesAreIgnored(tmp_path):
+    fileName = str(tmp_path / 'states.cache')
+    with open(fileName, 'wb') as cacheFile:
+        pickle.dump((CACHEVERSION - 1, StateSpace(enumerateBoards())), cacheFile)
+    assert loadStateSpace(fileName) is None
+    with open(fileName, 'wb') as cacheFile:
+        cacheFile.write(b'not a pickle')
+    assert loadStateSpace(fileName) is None
+    # Not being able to write is not an error either.
+    saveStateSpace(StateSpace(enumerateBoards()), str(tmp_path / 'missing' / 'states.cache'))
+
+def testGetStateSpaceRebuildsAMissingCache(tmp_path, monkeypatch):
+    fileName = str(tmp_path / 'states.cache')
+    monkeypatch.setattr(stateSpace, 'CACHEFILE', fileName)
+    monkeypatch.setattr(stateSpace, '_stateSpace', None)
+    states = stateSpace.getStateSpace()
+    assert len(states) == 5478 and stateSpace.getStateSpace() is states
+    assert loadStateSpace(fileName).boards == states.boards
@@ -0,0 +1,49 @@
+import pytest
+from output import QUIET, Output
+from qStore import ARRAY, DICT
+from rng import RNG
+from schedules import DEFAULTSCHEDULES, getCurve
+from trainer import TRAININGGAMES, Trainer
+from utils import XMARK
+
+"""
+    Trainer's game indexes, serial and parallel, and parallel training with different numbers of workers.
+
+        python -m pytest test_trainer.py
+"""
+
+
+def trainer(workers: int, **kwargs) -> Trainer:
+    return Trainer(N=20, trainingSegments=4, output=Output(QUIET), rng=RNG(1), storage=DICT, workers=workers,
+                   **kwargs)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def testSchedulesFollowTheGameIndex(workers):
+    training = trainer(workers)
+    # The game index and X's alpha of each game learned from.
+    alphas = []
+    updateFromSars = training.updateFromSars
+    def recordAlpha(typeName, mark, sarsList):
+        if mark == XMARK:
+            alphas.append((training.n, training.schedules.value('alpha', mark, training.n)))
+        updateFromSars(typeName, mark, sarsList)
+    training.updateFromSars = recordAlpha
+    training.train()
+
+    # 4 segments of 5 cycles: their indexes run on from segment to segment.
+    assert sorted({n for (n, _) in alphas}) == list(range(20))
+    assert sum(1 for (n, _) in alphas if n == 7) == len(TRAININGGAMES)
+    curve = getCurve(DEFAULTSCHEDULES['alpha'][XMARK])
+    assert (dict(alphas)[0], dict(alphas)[19]) == (curve(0.0), curve(1.0))
+
+@pytest.mark.parametrize('storage', [DICT, ARRAY])
+def testTheNumberOfWorkersDoesNotChangeTheTable(storage):
+    tables = []
+    for workers in (1, 2):
+        training = Trainer(N=60, trainingSegments=3, output=Output(QUIET), rng=RNG(5), storage=storage,
+                           workers=workers, batchSize=3)
+        training.train()
+        tables.append(sorted((qBoard, typeName, sorted(qValueDict.items()))
+                             for (qBoard, typeName, qValueDict) in training.qTable.entries()))
+    assert tables[0] == tables[1]
+    assert len(tables[0]) > 0
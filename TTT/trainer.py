@@ -1,88 +1,194 @@
 
+import io
+import multiprocessing
+import numpy as np
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
 from gameManager import GameManager
-from itertools import zip_longest
+from gameRecord import Record, decode, readRecords, sarsLists, writeRecords
+from geometry import TICTACTOE, BoardGeometry
 from matplotlib import pyplot as plt
+from multiprocessing.pool import Pool
+from output import GAMES, PROGRESS, QUIET, Output, output
 # noinspection PyUnresolvedReferences
 from players import (HardWiredPlayer, HumanPlayer, LearningPlayer, MinimaxPlayer,
-                     Player, WinsBlocksPlayer, WinsBlocksCornersPlayer)
-from qTable import qTable
-from typing import ClassVar, Dict, List, Optional, NoReturn
-from utils import XMARK, OMARK, NEWBOARD, alpha, formatBoard, gamma, weightedAvg
+                     Player, SarsList, WinsBlocksPlayer, WinsBlocksForksPlayer)
+from qStore import QStore, makeStorage
+from qTable import QTable, getQTable, setQTable
+from replayBuffer import ReplayBuffer
+from rng import RNG
+from schedules import DEFAULTSCHEDULES, ScheduleNames, Schedules
+from snapshot import SnapshotPublisher
+from typing import Any, ClassVar, Dict, Iterator, List, NamedTuple, Optional, NoReturn, Sequence, Set, Tuple, Union
+from utils import XMARK, OMARK, weightedAvg
+
+# The replayed transitions learned from after each training game. See Trainer.learnFromReplay.
+DEFAULTREPLAYBATCHSIZE: int = 32
+
+# The training cycles in each batch of parallel training, unless a Trainer is given a batchSize.
+# See Trainer.trainInParallel.
+DEFAULTBATCHSIZE: int = 10
+
+# The (X, O) player classes of the games in each training cycle.
+TRAININGGAMES: Tuple[Tuple[type, type], ...] = ((LearningPlayer, WinsBlocksPlayer),
+                                                (WinsBlocksPlayer, LearningPlayer),
+                                                (WinsBlocksPlayer, LearningPlayer))
+
+
+class WorkerSetup(NamedTuple):
+    """
+    What a worker process needs once, when it starts. See Trainer.workerPool.
+    """
+    N: int
+    trainingSegments: int
+    geometry: BoardGeometry
+    schedules: ScheduleNames
+    collapseSymmetricMoves: bool
+    # The table's entries when the workers start: (qBoard, typeName, qValueDict).
+    entries: List[Tuple[str, str, Dict[int, float]]]
+    # Where the changes to the table in each segment are written. See Trainer.writeChanges.
+    changesDirectory: str
+
+
+class TrainingTask(NamedTuple):
+    """
+    A batch of training cycles for a worker process to play. See Trainer.trainInParallel.
+    """
+    segmentNbr: int
+    rng: RNG
+    # The game index (see Trainer.n) of the batch's first cycle.
+    firstCycle: int
+    cycles: int
 
 
 class Trainer(GameManager):
+    """
+    Trains the LearningPlayers' shared table by self-play against WinsBlocksPlayers, in segments of
+    training cycles, with a test game at the end of each segment.
 
-    def __init__(self, N: int=5000, trainingSegments: int=100) -> NoReturn:
+    With workers > 1 or a batchSize (see trainInParallel), what is learned differs from serial training in two ways,
+    though a run is still reproducible given its seed and batchSize, whatever the number of workers:
+        - a segment's games are all played against the table as it was when the segment began;
+        - with a table that supportsBatch (e.g., an ArrayQTable), each batch's moves are learned from in one
+          updateQValues, whose targets all use the q-values from before the batch. Serial training's updates
+          each see the ones before them, including the earlier ones in the same game.
+    """
+
+    def __init__(self, N: int=5000, trainingSegments: int=100, geometry: BoardGeometry=TICTACTOE,
+                 output: Output=output, schedules: ScheduleNames=DEFAULTSCHEDULES, rng: Optional[RNG]=None,
+                 publisher: Optional[SnapshotPublisher]=None, storage: Union[str, QStore, None]=None,
+                 workers: int=1, batchSize: Optional[int]=None, replayBuffer: Optional[ReplayBuffer]=None,
+                 replayBatchSize: int=DEFAULTREPLAYBATCHSIZE,
+                 storageOptions: Optional[Dict[str, Any]]=None) -> NoReturn:
         # Total number of games to play
         self.N = N
-        # Which of the N games are we playing
+        # Which of the N games are we playing: the index of the training cycle, counted over the whole run.
         self.n = 0
         # The number of training games between test games
         self.trainingSegments = trainingSegments
         self.cycleLength = round(self.N / trainingSegments)
-        super().__init__()
+        # alpha, gamma and epsilon for each mark, precomputed for every game index. They span the cycles actually
+        # played (N, rounded to whole segments): the first sees each curve's start and the last its end.
+        self.schedules = Schedules(max(1, self.cycleLength * trainingSegments - 1), schedules)
+        super().__init__(geometry, output, rng)
+        # The table being trained. storage may be a registered storage name (see qStore), which makes a new table,
+        # or a table. Either way it becomes the shared table the LearningPlayers use. A named storage is made with
+        # storageOptions as its arguments, e.g., storage=MMAP, storageOptions={'fileName': 'q.bin'}.
+        # If storage is None, the current shared table for this board shape is trained further.
+        assert storageOptions is None or isinstance(storage, str), 'storageOptions are for a named storage.'
+        if storage is not None:
+            setQTable(makeStorage(storage, geometry, **(storageOptions or {})) if isinstance(storage, str) else
+                      storage)
+        self.qTable: QStore = getQTable(geometry)
+        # If given, a snapshot of the table is published at the end of each segment for evaluators to read.
+        self.publisher = publisher
+        # If workers is more than 1, or batchSize is given, this many processes play the training games
+        # in batches of batchSize cycles (by default, DEFAULTBATCHSIZE). See trainInParallel.
+        # The batches do not depend on the number of workers, so neither does what is learned.
+        self.workers = workers
+        self.isParallel = workers > 1 or batchSize is not None
+        self.batchSize = batchSize or DEFAULTBATCHSIZE
+        # If given, the transitions of every training game are stored here, and after each game
+        # replayBatchSize stored transitions are learned from again. See learnFromReplay.
+        assert replayBuffer is None or self.qTable.supportsBatch(), \
+            'Replay needs a table with batch updates, e.g., an ArrayQTable. Use storage=ARRAY.'
+        self.replayBuffer = replayBuffer
+        self.replayBatchSize = replayBatchSize
+        # While workers are training: the (board, typeName) entries changed since the last segment's changes were
+        # written, and where they are written. See workerPool.
+        self.changedEntries: Optional[Set[Tuple[str, str]]] = None
+        self.changesDirectory: Optional[str] = None
 
     def playAGame(self, xPlayerClass: ClassVar, oPlayerClass: ClassVar, isATestGame: bool=True) -> NoReturn:
         super().playAGame(xPlayerClass, oPlayerClass, isATestGame)
         self.updateFromSarsList(self.XDict['player'])
         self.updateFromSarsList(self.ODict['player'])
+        if self.replayBuffer is not None and not isATestGame:
+            for player in (self.XDict['player'], self.ODict['player']):
+                self.replayBuffer.add(player.typeName, player.myMark, player.sarsList)
+            self.learnFromReplay(self.replayBatchSize)
 
     def playATestGame(self,
                       xORoMark: str,
                       opponentClass: ClassVar,
-                      scores: Dict[str, List[Optional[float, int]]],
-                      XorO: Dict[str, Optional[str, float, Player]]) -> NoReturn:
+                      scores: Dict[str, List[Union[float, int]]]) -> NoReturn:
         (XClass, OClass) = (LearningPlayer, opponentClass) if xORoMark == XMARK else (opponentClass, LearningPlayer)
         self.playAGame(XClass, OClass, isATestGame=True)
-        scores['scores'].append(XorO['cachedReward'])
+        # The LearningPlayer's dict from this game. (reset makes new dicts for each game.)
+        scores['scores'].append(self.markToPlayerDict(xORoMark)['cachedReward'])
         scores['avgs'].append(weightedAvg(scores['avgs'][-1], 0.05, scores['scores'][-1]))
 
-    def printReplay(self, finalBoard: str, result: str) -> NoReturn:
-        xMoves = self.XDict['player'].sarsList
-        oMoves = self.ODict['player'].sarsList
-        print(f'\n\nReplay: {self.XDict["player"].typeName} (X) vs {self.ODict["player"].typeName} (O)')
-        # xMoves will be one longer than oMoves unless O wins. Make an extra oMove (None, None, None) if necessary.
-        zippedMoves = list(zip_longest(xMoves, oMoves, fillvalue=(None, None, None, None)))
-        for xoMoves in zippedMoves:
-            ((xBoard, xMove, _, _), (oBoard, oMove, _, _)) = xoMoves
-            # Don't print the initial empty board.
-            print("" if xBoard == NEWBOARD else formatBoard(xBoard) + "\n", f'\nX -> {xMove}')
-            if oBoard is not None:
-                print(f'{formatBoard(oBoard)}\n\nO -> {oMove}')
-        print(f'{formatBoard(finalBoard)}\n{result}')
+    def reset(self, xPlayerClass: ClassVar, oPlayerClass: ClassVar) -> NoReturn:
+        super().reset(xPlayerClass, oPlayerClass)
+        # Tell the players how much to explore in this game.
+        for playerDict in (self.XDict, self.ODict):
+            playerDict['player'].epsilon = self.schedules.value('epsilon', playerDict['mark'], self.n)
 
     def train(self) -> NoReturn:
         xScores = {'scores':[], 'avgs': [-100]}
         oScores = {'scores':[], 'avgs': [-100]}
-        for segmentNbr in range(self.trainingSegments):
-            for self.n in range(self.cycleLength):
-                self.playAGame(LearningPlayer, WinsBlocksPlayer, isATestGame=False)
-                self.playAGame(WinsBlocksPlayer, LearningPlayer, isATestGame=False)
-                self.playAGame(WinsBlocksPlayer, LearningPlayer, isATestGame=False)
-            self.playATestGame(XMARK, WinsBlocksPlayer, xScores, self.XDict)
-            self.playATestGame(OMARK, WinsBlocksPlayer, oScores, self.ODict)
-            print(f'{"="*80}')
-            print(f'End of segment {segmentNbr+1}.  {self.cycleLength*(segmentNbr+1)*3} training games played. ', end='')
-            print(f'  {XMARK} avg: {round(xScores["avgs"][-1], 2)}  {OMARK} avg: {round(oScores["avgs"][-1], 2)}')
-        print(f'{"="*80}\nEnd of training. Beginning of tournament.')
-        print(f'{"="*80}')
-        for _ in range(3):
-            (finalBoard, result) = super().playAGame(LearningPlayer, WinsBlocksPlayer, isATestGame=True)
-            self.printReplay(finalBoard, result)
-            (finalBoard, result) = super().playAGame(WinsBlocksPlayer, LearningPlayer, isATestGame=True)
-            self.printReplay(finalBoard, result)
-        print(f'\n{"="*80}\nEnd of tournament.\n{"="*80}')
-        qTable.printQTable()
-
-        plt.plot(xScores["avgs"], 'b')
-        plt.plot(oScores["avgs"], 'r')
-
-        plt.title(f'Running averages - X/O ({int(round(xScores["avgs"][-1]))}/{int(round(oScores["avgs"][-1]))})')
-
-        plt.show()
-        self.playATestGame(XMARK, WinsBlocksCornersPlayer, xScores, self.XDict)
-        self.playATestGame(XMARK, WinsBlocksCornersPlayer, xScores, self.XDict)
-        self.playATestGame(XMARK, WinsBlocksCornersPlayer, xScores, self.XDict)
+        with self.workerPool() as pool:
+            for segmentNbr in range(self.trainingSegments):
+                if pool is None:
+                    for self.n in range(segmentNbr * self.cycleLength, (segmentNbr + 1) * self.cycleLength):
+                        for (xPlayerClass, oPlayerClass) in TRAININGGAMES:
+                            self.playAGame(xPlayerClass, oPlayerClass, isATestGame=False)
+                else:
+                    self.trainInParallel(pool, segmentNbr)
+                self.playATestGame(XMARK, WinsBlocksPlayer, xScores)
+                self.playATestGame(OMARK, WinsBlocksPlayer, oScores)
+                if self.publisher is not None:
+                    self.publisher.publish(self.qTable)
+                self.output.say(PROGRESS, lambda: f'{"="*80}\n'
+                                                  f'End of segment {segmentNbr+1}.  '
+                                                  f'{self.cycleLength*(segmentNbr+1)*3} training games played. '
+                                                  f'  {XMARK} avg: {round(xScores["avgs"][-1], 2)}'
+                                                  f'  {OMARK} avg: {round(oScores["avgs"][-1], 2)}')
+        self.output.say(PROGRESS, f'{"="*80}\nEnd of training.')
+        # The tournament is only played to show its replays.
+        if self.output.isEnabled(GAMES):
+            self.output.say(GAMES, f'Beginning of tournament.\n{"="*80}')
+            for _ in range(3):
+                (finalBoard, result) = super().playAGame(LearningPlayer, WinsBlocksPlayer, isATestGame=True)
+                self.printReplay(finalBoard, result)
+                (finalBoard, result) = super().playAGame(WinsBlocksPlayer, LearningPlayer, isATestGame=True)
+                self.printReplay(finalBoard, result)
+            self.output.say(GAMES, f'\n{"="*80}\nEnd of tournament.\n{"="*80}')
+        self.qTable.printQTable(self.output)
+
+        # The plot is progress output too: QUIET runs (such as benchmarks and workers) don't open a window.
+        if self.output.isEnabled(PROGRESS):
+            plt.plot(xScores["avgs"], 'b')
+            plt.plot(oScores["avgs"], 'r')
+
+            plt.title(f'Running averages - X/O ({int(round(xScores["avgs"][-1]))}/{int(round(oScores["avgs"][-1]))})')
+
+            plt.show()
+        self.playATestGame(XMARK, WinsBlocksForksPlayer, xScores)
+        self.playATestGame(XMARK, WinsBlocksForksPlayer, xScores)
+        self.playATestGame(XMARK, WinsBlocksForksPlayer, xScores)
 
         #        Compute new value for Q[state][action]
         #        Qs = Q[s]
@@ -100,7 +206,8 @@ class Trainer(GameManager):
         #        Qsav' =  (1 - alpha) * Qsav  +  alpha * (reward + gamma * max_Qnext)
     def update(self,
                typeName: str,
-               mark: str,
+               alpha: float,
+               gamma: float,
                board: str,
                move: int,
                reward: float,
@@ -108,16 +215,199 @@ class Trainer(GameManager):
         # When done, there is no next state.
         assert reward is not None, f'reward: {reward}; nextBoard: {nextBoard}'
         done = nextBoard is None
-        nextStateBestQValue = 0 if done else qTable.getBestQValue(nextBoard, typeName)
-        newQValue = reward + gamma(mark) * nextStateBestQValue
+        nextStateBestQValue = 0 if done else self.qTable.getBestQValue(nextBoard, typeName)
+        newQValue = reward + gamma * nextStateBestQValue
         assert newQValue <= 100, f'nextBoard: {nextBoard}; reward: {reward}; nextStateBestQValue: {nextStateBestQValue}'
-        qTable.updateQValue(board, typeName, move, alpha(self.n/self.N, mark), newQValue)
+        self.qTable.updateQValue(board, typeName, move, alpha, newQValue)
+        if self.changedEntries is not None:
+            self.changedEntries.add((board, typeName))
+
+    def updateFromRecord(self, record: Record) -> NoReturn:
+        """
+        Learn from a game played elsewhere, as playAGame learns from the game it plays.
+        """
+        (xSarsList, oSarsList) = sarsLists(record, self.geometry)
+        (_, _, xTypeName, oTypeName) = decode(record, self.geometry)
+        self.updateFromSars(xTypeName, XMARK, xSarsList)
+        self.updateFromSars(oTypeName, OMARK, oSarsList)
+
+    def updateFromRecords(self, records: Sequence[Record], ns: Sequence[int]) -> NoReturn:
+        """
+        Learn from games played elsewhere. records[i] was played as game index ns[i].
+        If the table supportsBatch, all their moves are applied in one updateQValues per player type,
+        whose targets all use the q-values from before the batch (see ArrayQTable.updateQValues). Otherwise the games
+        are learned from one at a time with updateFromRecord.
+        """
+        if not self.qTable.supportsBatch():
+            for (record, self.n) in zip(records, ns):
+                self.updateFromRecord(record)
+            return
+        stateIds = self.states.ids
+        # typeName -> (stateIds, moves, rewards, nextStateIds, alphas, gammas), in the order updateFromRecord uses.
+        columns: Dict[str, Tuple[List, ...]] = {}
+        for (record, self.n) in zip(records, ns):
+            (_, _, xTypeName, oTypeName) = decode(record, self.geometry)
+            for (typeName, mark, sarsList) in zip((xTypeName, oTypeName), (XMARK, OMARK),
+                                                  sarsLists(record, self.geometry)):
+                if self.replayBuffer is not None:
+                    self.replayBuffer.add(typeName, mark, sarsList)
+                alpha = self.schedules.value('alpha', mark, self.n)
+                gamma = self.schedules.value('gamma', mark, self.n)
+                typeColumns = columns.setdefault(typeName, ([], [], [], [], [], []))
+                for (board, move, reward, nextBoard) in reversed(sarsList):
+                    for (column, value) in zip(typeColumns, (stateIds[board], move, reward,
+                                                             -1 if nextBoard is None else stateIds[nextBoard],
+                                                             alpha, gamma)):
+                        column.append(value)
+                    if self.changedEntries is not None:
+                        self.changedEntries.add((board, typeName))
+        for (typeName, typeColumns) in columns.items():
+            self.qTable.updateQValues(typeName, *(np.array(column) for column in typeColumns))
+        if self.replayBuffer is not None:
+            self.learnFromReplay(self.replayBatchSize * len(records))
+
+    def learnFromReplay(self, batchSize: int) -> NoReturn:
+        """
+        Learn again from a minibatch of the transitions in self.replayBuffer, with one updateQValues
+        per player type. alpha and gamma are those of the current game index; each alpha is scaled by
+        the transition's importance weight.
+        """
+        buffer = self.replayBuffer
+        (slots, weights) = buffer.sample(batchSize)
+        isX = buffer.marks[slots] == 0
+        alphas = weights * np.where(isX, self.schedules.value('alpha', XMARK, self.n),
+                                    self.schedules.value('alpha', OMARK, self.n))
+        gammas = np.where(isX, self.schedules.value('gamma', XMARK, self.n),
+                          self.schedules.value('gamma', OMARK, self.n))
+        typeIds = buffer.typeIds[slots]
+        for (typeId, typeName) in enumerate(buffer.typeNames):
+            isType = typeIds == typeId
+            if not isType.any():
+                continue
+            typeSlots = slots[isType]
+            tdErrors = self.qTable.updateQValues(typeName, buffer.stateIds[typeSlots], buffer.moves[typeSlots],
+                                                 buffer.rewards[typeSlots], buffer.nextStateIds[typeSlots],
+                                                 alphas[isType], gammas[isType])
+            buffer.updatePriorities(typeSlots, tdErrors)
+            if self.changedEntries is not None:
+                boards = self.states.boards
+                self.changedEntries.update((boards[stateId], typeName)
+                                           for stateId in buffer.stateIds[typeSlots].tolist())
+
+    def updateFromSars(self, typeName: str, mark: str, sarsList: SarsList) -> NoReturn:
+        # alpha and gamma are the same for every move in a game. Look them up once.
+        alpha = self.schedules.value('alpha', mark, self.n)
+        gamma = self.schedules.value('gamma', mark, self.n)
+        for (board, move, reward, nextBoard) in reversed(sarsList):
+            self.update(typeName, alpha, gamma, board, move, reward, nextBoard)
 
     def updateFromSarsList(self, player: Player) -> NoReturn:
-        typeName = player.typeName
-        mark = player.myMark
-        for (board, move, reward, nextBoard) in reversed(player.sarsList):
-            self.update(typeName, mark, board, move, reward, nextBoard)
+        self.updateFromSars(player.typeName, player.myMark, player.sarsList)
+
+    # =================================================================================
+    # Parallel self-play
+    @contextmanager
+    def workerPool(self) -> Iterator[Optional[Pool]]:
+        """
+        The pool of worker processes that trainInParallel uses, or None if training is serial.
+        Each worker is sent the table once, when it starts. After that, it reads only the entries that change,
+        from the files writeChanges writes. The pool is shut down and the files are removed on the way out,
+        even if training fails.
+        """
+        if not self.isParallel:
+            yield None
+            return
+        with tempfile.TemporaryDirectory(prefix='trainer') as self.changesDirectory:
+            self.changedEntries = set()
+            setup = WorkerSetup(self.N, self.trainingSegments, self.geometry, self.schedules.names,
+                                self.qTable.collapseSymmetricMoves, list(self.qTable.entries()), self.changesDirectory)
+            try:
+                with multiprocessing.Pool(self.workers, startWorker, (setup,)) as pool:
+                    yield pool
+            finally:
+                self.changedEntries = None
+                self.changesDirectory = None
+
+    def trainInParallel(self, pool: Pool, segmentNbr: int) -> NoReturn:
+        """
+        Play a segment's training games in pool's worker processes, and learn from them here.
+
+        The segment's cycles are split into batches of self.batchSize cycles. Each worker plays a batch
+        against its copy of the table as it was at the start of the segment, without updating it,
+        and sends back only the games, as gameRecord records. As each batch arrives, in order,
+        this process updates the table from its games. Each batch's games use their own RNG,
+        so a run is reproducible given its seed and batchSize, whatever the number of workers.
+        """
+        if segmentNbr > 0:
+            self.writeChanges(segmentNbr)
+        segmentStart = segmentNbr * self.cycleLength
+        tasks = [TrainingTask(segmentNbr, self.rng.spawn('worker', segmentNbr, firstCycle), segmentStart + firstCycle,
+                              min(self.batchSize, self.cycleLength - firstCycle))
+                 for firstCycle in range(0, self.cycleLength, self.batchSize)]
+        for (task, data) in zip(tasks, pool.imap(playTrainingGames, tasks)):
+            records = list(readRecords(io.BytesIO(data), self.geometry))
+            self.updateFromRecords(records, [task.firstCycle + i // len(TRAININGGAMES) for i in range(len(records))])
+
+    def writeChanges(self, segmentNbr: int) -> NoReturn:
+        """
+        Write the entries changed since the last segment began, for the workers to read before playing segmentNbr.
+        """
+        qKeys = {(self.qTable.getQBoard(board), typeName) for (board, typeName) in self.changedEntries}
+        self.changedEntries.clear()
+        with open(changesFileName(self.changesDirectory, segmentNbr), 'wb') as file:
+            pickle.dump([(qBoard, typeName, self.qTable.getQValueDict(qBoard, typeName))
+                         for (qBoard, typeName) in qKeys], file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def playTrainingCycles(self, firstCycle: int, cycles: int) -> bytes:
+        """
+        Play training cycles without learning from them.
+        :return: their games' records, as writeRecords writes them
+        """
+        file = io.BytesIO()
+        for self.n in range(firstCycle, firstCycle + cycles):
+            for (xPlayerClass, oPlayerClass) in TRAININGGAMES:
+                super().playAGame(xPlayerClass, oPlayerClass, isATestGame=False)
+                writeRecords(file, [self.gameRecord()], self.geometry)
+        return file.getvalue()
+
+
+def changesFileName(changesDirectory: str, segmentNbr: int) -> str:
+    return os.path.join(changesDirectory, f'segment{segmentNbr}.pickle')
+
+# In a worker process: its Trainer, made by startWorker, where the changes to the table are,
+# and the number of segments whose changes its table has.
+_workerTrainer: Optional[Trainer] = None
+_workerChangesDirectory: Optional[str] = None
+_workerSegments: int = 0
+
+def startWorker(setup: WorkerSetup) -> NoReturn:
+    """
+    Run in each worker process when the pool starts: make its Trainer, with a copy of the table.
+    The Trainer is kept between tasks, so that its schedules and its table's caches are only computed once.
+    """
+    global _workerTrainer, _workerChangesDirectory
+    table = QTable(setup.geometry, collapseSymmetricMoves=setup.collapseSymmetricMoves)
+    for (qBoard, typeName, qValueDict) in setup.entries:
+        table.setEntry(qBoard, typeName, qValueDict, [0] * setup.geometry.cells)
+    _workerTrainer = Trainer(setup.N, setup.trainingSegments, setup.geometry, Output(QUIET), setup.schedules,
+                             storage=table)
+    _workerChangesDirectory = setup.changesDirectory
+
+def playTrainingGames(task: TrainingTask) -> bytes:
+    """
+    Run in a worker process by Trainer.trainInParallel.
+    """
+    global _workerSegments
+    # Catch up with the segments since this worker last played. (Other workers may have played them.)
+    # The worker's table is never updated, so setting the changed entries brings it up to date.
+    while _workerSegments < task.segmentNbr:
+        _workerSegments += 1
+        with open(changesFileName(_workerChangesDirectory, _workerSegments), 'rb') as file:
+            for (qBoard, typeName, qValueDict) in pickle.load(file):
+                _workerTrainer.qTable.setEntry(qBoard, typeName, qValueDict, [0] * _workerTrainer.geometry.cells)
+    _workerTrainer.rng = task.rng
+    _workerTrainer.gamesPlayed = 0
+    return _workerTrainer.playTrainingCycles(task.firstCycle, task.cycles)
 
 if __name__ == '__main__':
     Trainer().train()
@@ -1,82 +1,68 @@
 
-from random import choice
-from typing import Any, Dict, List, NoReturn, Optional, Tuple, Union
+import bitboard
+from geometry import EMPTYCELL, OMARK, TICTACTOE, XMARK, BoardGeometry
+from rng import RNG, defaultRNG
+from schedules import DEFAULTSCHEDULES, getCurve
+from typing import Any, Dict, List, NoReturn, Optional, Sequence, Tuple, Union
 
-EMPTYCELL: str = '.'
-NEWBOARD: str = EMPTYCELL * 9
-LABELLEDBOARD = ''.join(map(str, range(9)))
-
-XMARK: str = 'X'
-OMARK: str = 'O'
+NEWBOARD: str = TICTACTOE.newBoard
 
 """
     The board is numbered as follows.
                 0 1 2
                 3 4 5
                 6 7 8
+    Other board shapes are numbered row by row in the same way. Their centers, corners, sides and win lines
+    are in BoardGeometry.
 """
 
-CENTER: int = 4
-CORNERS: List[int] = [0, 2, 6, 8]
-SIDES: List[int] = [1, 3, 5, 7]
-
-def getColAt(pos: int) -> Tuple[int, int, int]:
+def getColAt(pos: int, geometry: BoardGeometry=TICTACTOE) -> Tuple[int, ...]:
     """
     Return a tuple of the indices for the column that includes pos.
     :param pos:
+    :param geometry:
     :return:
     """
-    colStart = pos % 3
-    col = (colStart, colStart + 3, colStart + 6)
+    colStart = pos % geometry.cols
+    col = tuple(range(colStart, geometry.cells, geometry.cols))
     return col
 
-def getRowAt(pos: int) -> Tuple[int, int, int]:
+def getRowAt(pos: int, geometry: BoardGeometry=TICTACTOE) -> Tuple[int, ...]:
     """
     Return a tuple of the indices for the row that includes pos.
     :param pos:
+    :param geometry:
     :return:
     """
-    rowStart = (pos // 3) * 3
-    row = (rowStart, rowStart + 1, rowStart + 2)
+    rowStart = (pos // geometry.cols) * geometry.cols
+    row = tuple(range(rowStart, rowStart + geometry.cols))
     return row
 
-majDiag = (0, 4, 8)
-minDiag = (2, 4, 6)
-
-# These are the eight three-element sequences that could make a win.
-possibleWinners: List[Tuple[int, int, int]] = [majDiag, minDiag,
-                                               getRowAt(0), getRowAt(3), getRowAt(6),
-                                               getColAt(0), getColAt(1), getColAt(2)]
-
 
 # Alpha is the learning rate. It declines with more games.
-# Select the function for alpha, which is based on player, and return alpha for a given n (game number)
-# noinspection PyShadowingNames
+# The curves are in schedules. A Trainer looks its values up in a precomputed Schedules instead.
 def alpha(pctTrained: float, playerMark: str) -> float:
-    alpha_fn = {'X': lambda: min(0.5, pow(0.99, 250 * pctTrained)),
-                'O': lambda: min(0.75, pow(0.99, 200 * pctTrained))}[playerMark]
-    return alpha_fn()
+    return getCurve(DEFAULTSCHEDULES['alpha'][playerMark])(pctTrained)
 
-def argmax(aDict: Dict) -> Any:
+def argmax(aDict: Dict, rng: RNG=defaultRNG) -> Any:
     bestKeys = argmaxList(aDict)
-    return choice(bestKeys)
+    return rng.choice(bestKeys)
 
 def argmaxList(aDict: Dict) -> [Any]:
     bestVal = max(aDict.values())
     bestKeys = [key for (key, val) in aDict.items() if val == bestVal]
     return bestKeys
 
-def emptyCellsCount(board: str) -> int:
+def emptyCellsCount(board: str, geometry: BoardGeometry=TICTACTOE) -> int:
     # Do it this way rather than commit to a constant value empty cell
-    return 9 - board.count('X') - board.count('O')
+    return bitboard.emptyCount(*bitboard.toMasks(board), geometry)
 
-def formatBoard(board: str) -> str:
+def formatBoard(board: str, geometry: BoardGeometry=TICTACTOE) -> str:
     # A Board showing unused cells and their labels
-    labelledBoardList = [' ' if cell in 'XO' else label for (label, cell) in zip(LABELLEDBOARD, board)]
-    labelledBoard = ''.join(labelledBoardList)
+    labelledBoard = [' ' if cell in 'XO' else label for (label, cell) in zip(geometry.labels, board)]
     # Get rows for both labelledBoard and Board
-    labelledRows = make_rows(labelledBoard)
-    boardRows = make_rows(board)
+    labelledRows = make_rows(labelledBoard, geometry)
+    boardRows = make_rows(board, geometry)
     # Combine the rows with a spacer between
     combinedRows = [labels + '     ' + row for (labels, row) in zip(labelledRows, boardRows)]
     boardString = '\n'.join(combinedRows)
@@ -84,35 +70,38 @@ def formatBoard(board: str) -> str:
 
 # Gamma is the discount rate for future results.
 def gamma(playerMark: str) -> float:
-    return {'X': 0.9, 'O': 0.95}[playerMark]
+    return getCurve(DEFAULTSCHEDULES['gamma'][playerMark])(0)
 
 def isAvailable(board: str, pos: int) -> bool:
-    return board[pos] in NEWBOARD
+    return board[pos] == EMPTYCELL
 
-def make_rows(board: str):
-    row_separator = "---+---+---"
-    return [make_row(board, 0), row_separator,
-            make_row(board, 1), row_separator,
-            make_row(board, 2)]
+def make_rows(board: Sequence[str], geometry: BoardGeometry=TICTACTOE) -> List[str]:
+    width = len(geometry.labels[-1])
+    row_separator = '+'.join(['-' * (width + 2)] * geometry.cols)
+    rows = [make_row(board, 0, geometry)]
+    for row in range(1, geometry.rows):
+        rows += [row_separator, make_row(board, row, geometry)]
+    return rows
 
-def make_row(board: str, row:int) -> str:
+def make_row(board: Sequence[str], row: int, geometry: BoardGeometry=TICTACTOE) -> str:
     """
     A row looks like this:
     _0_|_1_|_2_  (The _ stands for a blank space.)
+    Cells are right-justified to the width of the widest label.
     """
-    return ' ' + ' | '.join(board[row*3:(row+1)*3]) + ' '
+    width = len(geometry.labels[-1])
+    cols = geometry.cols
+    return ' ' + ' | '.join([cell.rjust(width) for cell in board[row*cols:(row+1)*cols]]) + ' '
 
-def marksAtTriple(board:str, triple: Tuple[int, int, int]):
-    return [board[i] for i in triple]
-
-def oppositeCorner(pos: int) -> int:
-    return {0: 8, 2: 6, 6: 2, 8: 0}[pos]
+def oppositeCorner(pos: int, geometry: BoardGeometry=TICTACTOE) -> int:
+    assert pos in geometry.corners, f'{pos} is not a corner.'
+    return geometry.cells - 1 - pos
 
 def otherMark(mark: str) -> str:
-    return {'X': 'O', 'O': 'X'}[mark]
+    return {XMARK: OMARK, OMARK: XMARK}[mark]
 
-def render(board: str) -> NoReturn:
-    print(formatBoard(board))
+def render(board: str, geometry: BoardGeometry=TICTACTOE) -> NoReturn:
+    print(formatBoard(board, geometry))
 
 def roundDict(dct: Dict[Any, float]) -> Dict[Any, float]:
     """
@@ -134,25 +123,36 @@ def setMove(board: str, move: int, mark: str) -> str:
     """
     return board[0:move] + mark + board[move+1:]
 
-def theWinner(board: str) -> Optional[str]:
+def theWinner(board: str, geometry: BoardGeometry=TICTACTOE) -> Optional[str]:
     """
     Is there a winner? If so return its mark. Otherwise, return None.
+    The win lines are checked as masks. See bitboard.
     """
-    for triple in possibleWinners:
-        (mark, y, z) = marksAtTriple(board, triple)
-        if mark in 'XO' and mark == y == z:
-            return mark
-    return None
+    return bitboard.winner(*bitboard.toMasks(board), geometry)
 
-def validMoves(board: str) -> List[int]:
-    valids = [i for i in range(9) if isAvailable(board, i)]
-    return valids
+def validMoves(board: str, geometry: BoardGeometry=TICTACTOE) -> List[int]:
+    return bitboard.validMoves(*bitboard.toMasks(board), geometry)
 
 def weightedAvg(low: Union[float, int], weight: float, high: Union[float, int]) -> float:
     return (1 - weight) * low + weight * high
 
-def whoseMove(board: str) -> str:
-    return OMARK if board.count(XMARK) > board.count(OMARK) else XMARK
+def whoseMove(board: str, geometry: BoardGeometry=TICTACTOE) -> str:
+    return bitboard.whoseMove(*bitboard.toMasks(board), geometry)
+
+def winnerAfterMove(masks: bitboard.Masks, move: int, mark: str, movesMade: int,
+                    geometry: BoardGeometry=TICTACTOE) -> Tuple[Optional[str], bool]:
+    """
+    Like theWinner, but only checks the lines through the cell just played (see BoardGeometry.hasWinThrough).
+    :param masks: the (xMask, oMask) after the move
+    :param move: the cell just played
+    :param mark: who played it
+    :param movesMade: the number of moves made so far, including this one
+    :param geometry:
+    :return: (winner, isFull): the mover's mark if the move won, otherwise None;
+             and whether the board is now full.
+    """
+    markMask = masks[0] if mark == XMARK else masks[1]
+    return (mark if geometry.hasWinThrough(markMask, move) else None, movesMade == geometry.cells)
 
 
 